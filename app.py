@@ -6,77 +6,1080 @@ A Flask-based web application that generates personalized travel itineraries usi
 
 import os
 import json
+import gzip
+import re
+import random
+import cProfile
+import hashlib
+import math
+import time
+import uuid
+import sqlite3
+import threading
+import unicodedata
+import contextvars
+from bisect import bisect_left
 import requests
-from datetime import datetime
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from dataclasses import dataclass, asdict
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import wraps
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+from flask import Flask, Response, g, request, jsonify, render_template, send_file, send_from_directory, stream_with_context, url_for
 from flask_cors import CORS
-import google.generativeai as genai
+from werkzeug.http import parse_accept_header, quote_etag
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Upstream API endpoints (overridable, e.g. to point at local stub servers)
+GOOGLE_MAPS_API_URL = os.getenv('GOOGLE_MAPS_API_URL', 'https://maps.googleapis.com/maps/api')
+GOOGLE_ROADS_API_URL = os.getenv('GOOGLE_ROADS_API_URL', 'https://roads.googleapis.com/v1')
+OPENWEATHERMAP_API_URL = os.getenv('OPENWEATHERMAP_API_URL', 'https://api.openweathermap.org/data/2.5')
+EXCHANGERATE_API_URL = os.getenv('EXCHANGERATE_API_URL', 'https://api.exchangerate-api.com/v4/latest')
+
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)
 
+# Metrics - Prometheus text exposition, kept in-process (one set per worker)
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter per label combination"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [('', tuple(zip(self.labels, label_values)), value) for label_values, value in values]
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. requests in flight"""
+
+    kind = 'gauge'
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+class Histogram(Counter):
+    """Cumulative latency buckets, sum and count per label combination"""
+
+    kind = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+    def __init__(self, name, documentation, labels=(), buckets=None):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets or self.DEFAULT_BUCKETS)
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                # One count per bucket plus +Inf, then the running sum
+                series = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            values = [(label_values, list(series)) for label_values, series in self._values.items()]
+        samples = []
+        for label_values, series in values:
+            pairs = tuple(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                samples.append(('_bucket', pairs + (('le', _format_value(float(bound))),), cumulative))
+            samples.append(('_sum', pairs, series[-1]))
+            samples.append(('_count', pairs, cumulative))
+        return samples
+
+class MetricsRegistry:
+    """Metrics updated on the hot path plus collectors that read existing stats at scrape time"""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._add(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._add(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=None):
+        return self._add(Histogram(name, documentation, labels, buckets))
+
+    def register_collector(self, collector):
+        """collector() yields (name, kind, documentation, [(label pairs, value), ...])"""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, pairs, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(pairs)} {_format_value(value)}")
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"⚠️ Metrics collector error: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for pairs, value in samples:
+                    if value is not None:
+                        lines.append(f"{name}{_format_labels(pairs)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+class AppMetrics(MetricsRegistry):
+    """The metrics go.travel records while serving"""
+
+    def __init__(self):
+        super().__init__()
+        self.http_latency = self.histogram(
+            'gotravel_http_request_duration_seconds', 'Request latency by route',
+            ('method', 'route', 'status')
+        )
+        self.http_in_flight = self.gauge('gotravel_http_requests_in_flight', 'Requests being handled')
+        self.upstream_latency = self.histogram(
+            'gotravel_upstream_request_duration_seconds', 'Upstream API call latency, including retries and hedging',
+            ('upstream', 'outcome')
+        )
+        self.upstream_in_flight = self.gauge(
+            'gotravel_upstream_requests_in_flight', 'Upstream API calls in progress', ('upstream',)
+        )
+        self.upstream_errors = self.counter(
+            'gotravel_upstream_errors_total', 'Failed or refused upstream API calls', ('upstream', 'reason')
+        )
+        self.google_api_latency = self.histogram(
+            'gotravel_google_api_request_duration_seconds', 'Google Maps API latency by endpoint and response status',
+            ('endpoint', 'status')
+        )
+        self.fallbacks = self.counter(
+            'gotravel_fallbacks_total', 'Responses served from fallback data instead of a live upstream answer', ('kind',)
+        )
+        self.gemini_tokens = self.counter(
+            'gotravel_gemini_tokens_total', 'Gemini tokens by operation and type', ('operation', 'type')
+        )
+
+metrics = AppMetrics()
+
+# Request tracing - timed spans per service call and processing step, reported as Server-Timing
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+class Span:
+    __slots__ = ('name', 'start', 'end', 'children')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+
+    def duration_ms(self):
+        return round(((self.end or time.perf_counter()) - self.start) * 1000, 2)
+
+    def to_dict(self, origin):
+        span = {
+            'name': self.name,
+            'start_ms': round((self.start - origin) * 1000, 2),
+            'duration_ms': self.duration_ms()
+        }
+        if self.end is None:
+            span['unfinished'] = True
+        if self.children:
+            span['children'] = [child.to_dict(origin) for child in list(self.children)]
+        return span
+
+class RequestTrace:
+    """Span tree for one request; spans may be added from the thread pools it fans out to"""
+
+    SERVER_TIMING_MAX_ENTRIES = 20
+
+    def __init__(self, name):
+        self.root = Span(name)
+        self._lock = threading.Lock()
+
+    def start_span(self, name, parent):
+        span = Span(name)
+        with self._lock:
+            parent.children.append(span)
+        return span
+
+    def activate(self):
+        """Make this the current trace for spans opened in this context (and contexts copied from it)"""
+        _current_trace.set(self)
+        _current_span.set(self.root)
+
+    def finish(self):
+        if self.root.end is None:
+            self.root.end = time.perf_counter()
+
+    def _walk(self, span):
+        for child in list(span.children):
+            yield child
+            yield from self._walk(child)
+
+    def server_timing(self):
+        """Server-Timing header value: total time for each span name (concurrent spans overlap)"""
+        totals = {}
+        for span in self._walk(self.root):
+            if span.end is not None:
+                totals[span.name] = totals.get(span.name, 0) + (span.end - span.start)
+        slowest = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:self.SERVER_TIMING_MAX_ENTRIES]
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in slowest]
+        return ', '.join(entries + [f"total;dur={self.root.duration_ms():.1f}"])
+
+    def to_dict(self):
+        return self.root.to_dict(self.root.start)
+
+@contextmanager
+def start_trace(name):
+    """Collect spans for the enclosed work (a request) into a new RequestTrace"""
+    trace = RequestTrace(name)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    finally:
+        trace.finish()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+@contextmanager
+def trace_span(name):
+    """Time the enclosed block as a child of the current span; a no-op outside a trace"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    span = trace.start_span(name, _current_span.get() or trace.root)
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        span.end = time.perf_counter()
+        _current_span.reset(token)
+
+def traced(name):
+    """Decorator recording each call of a function as a span"""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with trace_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# Shared HTTP transport
+class _TrackingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report every new TCP/TLS connection"""
+
+    def __init__(self, on_new_connection, **kwargs):
+        self._on_new_connection = on_new_connection
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        on_new_connection = self._on_new_connection
+
+        def tracked(pool_class):
+            class TrackedPool(pool_class):
+                def _new_conn(self):
+                    on_new_connection(self.host)
+                    return super()._new_conn()
+            return TrackedPool
+
+        # Use a fresh mapping - the default one is shared module state in urllib3
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': tracked(HTTPConnectionPool),
+            'https': tracked(HTTPSConnectionPool)
+        }
+
+class RequestCoalescer:
+    """Single-flight for identical in-flight requests: one caller fetches, the rest share its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}  # request key -> Future
+
+    @staticmethod
+    def make_key(method, url, params=None):
+        """Normalize URL and params so equivalent requests map to the same key"""
+        parts = urlsplit(url)
+        query = sorted((str(name), str(value)) for name, value in (params or {}).items())
+        return (method.upper(), parts.scheme, (parts.hostname or '').lower(), parts.port, parts.path, parts.query, tuple(query))
+
+    def run(self, key, fetch):
+        """Return (result, coalesced) - fetch() runs only if no identical call is in flight"""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            return future.result(), True  # Re-raises the leader's exception
+
+        try:
+            result = fetch()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._inflight)
+
+# Upstream circuit breakers
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+class CircuitBreaker:
+    """Opens after consecutive failures; after a cool-down one half-open probe decides whether to close"""
+
+    def __init__(self, name, timeout, failure_threshold=5, reset_timeout=30, latency_window=200, clock=time.time):
+        self.name = name
+        self.timeout = timeout  # Latency budget per upstream call
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = 'closed'
+        self._opened_at = 0
+        self._probe_in_flight = False
+        self._consecutive_failures = 0
+        self._latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+        self.stats = {'successes': 0, 'failures': 0, 'rejected': 0, 'times_opened': 0}
+
+    def allow(self):
+        """Whether a call may go upstream now"""
+        with self._lock:
+            if self.state == 'open':
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    self.stats['rejected'] += 1
+                    return False
+                self.state = 'half_open'
+                self._probe_in_flight = False
+            if self.state == 'half_open':
+                if self._probe_in_flight:
+                    self.stats['rejected'] += 1
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self, latency):
+        with self._lock:
+            self.stats['successes'] += 1
+            self._latencies.append(latency)
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+            if self.state != 'closed':
+                print(f"✅ {self.name} circuit closed")
+                self.state = 'closed'
+
+    def record_failure(self):
+        with self._lock:
+            self.stats['failures'] += 1
+            self._consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == 'half_open' or (self.state == 'closed' and self._consecutive_failures >= self.failure_threshold):
+                print(f"⚠️ {self.name} circuit opened after {self._consecutive_failures} consecutive failures")
+                self.state = 'open'
+                self._opened_at = self.clock()
+                self.stats['times_opened'] += 1
+
+    def p95(self, min_samples=20):
+        """95th percentile of recent successful call latencies, once there are enough samples"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(int(len(samples) * 0.95), len(samples) - 1)]
+
+    def get_status(self):
+        p95 = self.p95()
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self._consecutive_failures,
+                'timeout': self.timeout,
+                'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+                **self.stats
+            }
+
+class GuardedStream:
+    """A streamed upstream response that reports to its breaker once iteration ends.
+
+    A stream the consumer stops early (e.g. the client went away) counts as a success,
+    since the upstream was answering; other attributes come from the wrapped response.
+    """
+
+    def __init__(self, response, finish):
+        self.response = response
+        self._finish = finish
+        self._finished = False
+
+    def _settle(self, failed):
+        if not self._finished:
+            self._finished = True
+            self._finish(failed)
+
+    def __iter__(self):
+        try:
+            yield from self.response
+        except Exception:
+            self._settle(failed=True)
+            raise
+        finally:
+            self._settle(failed=False)
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+class UpstreamGuard:
+    """Per-upstream circuit breakers, latency budgets, hedged requests and last-known responses"""
+
+    # Default latency budget (seconds) per upstream; override with UPSTREAM_TIMEOUT_<NAME>
+    TIMEOUTS = {
+        'geocode': 5, 'places': 5, 'timezone': 4, 'directions': 8,
+        'roads': 5, 'weather': 5, 'currency': 8, 'gemini': 120
+    }
+
+    def __init__(self):
+        failure_threshold = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+        reset_timeout = float(os.getenv('CIRCUIT_RESET_TIMEOUT', 30))
+        self.breakers = {
+            name: CircuitBreaker(
+                name, float(os.getenv(f'UPSTREAM_TIMEOUT_{name.upper()}', timeout)),
+                failure_threshold=failure_threshold, reset_timeout=reset_timeout
+            )
+            for name, timeout in self.TIMEOUTS.items()
+        }
+        # Hedging duplicates slow idempotent calls, so it spends extra API quota - opt in
+        self.hedging = os.getenv('HEDGE_REQUESTS', 'false').lower() == 'true'
+        self.hedge_min_delay = float(os.getenv('HEDGE_MIN_DELAY', 0.05))
+        self.hedge_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('HEDGE_WORKERS', 32)),
+            thread_name_prefix='hedge'
+        ) if self.hedging else None
+        self.last_known_max = int(os.getenv('LAST_KNOWN_MAX_ENTRIES', 1000))
+        self._last_known = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hedged': 0, 'hedge_wins': 0, 'hedge_skipped_quota': 0, 'last_known_served': 0}
+
+    def timeout(self, name):
+        return self.breakers[name].timeout
+
+    def acquire(self, name):
+        """Breaker for an upstream call that may proceed, or CircuitOpenError"""
+        breaker = self.breakers[name]
+        if not breaker.allow():
+            metrics.upstream_errors.inc(name, 'circuit_open')
+            raise CircuitOpenError(f"{name} circuit open - upstream temporarily unavailable")
+        return breaker
+
+    def hedge_delay(self, name):
+        """Seconds to wait before sending a hedged duplicate, or None when hedging is off"""
+        if not self.hedging:
+            return None
+        p95 = self.breakers[name].p95()
+        return max(p95, self.hedge_min_delay) if p95 is not None else None
+
+    def count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def call(self, name, fetch, is_failure=None, hedge=False, can_hedge=None):
+        """Run fetch() through the upstream's breaker, hedging it past p95 if asked.
+
+        can_hedge() is asked right before a duplicate is sent, e.g. for a free quota token.
+        """
+        breaker = self.acquire(name)
+        started = time.time()
+        metrics.upstream_in_flight.inc(name)
+        try:
+            with trace_span(f"upstream.{name}"):
+                delay = self.hedge_delay(name) if hedge else None
+                result = self._hedged(fetch, delay, can_hedge) if delay is not None else fetch()
+        except Exception:
+            breaker.record_failure()
+            self.observe(name, started, 'error')
+            raise
+        finally:
+            metrics.upstream_in_flight.dec(name)
+        if is_failure and is_failure(result):
+            breaker.record_failure()
+            self.observe(name, started, 'bad_response')
+        else:
+            breaker.record_success(time.time() - started)
+            self.observe(name, started, 'ok')
+        return result
+
+    @staticmethod
+    def observe(name, started, outcome):
+        """Record an upstream call's latency, counting anything but 'ok' as an error"""
+        metrics.upstream_latency.observe(time.time() - started, name, outcome)
+        if outcome != 'ok':
+            metrics.upstream_errors.inc(name, outcome)
+
+    def _hedged(self, fetch, delay, can_hedge=None):
+        """Send a duplicate if fetch() has not answered within delay; the first good answer wins"""
+        primary = self.hedge_executor.submit(contextvars.copy_context().run, fetch)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        if can_hedge is not None and not can_hedge():
+            self.count('hedge_skipped_quota')
+            return primary.result()
+
+        self.count('hedged')
+        backup = self.hedge_executor.submit(contextvars.copy_context().run, fetch)
+        done, _ = wait([primary, backup], return_when=FIRST_COMPLETED)
+        winner = primary if primary in done else backup
+        if winner.exception() is not None:
+            # Give the other attempt the chance to succeed
+            winner = backup if winner is primary else primary
+            wait([winner])
+        loser = backup if winner is primary else primary
+        if not loser.cancel():
+            # Already running - release its response (and pooled connection) as soon as it lands
+            loser.add_done_callback(self._discard)
+        if winner is backup:
+            self.count('hedge_wins')
+        return winner.result()
+
+    @staticmethod
+    def _discard(future):
+        if not future.cancelled() and future.exception() is None:
+            close = getattr(future.result(), 'close', None)
+            if close is not None:
+                close()
+
+    def stream(self, name, start):
+        """Like call() for a streamed response: the breaker hears the outcome when the stream ends"""
+        breaker = self.acquire(name)
+        started = time.time()
+        metrics.upstream_in_flight.inc(name)
+        try:
+            with trace_span(f"upstream.{name}"):
+                response = start()
+        except Exception:
+            metrics.upstream_in_flight.dec(name)
+            breaker.record_failure()
+            self.observe(name, started, 'error')
+            raise
+
+        def finish(failed):
+            metrics.upstream_in_flight.dec(name)
+            if failed:
+                breaker.record_failure()
+                self.observe(name, started, 'error')
+            else:
+                breaker.record_success(time.time() - started)
+                self.observe(name, started, 'ok')
+        return GuardedStream(response, finish)
+
+    def remember(self, key, data):
+        """Keep the latest good response for a request as a fallback"""
+        with self._lock:
+            self._last_known[key] = data
+            self._last_known.move_to_end(key)
+            while len(self._last_known) > self.last_known_max:
+                self._last_known.popitem(last=False)
+
+    def last_known(self, key):
+        """Latest good response for a request, marked stale, or None"""
+        with self._lock:
+            data = self._last_known.get(key)
+            if data is None:
+                return None
+            self.stats['last_known_served'] += 1
+        metrics.fallbacks.inc('last_known')
+        return {**data, 'stale': True}
+
+    def get_status(self):
+        with self._lock:
+            stats = dict(self.stats)
+            last_known_entries = len(self._last_known)
+        return {
+            'breakers': {name: breaker.get_status() for name, breaker in self.breakers.items()},
+            'hedging': self.hedging,
+            'last_known_entries': last_known_entries,
+            **stats
+        }
+
+# Client-side API quota scheduling
+class QuotaExceededError(requests.exceptions.RequestException):
+    """Raised when a call is shed because its priority class has no budget left"""
+
+    def __init__(self, *args, priority=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.priority = priority
+
+    def outranked_by(self, priority):
+        """Whether a caller at priority could still get the quota this call was shed for"""
+        ranks = QuotaScheduler.PRIORITIES
+        return self.priority in ranks and ranks.index(priority) < ranks.index(self.priority)
+
+# Priority of the upstream calls made by the current request or background job
+_call_priority = contextvars.ContextVar('call_priority', default='interactive')
+
+@contextmanager
+def call_priority(priority):
+    """Run the enclosed upstream calls at a priority class"""
+    token = _call_priority.set(priority)
+    try:
+        yield
+    finally:
+        _call_priority.reset(token)
+
+def run_with_priority(priority, func, *args):
+    """Call func at a priority class - for work submitted to thread pools"""
+    with call_priority(priority):
+        return func(*args)
+
+def current_priority():
+    return _call_priority.get()
+
+class TokenBucket:
+    """Per-second token bucket plus an optional per-day quota for one upstream API key"""
+
+    def __init__(self, rate, burst, daily_limit=None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.daily_limit = daily_limit
+        self.clock = clock
+        self.tokens = float(burst)
+        self._updated = clock()
+        self._day = time.strftime('%Y-%m-%d', time.gmtime())
+        self.used_today = 0
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        today = time.strftime('%Y-%m-%d', time.gmtime())
+        if today != self._day:
+            self._day = today
+            self.used_today = 0
+
+    def wait_time(self, reserve):
+        """0 if a token can be taken while keeping `reserve` (a fraction) of both budgets, else seconds to wait"""
+        if self.daily_limit is not None and self.daily_limit - self.used_today - 1 < reserve * self.daily_limit:
+            return float('inf')  # Nothing refills before the next day
+        shortfall = reserve * self.burst + 1 - self.tokens
+        return 0 if shortfall <= 0 else shortfall / self.rate
+
+    def take(self):
+        self.tokens -= 1
+        self.used_today += 1
+
+    def get_status(self):
+        return {
+            'tokens': round(self.tokens, 1),
+            'rate_per_second': self.rate,
+            'burst': self.burst,
+            'used_today': self.used_today,
+            'daily_limit': self.daily_limit,
+            'remaining_today': self.daily_limit - self.used_today if self.daily_limit is not None else None
+        }
+
+class QuotaScheduler:
+    """Token buckets per upstream API and key, shared out by priority class.
+
+    Lower classes must leave a reserve of both the per-second and the daily budget
+    for higher ones, and never take a token while a higher class is waiting for it.
+    Interactive and enrichment calls queue briefly for tokens; background calls are shed.
+    """
+
+    PRIORITIES = ('interactive', 'enrichment', 'background')
+    RESERVES = {'interactive': 0.0, 'enrichment': 0.2, 'background': 0.5}
+    MAX_WAITS = {'interactive': 2.0, 'enrichment': 0.5, 'background': 0.0}
+
+    # (per second, burst, per day) - override with QUOTA_<UPSTREAM>_PER_SECOND / _BURST / _PER_DAY
+    DEFAULT_QUOTAS = {
+        'geocode': (50, 50, None),
+        'places': (10, 20, None),
+        'timezone': (50, 50, None),
+        'directions': (50, 50, None),
+        'roads': (50, 50, None),
+        'weather': (1, 60, None)  # OpenWeatherMap free tier: 60 calls/minute
+    }
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.reserves = {
+            priority: float(os.getenv(f'QUOTA_RESERVE_{priority.upper()}', reserve))
+            for priority, reserve in self.RESERVES.items()
+        }
+        self.max_waits = {
+            priority: float(os.getenv(f'QUOTA_MAX_WAIT_{priority.upper()}', wait))
+            for priority, wait in self.MAX_WAITS.items()
+        }
+        self._buckets = {}
+        self._waiting = {}  # (bucket key, priority) -> queued callers
+        self._lock = threading.Lock()
+        self.stats = {priority: {'granted': 0, 'queued': 0, 'shed': 0} for priority in self.PRIORITIES}
+
+    @staticmethod
+    def key_id(api_key):
+        """Short fingerprint so keys can be told apart in /api/status without exposing them"""
+        return hashlib.sha256(str(api_key).encode()).hexdigest()[:8] if api_key else 'none'
+
+    def _bucket(self, bucket_key, upstream):
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            rate, burst, daily = self.DEFAULT_QUOTAS[upstream]
+            prefix = f"QUOTA_{upstream.upper()}"
+            daily = os.getenv(f'{prefix}_PER_DAY', daily)
+            bucket = TokenBucket(
+                float(os.getenv(f'{prefix}_PER_SECOND', rate)),
+                float(os.getenv(f'{prefix}_BURST', burst)),
+                int(daily) if daily else None,
+                clock=self.clock
+            )
+            self._buckets[bucket_key] = bucket
+        return bucket
+
+    def meters(self, upstream):
+        return upstream in self.DEFAULT_QUOTAS
+
+    def try_acquire(self, upstream, api_key, priority):
+        """Take a token now and return 0, or return the seconds until one may be available"""
+        bucket_key = (upstream, self.key_id(api_key))
+        with self._lock:
+            bucket = self._bucket(bucket_key, upstream)
+            bucket.refill()
+            rank = self.PRIORITIES.index(priority)
+            if any(self._waiting.get((bucket_key, higher)) for higher in self.PRIORITIES[:rank]):
+                return 1 / bucket.rate
+            wait = bucket.wait_time(self.reserves[priority])
+            if wait == 0:
+                bucket.take()
+                self.stats[priority]['granted'] += 1
+            return wait
+
+    @contextmanager
+    def waiting(self, upstream, api_key, priority):
+        """Register a queued caller so lower classes yield to it"""
+        key = ((upstream, self.key_id(api_key)), priority)
+        with self._lock:
+            self._waiting[key] = self._waiting.get(key, 0) + 1
+            self.stats[priority]['queued'] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._waiting[key] -= 1
+
+    def shed(self, upstream, priority):
+        """Count a shed call and build the error to raise for it"""
+        with self._lock:
+            self.stats[priority]['shed'] += 1
+        return QuotaExceededError(f"{upstream} quota reserved for higher-priority calls - {priority} call shed", priority=priority)
+
+    def acquire(self, upstream, api_key, priority=None):
+        """Block until the current priority class may make one call, or raise QuotaExceededError"""
+        priority = priority or current_priority()
+        wait = self.try_acquire(upstream, api_key, priority)
+        if wait == 0:
+            return
+        deadline = self.clock() + self.max_waits[priority]
+        with self.waiting(upstream, api_key, priority):
+            while wait > 0:
+                if self.clock() + wait > deadline:
+                    raise self.shed(upstream, priority)
+                self.sleep(wait)
+                wait = self.try_acquire(upstream, api_key, priority)
+
+    def get_status(self):
+        with self._lock:
+            buckets = {}
+            for (upstream, key_id), bucket in self._buckets.items():
+                bucket.refill()
+                buckets[f"{upstream}:{key_id}"] = bucket.get_status()
+            stats = {priority: dict(counts) for priority, counts in self.stats.items()}
+        return {
+            'buckets': buckets,
+            'priorities': {
+                priority: {'reserve': self.reserves[priority], 'max_wait': self.max_waits[priority], **stats[priority]}
+                for priority in self.PRIORITIES
+            }
+        }
+
+class PooledHTTPClient:
+    """Keep-alive HTTP client with per-host connection pools shared by all upstream services"""
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, pool_connections=None, pool_maxsize=None, max_retries=None, backoff_factor=None, guard=None, scheduler=None):
+        threads = int(os.getenv('GUNICORN_THREADS', 8))
+        # One pool per upstream host; each pool keeps up to one connection per worker thread
+        self.pool_connections = pool_connections or int(os.getenv('HTTP_POOL_CONNECTIONS', 10))
+        self.pool_maxsize = pool_maxsize or int(os.getenv('HTTP_POOL_MAXSIZE', threads))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('HTTP_MAX_RETRIES', 2))
+        self.backoff_factor = backoff_factor if backoff_factor is not None else float(os.getenv('HTTP_BACKOFF_FACTOR', 0.3))
+        self._lock = threading.Lock()
+        self._host_stats = {}
+        self.coalescer = RequestCoalescer()
+        self.guard = guard
+        self.scheduler = scheduler
+
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'HEAD']),  # Only idempotent calls are retried
+            raise_on_status=False
+        )
+        adapter = _TrackingHTTPAdapter(
+            self._record_new_connection,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _host_entry(self, host):
+        if host not in self._host_stats:
+            self._host_stats[host] = {'requests': 0, 'new_connections': 0, 'errors': 0, 'coalesced': 0}
+        return self._host_stats[host]
+
+    def _record_new_connection(self, host):
+        with self._lock:
+            self._host_entry(host)['new_connections'] += 1
+
+    def get(self, url, params=None, timeout=10, upstream=None):
+        """Issue a GET over the shared session, retrying transient failures with backoff.
+
+        Concurrent identical GETs share one upstream request and its response. Naming the
+        upstream runs the request through its circuit breaker, latency budget and quota.
+        """
+        host = urlsplit(url).hostname
+        key = RequestCoalescer.make_key('GET', url, params)
+        if upstream and self.guard:
+            fetch = lambda: self._guarded_get(upstream, host, url, params)
+        else:
+            fetch = lambda: self._get(host, url, params, timeout)
+        try:
+            response, coalesced = self.coalescer.run(key, fetch)
+        except QuotaExceededError as e:
+            # Joined a lower-priority call that was shed - ask for quota at this caller's priority
+            if not e.outranked_by(current_priority()):
+                raise
+            response, coalesced = self.coalescer.run(key, fetch)
+        if coalesced:
+            with self._lock:
+                self._host_entry(host)['coalesced'] += 1
+        return response
+
+    def _guarded_get(self, upstream, host, url, params):
+        """Queue for quota before entering the guard, so the wait never counts as upstream latency"""
+        self._acquire_quota(upstream, params)
+        return self.guard.call(
+            upstream,
+            lambda: self._get(host, url, params, self.guard.timeout(upstream)),
+            is_failure=lambda response: response.status_code in self.RETRY_STATUSES,
+            hedge=True,  # GETs are idempotent
+            can_hedge=lambda: self._try_quota(upstream, params)
+        )
+
+    @staticmethod
+    def quota_key(params):
+        """API key a GET is metered against (Google keys travel as `key`, OpenWeatherMap as `appid`)"""
+        return (params or {}).get('key') or (params or {}).get('appid')
+
+    def _acquire_quota(self, upstream, params):
+        if self.scheduler and self.scheduler.meters(upstream):
+            try:
+                self.scheduler.acquire(upstream, self.quota_key(params))
+            except QuotaExceededError:
+                metrics.upstream_errors.inc(upstream, 'quota_shed')
+                raise
+
+    def _try_quota(self, upstream, params):
+        """Spend a token on a hedged duplicate only if one is free right now - hedges never queue"""
+        if not (self.scheduler and self.scheduler.meters(upstream)):
+            return True
+        return self.scheduler.try_acquire(upstream, self.quota_key(params), current_priority()) == 0
+
+    def _get(self, host, url, params, timeout):
+        with self._lock:
+            self._host_entry(host)['requests'] += 1
+        try:
+            return self.session.get(url, params=params, timeout=timeout)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._host_entry(host)['errors'] += 1
+            raise
+
+    def get_stats(self):
+        """Get connection reuse counters per upstream host"""
+        with self._lock:
+            hosts = {}
+            for host, entry in self._host_stats.items():
+                hosts[host] = {
+                    **entry,
+                    'reused_connections': max(entry['requests'] - entry['new_connections'], 0)
+                }
+
+        total_requests = sum(entry['requests'] for entry in hosts.values())
+        total_new = sum(entry['new_connections'] for entry in hosts.values())
+        return {
+            'pool_connections': self.pool_connections,
+            'pool_maxsize': self.pool_maxsize,
+            'max_retries': self.max_retries,
+            'requests': total_requests,
+            'new_connections': total_new,
+            'reused_connections': max(total_requests - total_new, 0),
+            'coalesced': sum(entry['coalesced'] for entry in hosts.values()),
+            'in_flight': self.coalescer.in_flight(),
+            'hosts': hosts
+        }
+
+def load_genai():
+    """Import google.generativeai on first use - the SDK takes over a second to import"""
+    import google.generativeai as genai
+    return genai
+
 # Configuration
 class Config:
+    """API keys read at import; the Gemini model is built on first use and nothing here touches the network"""
+    
     def __init__(self):
         self.gemini_api_key = os.getenv('GEMINI_API_KEY')
         self.google_api_key = os.getenv('GOOGLE_API_KEY')
         self.openweathermap_api_key = os.getenv('OPENWEATHERMAP_API_KEY')
-        self.gemini_model = None
-        self.setup_apis()
+        self.gemini_model_name = None
+        self.gemini_state = 'not_loaded' if self.gemini_api_key else 'missing_key'  # not_loaded, ready or failed
+        self._gemini_model = None
+        self._gemini_lock = threading.Lock()
+        if not self.gemini_api_key:
+            print("❌ GEMINI_API_KEY not found in environment variables")
+        if not self.google_api_key:
+            print("❌ GOOGLE_API_KEY not found in environment variables")
+    
+    @property
+    def gemini_model(self):
+        """Gemini model, created (and the SDK imported) by whichever caller needs it first"""
+        if self.gemini_state == 'not_loaded':
+            with self._gemini_lock:
+                if self.gemini_state == 'not_loaded':
+                    self.setup_gemini()
+        return self._gemini_model
     
-    def setup_apis(self):
-        """Initialize all API services"""
-        self.setup_gemini()
-        self.validate_google_apis()
+    def set_gemini_model(self, model, model_name):
+        """Use an already built model, e.g. the local fake used by the offline benchmarks"""
+        with self._gemini_lock:
+            self._gemini_model = model
+            self.gemini_model_name = model_name
+            self.gemini_state = 'ready'
+    
+    @property
+    def gemini_available(self):
+        """Whether Gemini is usable, without loading the model"""
+        return self.gemini_state in ('not_loaded', 'ready')
     
     def setup_gemini(self):
         """Initialize Gemini AI model"""
-        if not self.gemini_api_key:
-            print("❌ GEMINI_API_KEY not found in environment variables")
-            return
-        
         try:
+            genai = load_genai()
             genai.configure(api_key=self.gemini_api_key)
-            self.gemini_model = genai.GenerativeModel('gemini-2.5-flash')
+            self._gemini_model = genai.GenerativeModel('gemini-2.5-flash')
+            self.gemini_model_name = 'gemini-2.5-flash'
             print("✅ Gemini 2.5 Flash model initialized successfully")
         except Exception as e:
             print(f"❌ Gemini initialization error: {e}")
             # Fallback to gemini-pro if 2.0 flash is not available
             try:
-                self.gemini_model = genai.GenerativeModel('gemini-pro')
+                self._gemini_model = load_genai().GenerativeModel('gemini-pro')
+                self.gemini_model_name = 'gemini-pro'
                 print("✅ Gemini Pro model initialized (fallback)")
             except Exception as e2:
                 print(f"❌ Gemini fallback error: {e2}")
-                self.gemini_model = None
+                self._gemini_model = None
+        self.gemini_state = 'ready' if self._gemini_model is not None else 'failed'
     
     def validate_google_apis(self):
         """Validate Google API key works with various services"""
         if not self.google_api_key:
-            print("❌ GOOGLE_API_KEY not found in environment variables")
-            return
+            return {'ok': False, 'error': 'GOOGLE_API_KEY not configured'}
         
         print("🔧 Validating Google API services...")
         
         # Test Geocoding API
         try:
-            test_url = f"https://maps.googleapis.com/maps/api/geocode/json?address=Paris&key={self.google_api_key}"
-            response = requests.get(test_url, timeout=5)
+            test_url = f"{GOOGLE_MAPS_API_URL}/geocode/json?address=Paris&key={self.google_api_key}"
+            response = http_client.get(test_url, timeout=5)
             if response.status_code == 200:
                 print("✅ Google APIs accessible (tested with Geocoding)")
-            else:
-                print(f"⚠️ Google API warning: Status {response.status_code}")
+                return {'ok': True, 'status_code': response.status_code}
+            print(f"⚠️ Google API warning: Status {response.status_code}")
+            return {'ok': False, 'status_code': response.status_code}
         except Exception as e:
             print(f"⚠️ Could not validate Google APIs: {e}")
+            return {'ok': False, 'error': str(e)}
     
     def get_api_status(self):
         """Get status of all configured APIs"""
         return {
-            'gemini_available': self.gemini_model is not None,
+            'gemini_available': self.gemini_available,
             'google_api_available': self.google_api_key is not None,
             'supported_apis': [
                 'Weather API',
@@ -93,44 +1096,234 @@ class Config:
             ]
         }
 
+# Geocoding cache
+class GeocodeCache:
+    """Persistent SQLite cache for geocoding results with TTL and LRU eviction"""
+    
+    COUNTRY_ALIASES = {
+        'usa': 'united states', 'us': 'united states', 'united states of america': 'united states',
+        'america': 'united states',
+        'uk': 'united kingdom', 'great britain': 'united kingdom', 'gb': 'united kingdom',
+        'uae': 'united arab emirates',
+        'south korea': 'korea', 'republic of korea': 'korea',
+        'czechia': 'czech republic',
+        'holland': 'netherlands', 'the netherlands': 'netherlands'
+    }
+    
+    def __init__(self, path=None, ttl=None, negative_ttl=None, max_entries=None, reverse_precision=None):
+        self.path = path or os.getenv('GEOCODE_CACHE_PATH', os.path.join('.cache', 'geocode.sqlite3'))
+        self.ttl = ttl or int(os.getenv('GEOCODE_CACHE_TTL', 30 * 24 * 3600))
+        self.negative_ttl = negative_ttl or int(os.getenv('GEOCODE_NEGATIVE_TTL', 24 * 3600))
+        self.max_entries = max_entries or int(os.getenv('GEOCODE_CACHE_MAX_ENTRIES', 10000))
+        self.reverse_precision = reverse_precision if reverse_precision is not None else int(os.getenv('REVERSE_GEOCODE_PRECISION', 4))
+        # Hits update last_access in memory and are written in batches, so a hit never commits
+        self.access_flush_size = int(os.getenv('GEOCODE_ACCESS_FLUSH_SIZE', 100))
+        self._accessed = {}  # key -> last hit time not yet written to last_access
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'stores': 0, 'expired': 0, 'evictions': 0}
+        self._conn = self._connect()
+    
+    def _connect(self):
+        try:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ Geocode cache at {self.path} unavailable ({e}), using in-memory cache")
+            self.path = ':memory:'
+            conn = sqlite3.connect(':memory:', check_same_thread=False)
+        conn.execute("""CREATE TABLE IF NOT EXISTS geocode_cache (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            negative INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS geocode_cache_lru ON geocode_cache (last_access)")
+        conn.commit()
+        return conn
+    
+    @classmethod
+    def normalize_address(cls, address):
+        """Normalize case, whitespace, punctuation and country aliases"""
+        address = unicodedata.normalize('NFKC', str(address)).lower()
+        parts = []
+        for part in address.split(','):
+            part = re.sub(r"[^\w\s]", '', part)
+            part = re.sub(r'\s+', ' ', part).strip()
+            if part:
+                parts.append(cls.COUNTRY_ALIASES.get(part, part))
+        return ', '.join(parts)
+    
+    def address_key(self, address):
+        return f"fwd:{self.normalize_address(address)}"
+    
+    def coordinates_key(self, lat, lng):
+        precision = self.reverse_precision
+        return f"rev:{float(lat):.{precision}f},{float(lng):.{precision}f}"
+    
+    def get(self, key):
+        """Return a cached geocoding response or None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, negative, expires_at FROM geocode_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            value, negative, expires_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM geocode_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self._accessed.pop(key, None)
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._accessed[key] = now
+            if len(self._accessed) >= self.access_flush_size:
+                self._flush_access()
+                self._conn.commit()
+            self.stats['negative_hits' if negative else 'hits'] += 1
+        return json.loads(value)
+    
+    def set(self, key, result):
+        """Store a geocoding response; only definitive answers are cached"""
+        status = result.get('status') if isinstance(result, dict) else None
+        if status == 'OK' and result.get('results'):
+            negative = False
+        elif status == 'ZERO_RESULTS':
+            negative = True  # "Location not found" is cached for a shorter time
+        else:
+            return
+        
+        now = time.time()
+        expires_at = now + (self.negative_ttl if negative else self.ttl)
+        with self._lock:
+            self._flush_access()  # Eviction below needs the real LRU order
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode_cache (key, value, negative, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(result), int(negative), expires_at, now)
+            )
+            self.stats['stores'] += 1
+            self._evict()
+            self._conn.commit()
+    
+    def _flush_access(self):
+        """Write the pending last_access times (lock held, caller commits)"""
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE geocode_cache SET last_access = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._accessed.items()]
+            )
+            self._accessed.clear()
+    
+    def _evict(self):
+        """Drop the least recently used entries beyond max_entries (lock held)"""
+        count = self._conn.execute("SELECT COUNT(*) FROM geocode_cache").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM geocode_cache WHERE key IN (SELECT key FROM geocode_cache ORDER BY last_access LIMIT ?)",
+                (excess,)
+            )
+            self.stats['evictions'] += excess
+    
+    def get_stats(self):
+        """Get hit/miss statistics for /api/status"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM geocode_cache").fetchone()[0]
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['negative_hits'] + stats['misses']
+        return {
+            **stats,
+            'entries': entries,
+            'hit_ratio': round((stats['hits'] + stats['negative_hits']) / lookups, 3) if lookups else None,
+            'persistent': self.path != ':memory:'
+        }
+
 # Google API Service Classes
 class GoogleAPIService:
     """Base service class for Google APIs"""
     
+    # First endpoint path segment -> circuit breaker name
+    UPSTREAMS = {'geocode': 'geocode', 'place': 'places', 'timezone': 'timezone', 'directions': 'directions'}
+    
     def __init__(self, api_key):
         self.api_key = api_key
-        self.base_url = "https://maps.googleapis.com/maps/api"
+        self.base_url = GOOGLE_MAPS_API_URL
+    
+    @classmethod
+    def upstream_for(cls, endpoint):
+        return cls.UPSTREAMS[endpoint.split('/')[0]]
+    
+    @staticmethod
+    def fallback_key(endpoint, params):
+        """Last-known response key; the key and per-call timestamp don't change the answer much"""
+        return (endpoint, tuple(sorted((name, str(value)) for name, value in params.items() if name not in ('key', 'timestamp'))))
     
     def make_request(self, endpoint, params=None):
         """Make a request to Google API with error handling"""
+        if params is None:
+            params = {}
+        fallback_key = self.fallback_key(endpoint, params)
+        started = time.time()
         try:
-            if params is None:
-                params = {}
             params['key'] = self.api_key
             
-            response = requests.get(f"{self.base_url}/{endpoint}", params=params, timeout=10)
+            response = http_client.get(f"{self.base_url}/{endpoint}", params=params, upstream=self.upstream_for(endpoint))
             response.raise_for_status()
-            return response.json()
+            result = response.json()
+            if result.get('status') in (None, 'OK'):
+                upstream_guard.remember(fallback_key, result)
+            metrics.google_api_latency.observe(time.time() - started, endpoint, result.get('status') or 'OK')
+            return result
         except requests.exceptions.RequestException as e:
             print(f"API request error: {e}")
+            metrics.google_api_latency.observe(time.time() - started, endpoint, 'error')
+            # Open circuit or failed call: serve the last good answer if there is one
+            last_known = upstream_guard.last_known(fallback_key)
+            if last_known is not None:
+                return last_known
             return {"error": str(e)}
 
 class GeocodingService(GoogleAPIService):
     """Google Geocoding API service"""
     
+    def __init__(self, api_key, cache=None):
+        super().__init__(api_key)
+        self.cache = cache
+    
+    def _cached_request(self, key, params):
+        if self.cache is None:
+            return self.make_request('geocode/json', params)
+        
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        result = self.make_request('geocode/json', params)
+        if not result.get('stale'):
+            self.cache.set(key, result)
+        return result
+    
+    @traced('geocode')
     def get_coordinates(self, address):
         """Get latitude and longitude for an address"""
         params = {'address': address}
-        return self.make_request('geocode/json', params)
+        key = self.cache.address_key(address) if self.cache else None
+        return self._cached_request(key, params)
     
+    @traced('reverse_geocode')
     def reverse_geocode(self, lat, lng):
         """Get address from coordinates"""
         params = {'latlng': f"{lat},{lng}"}
-        return self.make_request('geocode/json', params)
+        key = self.cache.coordinates_key(lat, lng) if self.cache else None
+        return self._cached_request(key, params)
 
 class PlacesService(GoogleAPIService):
     """Google Places API service"""
     
+    @traced('places.nearby')
     def search_nearby(self, lat, lng, place_type, radius=5000):
         """Search for nearby places"""
         params = {
@@ -140,11 +1333,13 @@ class PlacesService(GoogleAPIService):
         }
         return self.make_request('place/nearbysearch/json', params)
     
+    @traced('places.details')
     def get_place_details(self, place_id):
         """Get detailed information about a place"""
         params = {'place_id': place_id}
         return self.make_request('place/details/json', params)
     
+    @traced('places.text_search')
     def text_search(self, query, location=None, radius=50000):
         """Search for places by text query"""
         params = {'query': query}
@@ -156,6 +1351,7 @@ class PlacesService(GoogleAPIService):
 class DirectionsService(GoogleAPIService):
     """Google Directions API service"""
     
+    @traced('directions')
     def get_directions(self, origin, destination, mode='driving', waypoints=None):
         """Get directions between locations"""
         params = {
@@ -170,6 +1366,7 @@ class DirectionsService(GoogleAPIService):
 class TimeZoneService(GoogleAPIService):
     """Google Time Zone API service"""
     
+    @traced('timezone')
     def get_timezone(self, lat, lng, timestamp=None):
         """Get timezone information for coordinates"""
         import time
@@ -182,15 +1379,157 @@ class TimeZoneService(GoogleAPIService):
         }
         return self.make_request('timezone/json', params)
 
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+def encode_geohash(lat, lng, precision=5):
+    """Encode coordinates as a geohash cell id (precision 5 is roughly 5km x 5km)"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        value, bounds = (float(lng), lng_range) if even else (float(lat), lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(geohash)
+
+class WeatherCache:
+    """Weather cache keyed by geohash cell, with merged concurrent misses and stale fallback"""
+    
+    def __init__(self, precision=None, current_ttl=None, forecast_ttl=None, max_stale=None, max_entries=None):
+        self.precision = precision or int(os.getenv('WEATHER_CACHE_PRECISION', 5))
+        # OpenWeatherMap refreshes current conditions ~every 10 minutes and forecasts ~every 3 hours
+        self.ttls = {
+            'current': current_ttl or int(os.getenv('WEATHER_CURRENT_TTL', 600)),
+            'forecast': forecast_ttl or int(os.getenv('WEATHER_FORECAST_TTL', 3 * 3600))
+        }
+        self.max_stale = max_stale or int(os.getenv('WEATHER_MAX_STALE', 24 * 3600))
+        self.max_entries = max_entries or int(os.getenv('WEATHER_CACHE_MAX_ENTRIES', 2048))
+        self._entries = OrderedDict()  # key -> (data, fetched timestamp)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'stale_served': 0, 'evictions': 0}
+    
+    def make_key(self, kind, lat, lng, variant=''):
+        return f"{kind}{variant}:{encode_geohash(lat, lng, self.precision)}"
+    
+    def get_or_fetch(self, kind, key, fetch, wait_timeout=15):
+        """Return fresh cached data or call fetch() once per key for all concurrent callers.
+        
+        fetch returns (data, ok). When it fails, the last known data for the cell is
+        returned marked as stale; None means there is nothing to fall back to.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[1] < self.ttls[kind]:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[0]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = {'event': threading.Event(), 'result': None}
+                self._inflight[key] = flight
+                self.stats['misses'] += 1
+            else:
+                self.stats['coalesced'] += 1
+        
+        if not leader:
+            flight['event'].wait(wait_timeout)
+            if flight['result'] is not None:
+                return flight['result']
+            return self.stale(key)
+        
+        result = None
+        try:
+            data, ok = fetch()
+            if ok:
+                result = data
+                self.store(key, data)
+            else:
+                result = self.stale(key)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight['result'] = result
+            flight['event'].set()
+        return result
+    
+    def lookup(self, kind, key):
+        """Fresh cached data for a key, or None (for callers doing their own fetching)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[1] < self.ttls[kind]:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[0]
+        return None
+    
+    def store(self, key, data):
+        """Save freshly fetched data for a key"""
+        with self._lock:
+            self._entries[key] = (data, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+    
+    def count(self, stat):
+        """Bump a counter for lookups resolved outside get_or_fetch"""
+        with self._lock:
+            self.stats[stat] += 1
+    
+    def stale(self, key):
+        """Last known data for a key, if it is not too old"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry or time.time() - entry[1] > self.max_stale:
+                return None
+            self.stats['stale_served'] += 1
+        metrics.fallbacks.inc('weather_stale')
+        data, fetched_at = entry
+        return {
+            **data,
+            'stale': True,
+            'fetched_at': datetime.fromtimestamp(fetched_at).isoformat(),
+            'note': 'Last known data - OpenWeatherMap API unavailable'
+        }
+    
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            entries = len(self._entries)
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        return {
+            **stats,
+            'entries': entries,
+            'precision': self.precision,
+            'hit_ratio': round((stats['hits'] + stats['coalesced']) / lookups, 3) if lookups else None
+        }
+
 class WeatherService:
     """Weather service using OpenWeatherMap API"""
     
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache=None):
         self.api_key = api_key
-        self.base_url = "https://api.openweathermap.org/data/2.5"
+        self.base_url = OPENWEATHERMAP_API_URL
+        self.cache = cache
     
-    def get_current_weather(self, lat, lng):
-        """Get current weather for coordinates"""
+    def _fetch_current_weather(self, lat, lng):
         try:
             params = {
                 'lat': lat,
@@ -198,18 +1537,15 @@ class WeatherService:
                 'appid': self.api_key,
                 'units': 'metric'
             }
-            response = requests.get(f"{self.base_url}/weather", params=params, timeout=10)
+            response = http_client.get(f"{self.base_url}/weather", params=params, upstream='weather')
             if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"OpenWeatherMap API error: {response.status_code}")
-                return self._get_fallback_weather()
+                return response.json(), True
+            print(f"OpenWeatherMap API error: {response.status_code}")
         except Exception as e:
             print(f"Weather API error: {e}")
-            return self._get_fallback_weather()
+        return None, False
     
-    def get_forecast(self, lat, lng, days=5):
-        """Get weather forecast for coordinates"""
+    def _fetch_forecast(self, lat, lng, days):
         try:
             params = {
                 'lat': lat,
@@ -218,65 +1554,172 @@ class WeatherService:
                 'units': 'metric',
                 'cnt': days * 8  # 8 forecasts per day (3-hour intervals)
             }
-            response = requests.get(f"{self.base_url}/forecast", params=params, timeout=10)
+            response = http_client.get(f"{self.base_url}/forecast", params=params, upstream='weather')
             if response.status_code == 200:
-                return response.json()
-            else:
-                return {"error": "Forecast data unavailable"}
+                return response.json(), True
         except Exception as e:
             print(f"Weather forecast API error: {e}")
+        return None, False
+    
+    @traced('weather.current')
+    def get_current_weather(self, lat, lng):
+        """Get current weather for coordinates"""
+        if self.cache:
+            weather = self.cache.get_or_fetch(
+                'current', self.cache.make_key('current', lat, lng),
+                lambda: self._fetch_current_weather(lat, lng)
+            )
+        else:
+            weather, _ = self._fetch_current_weather(lat, lng)
+        return weather if weather is not None else self.get_fallback_weather()
+    
+    @traced('weather.forecast')
+    def get_forecast(self, lat, lng, days=5):
+        """Get weather forecast for coordinates"""
+        if self.cache:
+            forecast = self.cache.get_or_fetch(
+                'forecast', self.cache.make_key('forecast', lat, lng, variant=f"/{days}"),
+                lambda: self._fetch_forecast(lat, lng, days)
+            )
+        else:
+            forecast, _ = self._fetch_forecast(lat, lng, days)
+        if forecast is None:
+            metrics.fallbacks.inc('forecast_unavailable')
             return {"error": "Forecast data unavailable"}
+        return forecast
     
-    def _get_fallback_weather(self):
+    @staticmethod
+    def get_fallback_weather():
         """Return fallback weather data when API is unavailable"""
+        metrics.fallbacks.inc('weather_sample')
         return {
             "weather": [{"main": "Clear", "description": "clear sky"}],
             "main": {"temp": 22, "feels_like": 25, "humidity": 60},
             "wind": {"speed": 3.5},
             "name": "Location",
+            "sample": True,
             "note": "Sample data - OpenWeatherMap API unavailable"
         }
 
 class CurrencyService:
     """Currency conversion service using free Exchange Rates API"""
     
-    def __init__(self):
-        self.base_url = "https://api.exchangerate-api.com/v4/latest"
-        self.cache = {}
-        self.cache_duration = 3600  # 1 hour cache
-        
-    def get_exchange_rate(self, from_currency, to_currency="USD"):
-        """Get exchange rate between two currencies"""
-        cache_key = f"{from_currency}_{to_currency}"
-        current_time = datetime.now()
-        
-        # Check cache first
-        if cache_key in self.cache:
-            cached_data, cached_time = self.cache[cache_key]
-            if (current_time - cached_time).seconds < self.cache_duration:
-                return cached_data
-        
+    def __init__(self, base_currency=None, cache_duration=None):
+        self.base_url = EXCHANGERATE_API_URL
+        # One full table for a single base currency; every other pair is derived from it
+        self.base_currency = base_currency or os.getenv('CURRENCY_BASE', 'USD')
+        self.cache_duration = cache_duration or int(os.getenv('CURRENCY_CACHE_DURATION', 3600))  # 1 hour cache
+        self._table = None  # (rates dict, fetched datetime) - replaced as a whole, never mutated
+        self._refresh_lock = threading.Lock()
+    
+    def _fetch_rates(self):
+        """Download the rate table for the base currency"""
         try:
-            response = requests.get(f"{self.base_url}/{from_currency}", timeout=10)
+            response = http_client.get(f"{self.base_url}/{self.base_currency}", upstream='currency')
             if response.status_code == 200:
-                data = response.json()
-                rate = data.get('rates', {}).get(to_currency, 1)
-                self.cache[cache_key] = (rate, current_time)
-                return rate
-            else:
-                return 1  # Fallback rate
+                return self.parse_rates(response.json())
         except Exception as e:
             print(f"Currency API error: {e}")
-            return 1  # Fallback rate
+        return None
+    
+    def parse_rates(self, payload):
+        """Rate table from an exchangerate-api response body, or None"""
+        rates = payload.get('rates', {})
+        if rates:
+            return {**rates, self.base_currency: 1}
+        return None
+    
+    def set_rates(self, rates):
+        """Swap in a freshly fetched rate table"""
+        self._table = (rates, datetime.now())
+    
+    def has_rates(self):
+        return self._table is not None
+    
+    def refresh_rates(self):
+        """Fetch a new rate table and swap it in atomically"""
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # Another thread is already refreshing
+        self._refresh_locked()
+    
+    def _refresh_locked(self):
+        try:
+            rates = self._fetch_rates()
+            if rates:
+                self.set_rates(rates)
+        finally:
+            self._refresh_lock.release()
+    
+    def refresh_rates_async(self):
+        """Refresh the rate table in a background thread, unless a refresh is already running"""
+        # Taken here rather than in the thread, so a burst of stale reads starts a single refresh
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        threading.Thread(target=self._refresh_locked, name='currency-refresh', daemon=True).start()
+    
+    def _is_stale(self, table):
+        return (datetime.now() - table[1]).total_seconds() >= self.cache_duration
+    
+    @traced('currency.rates')
+    def get_rates(self):
+        """Get the current rate table, blocking only when no table has been loaded yet"""
+        table = self._table
+        if table is None:
+            # Cold start: wait for whichever thread is fetching the first table
+            with self._refresh_lock:
+                if self._table is None:
+                    rates = self._fetch_rates()
+                    if rates:
+                        self.set_rates(rates)
+            table = self._table
+            if table is None:
+                return {}
+        elif self._is_stale(table):
+            # Keep serving the old table while a background refresh runs
+            self.refresh_rates_async()
+        return table[0]
+    
+    def get_exchange_rate_with_source(self, from_currency, to_currency="USD"):
+        """(rate, source) where source is 'same_currency', 'rate_table' or 'default' (a placeholder 1.0)"""
+        if from_currency == to_currency:
+            return 1, 'same_currency'
+        
+        rates = self.get_rates()
+        from_rate = rates.get(from_currency)
+        to_rate = rates.get(to_currency)
+        if not from_rate or not to_rate:
+            metrics.fallbacks.inc('currency_default_rate')
+            return 1, 'default'  # Fallback rate
+        # Both rates are quoted against the base currency
+        return to_rate / from_rate, 'rate_table'
+    
+    def get_exchange_rate(self, from_currency, to_currency="USD"):
+        """Get exchange rate between two currencies"""
+        return self.get_exchange_rate_with_source(from_currency, to_currency)[0]
     
     def convert_price(self, amount, from_currency, to_currency="USD"):
-        """Convert price from one currency to another"""
+        """Convert a price, or a list of prices, from one currency to another"""
+        if isinstance(amount, (list, tuple)):
+            if from_currency == to_currency:
+                return list(amount)
+            rate = self.get_exchange_rate(from_currency, to_currency)
+            return [round(value * rate, 2) for value in amount]
+        
         if from_currency == to_currency:
             return amount
         
         rate = self.get_exchange_rate(from_currency, to_currency)
         return round(amount * rate, 2)
     
+    def get_stats(self):
+        """Get rate table freshness for /api/status"""
+        table = self._table
+        return {
+            'base_currency': self.base_currency,
+            'currencies': len(table[0]) if table else 0,
+            'age_seconds': round((datetime.now() - table[1]).total_seconds(), 1) if table else None
+        }
+    
     def format_price_with_conversion(self, local_amount, local_currency, destination_country=None):
         """Format price showing both local and USD equivalent"""
         if local_currency == "USD":
@@ -291,109 +1734,903 @@ class CurrencyService:
             "SEK": "kr", "NOK": "kr", "DKK": "kr", "THB": "฿"
         }
         
-        symbol = symbols.get(local_currency, local_currency)
-        return f"{symbol}{local_amount} (~${usd_amount} USD)"
+        symbol = symbols.get(local_currency, local_currency)
+        return f"{symbol}{local_amount} (~${usd_amount} USD)"
+    
+    def get_country_currency(self, country):
+        """Get the primary currency for a country"""
+        currency_map = {
+            "United States": "USD", "USA": "USD", "US": "USD",
+            "United Kingdom": "GBP", "UK": "GBP", "England": "GBP", "Britain": "GBP",
+            "France": "EUR", "Germany": "EUR", "Italy": "EUR", "Spain": "EUR", 
+            "Netherlands": "EUR", "Austria": "EUR", "Belgium": "EUR", "Portugal": "EUR",
+            "Japan": "JPY", "China": "CNY", "India": "INR", "Canada": "CAD",
+            "Australia": "AUD", "Switzerland": "CHF", "Sweden": "SEK", 
+            "Norway": "NOK", "Denmark": "DKK", "Thailand": "THB",
+            "South Korea": "KRW", "Singapore": "SGD", "Hong Kong": "HKD",
+            "Mexico": "MXN", "Brazil": "BRL", "Russia": "RUB", "Turkey": "TRY"
+        }
+        
+        # Try exact match first
+        if country in currency_map:
+            return currency_map[country]
+        
+        # Try partial matching
+        country_lower = country.lower()
+        for country_name, currency in currency_map.items():
+            if country_lower in country_name.lower() or country_name.lower() in country_lower:
+                return currency
+        
+        return "USD"  # Default fallback
+
+class RoadsService(GoogleAPIService):
+    """Google Roads API service"""
+    
+    def __init__(self, api_key):
+        super().__init__(api_key)
+        self.roads_base_url = GOOGLE_ROADS_API_URL
+    
+    @traced('roads.snap')
+    def snap_to_roads(self, path, interpolate=False):
+        """Snap GPS coordinates to road network"""
+        params = {
+            'path': path,
+            'interpolate': interpolate,
+            'key': self.api_key
+        }
+        try:
+            response = http_client.get(f"{self.roads_base_url}/snapToRoads", params=params, upstream='roads')
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+# Service Manager
+class GoogleServicesManager:
+    """Manager for all Google API services"""
+    
+    def __init__(self, google_api_key, openweathermap_api_key, geocode_cache=None, weather_cache=None):
+        self.api_key = google_api_key
+        self.geocoding = GeocodingService(google_api_key, cache=geocode_cache)
+        self.places = PlacesService(google_api_key)
+        self.directions = DirectionsService(google_api_key)
+        self.timezone = TimeZoneService(google_api_key)
+        self.weather = WeatherService(openweathermap_api_key, cache=weather_cache)  # Use OpenWeatherMap API key
+        self.roads = RoadsService(google_api_key)
+        # Bounded pool for the independent lookups that follow geocoding
+        self.fanout_timeout = float(os.getenv('LOCATION_FANOUT_TIMEOUT', 8))
+        self.fanout_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('LOCATION_FANOUT_WORKERS', 16)),
+            thread_name_prefix='location-fanout'
+        )
+    
+    def _fan_out(self, calls, timeout):
+        """Run independent service calls concurrently, keeping whatever succeeds"""
+        # Each call keeps the caller's priority class
+        futures = {
+            name: self.fanout_executor.submit(contextvars.copy_context().run, func, *args)
+            for name, (func, args) in calls.items()
+        }
+        done, _ = wait(futures.values(), timeout=timeout)
+        
+        results = {}
+        failures = []
+        for name, future in futures.items():
+            if future not in done:
+                future.cancel()
+                results[name] = {"error": f"Timed out after {timeout}s"}
+            else:
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    results[name] = {"error": str(e)}
+            if isinstance(results[name], dict) and 'error' in results[name]:
+                failures.append(name)
+        return results, failures
+    
+    @traced('location_info')
+    def get_location_info(self, location_query, geocode_result=None):
+        """Get comprehensive information about a location"""
+        try:
+            # Step 1: Geocode the location (unless the caller already has)
+            if geocode_result is None:
+                geocode_result = self.geocoding.get_coordinates(location_query)
+            if 'error' in geocode_result or 'results' not in geocode_result or not geocode_result['results']:
+                return {"error": "Location not found"}
+            
+            location_data = geocode_result['results'][0]
+            lat = location_data['geometry']['location']['lat']
+            lng = location_data['geometry']['location']['lng']
+            formatted_address = location_data['formatted_address']
+            
+            # Step 2: Timezone, weather and nearby places only need the coordinates,
+            # so fetch them concurrently
+            results, failures = self._fan_out({
+                'timezone': (self.timezone.get_timezone, (lat, lng)),
+                'weather': (self.weather.get_current_weather, (lat, lng)),
+                'attractions': (self.places.search_nearby, (lat, lng, 'tourist_attraction')),
+                'restaurants': (self.places.search_nearby, (lat, lng, 'restaurant'))
+            }, self.fanout_timeout)
+            
+            location_info = {
+                'location': {
+                    'address': formatted_address,
+                    'coordinates': {'lat': lat, 'lng': lng}
+                },
+                'timezone': results['timezone'],
+                'weather': results['weather'],
+                'nearby': {
+                    'attractions': results['attractions'],
+                    'restaurants': results['restaurants']
+                }
+            }
+            if failures:
+                location_info['partial'] = True
+                location_info['failed_sources'] = failures
+            return location_info
+        except Exception as e:
+            return {"error": f"Failed to get location info: {str(e)}"}
+
+# Popular destinations with coordinates and safety ratings
+POPULAR_DESTINATIONS = [
+    {"name": "Paris", "country": "France", "emoji": "🗼", "lat": 48.8566, "lng": 2.3522, "category": ["city", "popular", "cultural"], "safety_rating": 4.2, "safety_tips": "Be aware of pickpockets in tourist areas"},
+    {"name": "Tokyo", "country": "Japan", "emoji": "🏯", "lat": 35.6762, "lng": 139.6503, "category": ["city", "popular", "cultural"], "safety_rating": 4.8, "safety_tips": "Very safe city with excellent public safety"},
+    {"name": "New York", "country": "USA", "emoji": "🗽", "lat": 40.7128, "lng": -74.0060, "category": ["city", "popular"], "safety_rating": 4.0, "safety_tips": "Stay alert in busy areas, avoid isolated places at night"},
+    {"name": "London", "country": "UK", "emoji": "🇬🇧", "lat": 51.5074, "lng": -0.1278, "category": ["city", "popular", "cultural"], "safety_rating": 4.3, "safety_tips": "Generally safe, watch for petty theft in crowded areas"},
+    {"name": "Dubai", "country": "UAE", "emoji": "🏙️", "lat": 25.2048, "lng": 55.2708, "category": ["city", "popular"], "safety_rating": 4.6, "safety_tips": "Very safe with strict laws and good security"},
+    {"name": "Reykjavik", "country": "Iceland", "emoji": "🌋", "lat": 64.1466, "lng": -21.9426, "category": ["nature", "adventure"], "safety_rating": 4.9, "safety_tips": "Extremely safe, main concerns are weather-related"},
+    {"name": "Cape Town", "country": "South Africa", "emoji": "🦁", "lat": -33.9249, "lng": 18.4241, "category": ["nature", "adventure", "cultural"], "safety_rating": 3.5, "safety_tips": "Avoid walking alone at night, stay in safe neighborhoods"},
+    {"name": "Maldives", "country": "Maldives", "emoji": "🏖️", "lat": 3.2028, "lng": 73.2207, "category": ["beach", "popular"], "safety_rating": 4.7, "safety_tips": "Very safe resorts, follow water safety guidelines"},
+    {"name": "Bali", "country": "Indonesia", "emoji": "🌺", "lat": -8.3405, "lng": 115.0920, "category": ["beach", "cultural", "nature"], "safety_rating": 4.1, "safety_tips": "Generally safe, be cautious with street food and water"},
+    {"name": "Kyoto", "country": "Japan", "emoji": "🎌", "lat": 35.0116, "lng": 135.7681, "category": ["cultural", "nature"], "safety_rating": 4.8, "safety_tips": "Extremely safe with very low crime rates"},
+    {"name": "Petra", "country": "Jordan", "emoji": "🏜️", "lat": 30.3285, "lng": 35.4444, "category": ["cultural", "adventure"], "safety_rating": 4.0, "safety_tips": "Generally safe, follow tour guides and stay hydrated"},
+    {"name": "Barcelona", "country": "Spain", "emoji": "🏖️", "lat": 41.3851, "lng": 2.1734, "category": ["city", "beach", "cultural"], "safety_rating": 4.1, "safety_tips": "Watch for pickpockets, especially in tourist areas"},
+]
+
+def build_basic_destination_data(dest):
+    """Destination entry without live data, used until the snapshot has real data"""
+    return {
+        **dest,
+        'weather': 'Data unavailable',
+        'timezone': 'UTC',
+        'safety_rating': dest.get('safety_rating', 4.0),
+        'safety_tips': dest.get('safety_tips', 'Follow standard travel safety precautions'),
+        'description': f"Discover the wonders of {dest['name']}, {dest['country']}."
+    }
+
+def build_destination_data(dest):
+    """Fetch live weather and timezone data for a popular destination"""
+    weather = "Weather data unavailable"
+    timezone = "UTC"
+    partial = False
+    
+    if google_services:
+        # get_location_info already includes current weather, so one lookup covers both
+        location_name = f"{dest['name']}, {dest['country']}"
+        location_info = google_services.get_location_info(location_name)
+        
+        weather_data = location_info.get('weather')
+        # Built from a failed lookup or fallback weather - never cached publicly (see CachePolicy)
+        partial = any(source.get(marker) for source in (location_info, weather_data or {})
+                      for marker in ('error', 'partial', 'stale', 'sample'))
+        if weather_data and 'main' in weather_data:
+            temp = round(weather_data['main']['temp'])
+            desc = weather_data['weather'][0]['description'].title() if 'weather' in weather_data and weather_data['weather'] else 'Clear'
+            weather = f"{temp}°C, {desc}"
+        
+        if 'timezone' in location_info:
+            tz_data = location_info['timezone']
+            if isinstance(tz_data, dict) and 'timeZoneName' in tz_data:
+                timezone = tz_data['timeZoneName']
+            else:
+                timezone = str(tz_data)
+    
+    entry = {
+        **dest,
+        'weather': weather,
+        'timezone': timezone,
+        'safety_rating': dest.get('safety_rating', 4.0),
+        'safety_tips': dest.get('safety_tips', 'Follow standard travel safety precautions'),
+        'description': f"Explore the amazing {dest['name']} with its unique culture, attractions, and experiences."
+    }
+    if partial:
+        entry['partial'] = True
+    return entry
+
+class DestinationsSnapshot:
+    """In-memory destinations data kept fresh by a background refresher"""
+    
+    def __init__(self, destinations, refresh_interval):
+        self.destinations = destinations
+        self.refresh_interval = refresh_interval
+        self._entries = {}  # name -> (destination data, fetched timestamp)
+        self._version = None  # content hash of the entries, recomputed after each publish
+        self._lock = threading.Lock()
+        self._refresh_requested = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start the background refresher (first refresh runs immediately)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='destinations-refresh', daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while True:
+            with call_priority('background'):
+                self.refresh()
+            self._refresh_requested.wait(self.refresh_interval)
+            self._refresh_requested.clear()
+    
+    def refresh(self):
+        """Rebuild every destination, publishing each one as soon as it is ready"""
+        for dest in self.destinations:
+            try:
+                entry = build_destination_data(dest)
+            except Exception as e:
+                # Keep serving the last good entry for this destination
+                print(f"Destination refresh error for {dest['name']}: {e}")
+                continue
+            with self._lock:
+                self._entries[dest['name']] = (entry, time.time())
+                self._version = None
+    
+    def _wake_if_stale(self, fetched_times):
+        if self._thread is None:
+            self.start()  # Startup warm-up is off - refresh from the first read instead
+            return
+        # Stale-while-revalidate: serve what we have and wake the refresher early
+        if fetched_times and time.time() - min(fetched_times) > self.refresh_interval:
+            self._refresh_requested.set()
+    
+    def version(self):
+        """Content hash of the published entries - the same in every worker holding the same data"""
+        with self._lock:
+            if self._version is None:
+                entries = {name: entry for name, (entry, _) in self._entries.items()}
+                encoded = json.dumps(entries, sort_keys=True, default=str).encode()
+                self._version = hashlib.sha256(encoded).hexdigest()[:32]
+            version = self._version
+            fetched_times = [fetched_at for _, fetched_at in self._entries.values()]
+        self._wake_if_stale(fetched_times)
+        return version
+    
+    def read(self):
+        """Return the current snapshot without blocking on upstream calls"""
+        with self._lock:
+            entries = dict(self._entries)
+        
+        destinations = []
+        for dest in self.destinations:
+            if dest['name'] in entries:
+                destinations.append(entries[dest['name']][0])
+            else:
+                destinations.append(build_basic_destination_data(dest))
+        
+        fetched_times = [fetched_at for _, fetched_at in entries.values()]
+        oldest = min(fetched_times) if fetched_times else None
+        age = time.time() - oldest if oldest is not None else None
+        self._wake_if_stale(fetched_times)
+        
+        return {
+            'destinations': destinations,
+            'warming': len(entries) < len(self.destinations),
+            'age_seconds': round(age, 1) if age is not None else None,
+            'updated_at': datetime.fromtimestamp(max(fetched_times)).isoformat() if fetched_times else None
+        }
+
+# Itinerary cache
+class ItineraryCache:
+    """LRU cache of generated itineraries keyed on a hash of the normalized trip parameters"""
+    
+    SEASONS = {
+        12: 'dec-feb', 1: 'dec-feb', 2: 'dec-feb',
+        3: 'mar-may', 4: 'mar-may', 5: 'mar-may',
+        6: 'jun-aug', 7: 'jun-aug', 8: 'jun-aug',
+        9: 'sep-nov', 10: 'sep-nov', 11: 'sep-nov'
+    }
+    
+    def __init__(self, max_entries=None, ttl=None, path=None):
+        self.max_entries = max_entries or int(os.getenv('ITINERARY_CACHE_MAX_ENTRIES', 256))
+        self.ttl = ttl or int(os.getenv('ITINERARY_CACHE_TTL', 7 * 24 * 3600))
+        # Optional on-disk persistence; memory only when no path is configured
+        self.path = path or os.getenv('ITINERARY_CACHE_PATH')
+        self._entries = OrderedDict()  # key -> {'itinerary', 'created_at', 'generation_seconds'}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'saved_generation_seconds': 0.0}
+        self._conn = self._load() if self.path else None
+    
+    def _load(self):
+        """Open the on-disk store and load its most recent entries into memory"""
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("""CREATE TABLE IF NOT EXISTS itinerary_cache (
+                key TEXT PRIMARY KEY,
+                itinerary TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                generation_seconds REAL NOT NULL
+            )""")
+            conn.execute("DELETE FROM itinerary_cache WHERE created_at < ?", (time.time() - self.ttl,))
+            conn.commit()
+            rows = conn.execute(
+                "SELECT key, itinerary, created_at, generation_seconds FROM itinerary_cache ORDER BY created_at DESC LIMIT ?",
+                (self.max_entries,)
+            ).fetchall()
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ Itinerary cache at {self.path} unavailable ({e}), using memory only")
+            return None
+        for key, itinerary, created_at, generation_seconds in reversed(rows):
+            self._entries[key] = {
+                'itinerary': itinerary,
+                'created_at': created_at,
+                'generation_seconds': generation_seconds
+            }
+        return conn
+    
+    @classmethod
+    def make_key(cls, trip):
+        """Canonical hash of the inputs to create_enhanced_itinerary_prompt"""
+        special_requests = re.sub(r'\s+', ' ', str(trip.get('special_requests') or '')).strip().lower()
+        canonical = {
+            'destination': GeocodeCache.normalize_address(trip['destination']),
+            'duration': int(trip['duration']),
+            'people': int(trip['people']),
+            'children': int(trip.get('children') or 0),
+            'budget': str(trip.get('budget') or '').lower(),
+            'lodging': str(trip.get('lodging') or '').lower(),
+            'travel_transport': str(trip.get('travel_transport') or '').lower(),
+            'local_transport': str(trip.get('local_transport') or '').lower(),
+            'interests': sorted({str(interest).strip().lower() for interest in trip.get('interests') or []})
+        }
+        if special_requests:
+            # Special requests may reference specific dates, so keep them exact
+            canonical['special_requests'] = special_requests
+            canonical['dates'] = [trip['start_date'], trip['end_date']]
+        else:
+            try:
+                canonical['season'] = cls.SEASONS[datetime.strptime(trip['start_date'], '%Y-%m-%d').month]
+            except (TypeError, ValueError):
+                canonical['season'] = str(trip['start_date'])
+        if trip.get('format', 'text') != 'text':
+            canonical['format'] = trip['format']
+        encoded = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+    
+    def get(self, key):
+        """Return a cached entry or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry['created_at'] > self.ttl:
+                self._entries.pop(key)
+                entry = None
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            self.stats['saved_generation_seconds'] += entry['generation_seconds']
+            return entry
+    
+    def set(self, key, itinerary, generation_seconds):
+        """Store a freshly generated itinerary"""
+        entry = {
+            'itinerary': itinerary,
+            'created_at': time.time(),
+            'generation_seconds': generation_seconds
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self.stats['stores'] += 1
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+                self.stats['evictions'] += 1
+            if self._conn:
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO itinerary_cache (key, itinerary, created_at, generation_seconds) VALUES (?, ?, ?, ?)",
+                        (key, itinerary, entry['created_at'], generation_seconds)
+                    )
+                    self._conn.executemany("DELETE FROM itinerary_cache WHERE key = ?", [(k,) for k in evicted])
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Itinerary cache write error: {e}")
+    
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            entries = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        return {
+            **stats,
+            'saved_generation_seconds': round(stats['saved_generation_seconds'], 1),
+            'entries': entries,
+            'hit_ratio': round(stats['hits'] / lookups, 3) if lookups else None,
+            'persistent': self._conn is not None
+        }
+
+# Gemini job queue
+class GeminiJobQueue:
+    """Bounded worker pool and job registry for itinerary generation and refinement"""
+    
+    def __init__(self, workers=None, max_queue=None, result_ttl=None):
+        self.workers = workers or int(os.getenv('GEMINI_WORKERS', 2))
+        self.max_queue = max_queue or int(os.getenv('GEMINI_QUEUE_LIMIT', 16))
+        self.result_ttl = result_ttl or int(os.getenv('JOB_RESULT_TTL', 3600))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='gemini-worker')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._durations = deque(maxlen=20)
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0}
+    
+    def _prune(self):
+        """Forget finished jobs older than the result TTL (lock held)"""
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finished_at'] and job['finished_at'] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+    
+    def _queued_jobs(self):
+        return [job for job in self._jobs.values() if job['status'] == 'queued']
+    
+    def submit(self, job_type, func, payload):
+        """Queue func(payload, progress=...) and return the job, or None when the queue is full"""
+        with self._lock:
+            self._prune()
+            if len(self._queued_jobs()) >= self.max_queue:
+                self.stats['rejected'] += 1
+                return None
+            job = {
+                'job_id': uuid.uuid4().hex,
+                'type': job_type,
+                'status': 'queued',
+                'stage': 'queued',
+                'percent': 0,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'result': None,
+                'error': None
+            }
+            self._jobs[job['job_id']] = job
+            self.stats['submitted'] += 1
+        self._executor.submit(self._run, job, func, payload)
+        return job
+    
+    def _run(self, job, func, payload):
+        def progress(stage, percent):
+            job['stage'] = stage
+            job['percent'] = percent
+        
+        job['status'] = 'running'
+        job['started_at'] = time.time()
+        progress('started', 5)
+        try:
+            job['result'] = func(payload, progress=progress)
+            job['status'] = 'completed'
+            progress('completed', 100)
+            outcome = 'completed'
+        except Exception as e:
+            print(f"❌ Job {job['job_id']} ({job['type']}) failed: {e}")
+            job['error'] = str(e)
+            job['status'] = 'failed'
+            outcome = 'failed'
+        job['finished_at'] = time.time()
+        with self._lock:
+            self.stats[outcome] += 1
+            self._durations.append(job['finished_at'] - job['started_at'])
+    
+    def retry_after(self):
+        """Rough seconds until a queue slot frees up"""
+        with self._lock:
+            average = sum(self._durations) / len(self._durations) if self._durations else 30
+            queued = len(self._queued_jobs())
+        return max(1, math.ceil(average * max(queued, 1) / self.workers))
+    
+    def get(self, job_id):
+        """Public view of a job, or None if it is unknown or expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            view = {
+                'job_id': job['job_id'],
+                'type': job['type'],
+                'status': job['status'],
+                'progress': {'stage': job['stage'], 'percent': job['percent']},
+                'created_at': datetime.fromtimestamp(job['created_at']).isoformat()
+            }
+            if job['status'] == 'queued':
+                view['queue_position'] = sum(
+                    1 for other in self._queued_jobs() if other['created_at'] <= job['created_at']
+                )
+        if job['started_at']:
+            view['started_at'] = datetime.fromtimestamp(job['started_at']).isoformat()
+        if job['finished_at']:
+            view['finished_at'] = datetime.fromtimestamp(job['finished_at']).isoformat()
+        if job['status'] == 'completed':
+            view['result'] = job['result']
+        elif job['status'] == 'failed':
+            view['error'] = job['error']
+        return view
+    
+    def get_stats(self):
+        with self._lock:
+            statuses = [job['status'] for job in self._jobs.values()]
+            stats = dict(self.stats)
+        return {
+            **stats,
+            'workers': self.workers,
+            'queue_limit': self.max_queue,
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running')
+        }
+
+# Gemini prompt caching
+class GeminiPromptCache:
+    """Keeps the static itinerary instructions in a Gemini cached content object.
+    
+    Gemini refuses to cache content below a per-model token minimum (1,024 for 2.5 Flash),
+    so the instructions are counted first; when they are too short, or caching fails, they
+    go as a system instruction instead and fallback_reason says why.
+    """
+    
+    def __init__(self, model_name, instructions, ttl=None, min_tokens=None):
+        self.model_name = model_name
+        self.instructions = instructions
+        self.ttl = ttl or int(os.getenv('GEMINI_CONTEXT_CACHE_TTL', 3600))
+        self.min_tokens = min_tokens or int(os.getenv('GEMINI_CONTEXT_CACHE_MIN_TOKENS', 1024))
+        self.mode = 'inline'  # cached_content, system_instruction or inline
+        self.instruction_tokens = None
+        self.fallback_reason = None
+        self.refreshed_at = None
+        self._model = None
+        self._cached_content = None
+        self._thread = None
+    
+    def start(self):
+        """Create the cache in the background and keep renewing it before it expires"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='gemini-prompt-cache', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            self.refresh()
+            if self.below_minimum():
+                return  # Nothing to renew: the instructions can never be cached
+            time.sleep(max(self.ttl * 0.8, 60))
+    
+    def below_minimum(self):
+        return self.instruction_tokens is not None and self.instruction_tokens < self.min_tokens
+    
+    def refresh(self):
+        """Extend the cached content TTL, recreating it (or falling back) when that fails"""
+        ttl = timedelta(seconds=self.ttl)
+        genai = load_genai()
+        try:
+            if self._cached_content is not None:
+                self._cached_content.update(ttl=ttl)
+            else:
+                if self.instruction_tokens is None:
+                    self.instruction_tokens = genai.GenerativeModel(self.model_name).count_tokens(
+                        self.instructions
+                    ).total_tokens
+                if self.below_minimum():
+                    raise ValueError(f"instructions are {self.instruction_tokens} tokens, below the "
+                                     f"{self.min_tokens}-token minimum for context caching")
+                cached_content = genai.caching.CachedContent.create(
+                    model=f"models/{self.model_name}",
+                    display_name='gotravel-itinerary-instructions',
+                    system_instruction=self.instructions,
+                    ttl=ttl
+                )
+                self._model = genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+                self._cached_content = cached_content
+                self.mode = 'cached_content'
+                self.fallback_reason = None
+                print(f"✅ Itinerary instructions cached for {self.model_name}")
+            self.refreshed_at = datetime.now()
+            return
+        except Exception as e:
+            print(f"⚠️ Gemini context caching unavailable ({e}), using a system instruction")
+            self.fallback_reason = str(e)
+            self._cached_content = None
+        
+        # Without a cache the instructions still travel as a system instruction
+        try:
+            self._model = genai.GenerativeModel(self.model_name, system_instruction=self.instructions)
+            self.mode = 'system_instruction'
+        except Exception as e:
+            print(f"⚠️ Could not set itinerary system instruction ({e}), using inline prompts")
+            self._model = None
+            self.mode = 'inline'
+        self.refreshed_at = datetime.now()
     
-    def get_country_currency(self, country):
-        """Get the primary currency for a country"""
-        currency_map = {
-            "United States": "USD", "USA": "USD", "US": "USD",
-            "United Kingdom": "GBP", "UK": "GBP", "England": "GBP", "Britain": "GBP",
-            "France": "EUR", "Germany": "EUR", "Italy": "EUR", "Spain": "EUR", 
-            "Netherlands": "EUR", "Austria": "EUR", "Belgium": "EUR", "Portugal": "EUR",
-            "Japan": "JPY", "China": "CNY", "India": "INR", "Canada": "CAD",
-            "Australia": "AUD", "Switzerland": "CHF", "Sweden": "SEK", 
-            "Norway": "NOK", "Denmark": "DKK", "Thailand": "THB",
-            "South Korea": "KRW", "Singapore": "SGD", "Hong Kong": "HKD",
-            "Mexico": "MXN", "Brazil": "BRL", "Russia": "RUB", "Turkey": "TRY"
+    def get_model(self):
+        """Model with the instructions preloaded, or None to send them inline"""
+        return self._model
+    
+    def get_status(self):
+        return {
+            'mode': self.mode,
+            'model': self.model_name,
+            'instruction_tokens': self.instruction_tokens,
+            'min_tokens': self.min_tokens,
+            'fallback_reason': self.fallback_reason,
+            'ttl_seconds': self.ttl,
+            'refreshed_at': self.refreshed_at.isoformat() if self.refreshed_at else None
         }
-        
-        # Try exact match first
-        if country in currency_map:
-            return currency_map[country]
-        
-        # Try partial matching
-        country_lower = country.lower()
-        for country_name, currency in currency_map.items():
-            if country_lower in country_name.lower() or country_name.lower() in country_lower:
-                return currency
-        
-        return "USD"  # Default fallback
 
-class RoadsService(GoogleAPIService):
-    """Google Roads API service"""
+# Location context enrichment
+class LocationEnrichment:
+    """Location context for a prompt, gathered in the background until a deadline"""
     
-    def snap_to_roads(self, path, interpolate=False):
-        """Snap GPS coordinates to road network"""
-        base_url = "https://roads.googleapis.com/v1"
-        params = {
-            'path': path,
-            'interpolate': interpolate,
-            'key': self.api_key
+    SOURCES = ('geocode', 'weather', 'attractions', 'restaurants')
+    
+    def __init__(self, manager, destination, cache):
+        self.manager = manager
+        self.destination = destination
+        self.cache = cache
+        self.started = time.time()
+        self.results = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._complete = threading.Event()
+        # Callbacks run on pool threads, so keep the request's context (trace) for the work they submit
+        self._context = contextvars.copy_context()
+        
+        cached = cache.get(destination)
+        self.cached = cached is not None
+        if self.cached:
+            self.results = cached
+            self._complete.set()
+        else:
+            future = self._submit(manager.geocoding.get_coordinates, destination)
+            future.add_done_callback(self._on_geocode)
+    
+    def _submit(self, func, *args):
+        return self.manager.fanout_executor.submit(self._context.copy().run, run_with_priority, 'enrichment', func, *args)
+    
+    def _on_geocode(self, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Could not get location context: {e}")
+            result = {}
+        if 'error' in result or not result.get('results'):
+            self._complete.set()
+            return
+        
+        location_data = result['results'][0]
+        lat = location_data['geometry']['location']['lat']
+        lng = location_data['geometry']['location']['lng']
+        calls = {
+            'weather': (self.manager.weather.get_current_weather, (lat, lng)),
+            'attractions': (self.manager.places.search_nearby, (lat, lng, 'tourist_attraction')),
+            'restaurants': (self.manager.places.search_nearby, (lat, lng, 'restaurant'))
         }
+        with self._lock:
+            self.results['geocode'] = {'address': location_data['formatted_address'], 'lat': lat, 'lng': lng}
+            self._pending = len(calls)
+        # Callbacks only submit more work, so they never block an executor thread
+        for name, (func, args) in calls.items():
+            future = self._submit(func, *args)
+            future.add_done_callback(lambda done, name=name: self._on_source(name, done))
+    
+    def _on_source(self, name, future):
         try:
-            response = requests.get(f"{base_url}/snapToRoads", params=params, timeout=10)
-            return response.json()
+            data = future.result()
         except Exception as e:
-            return {"error": str(e)}
+            print(f"Location context {name} error: {e}")
+            data = None
+        # Sample weather is not real context for the model
+        usable = isinstance(data, dict) and 'error' not in data and not str(data.get('note', '')).startswith('Sample data')
+        with self._lock:
+            if usable:
+                self.results[name] = data
+            self._pending -= 1
+            finished = self._pending == 0
+            results = dict(self.results)
+        if finished:
+            # Late arrivals still warm the cache for the next request, even past the deadline
+            if all(source in results for source in self.SOURCES):
+                self.cache.set(self.destination, results)
+            self._complete.set()
+    
+    @traced('context.collect')
+    def collect(self, budget):
+        """Wait until budget seconds after the start, then format whatever has arrived"""
+        self._complete.wait(max(0.0, self.started + budget - time.time()))
+        with self._lock:
+            results = dict(self.results)
+        return format_location_context(results), {
+            'sources': [source for source in self.SOURCES if source in results],
+            'missing': [source for source in self.SOURCES if source not in results],
+            'cached': self.cached,
+            'budget_ms': round(budget * 1000),
+            'elapsed_ms': round((time.time() - self.started) * 1000)
+        }
 
-# Service Manager
-class GoogleServicesManager:
-    """Manager for all Google API services"""
+class LocationContextCache:
+    """Recent complete location enrichments, keyed by normalized destination"""
     
-    def __init__(self, google_api_key, openweathermap_api_key):
-        self.api_key = google_api_key
-        self.geocoding = GeocodingService(google_api_key)
-        self.places = PlacesService(google_api_key)
-        self.directions = DirectionsService(google_api_key)
-        self.timezone = TimeZoneService(google_api_key)
-        self.weather = WeatherService(openweathermap_api_key)  # Use OpenWeatherMap API key
-        self.roads = RoadsService(google_api_key)
+    def __init__(self, ttl=None, max_entries=256):
+        self.ttl = ttl or int(os.getenv('LOCATION_CONTEXT_CACHE_TTL', 900))
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
     
-    def get_location_info(self, location_query):
-        """Get comprehensive information about a location"""
+    def get(self, destination):
+        key = GeocodeCache.normalize_address(destination)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return dict(entry[0])
+            self.stats['misses'] += 1
+            return None
+    
+    def set(self, destination, results):
+        key = GeocodeCache.normalize_address(destination)
+        with self._lock:
+            self._entries[key] = (results, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, 'entries': len(self._entries)}
+
+class StartupWarmup:
+    """Runs startup checks in a background thread and keeps their results for /api/status"""
+    
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.state = 'pending'  # pending, running or done
+        self.results = {}
+        self.started_at = None
+        self.duration_ms = None
+        self._thread = None
+    
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name='startup-warmup', daemon=True)
+            self._thread.start()
+    
+    def run(self):
+        self.state = 'running'
+        self.started_at = datetime.now()
+        started = time.time()
+        for name, task in self.tasks.items():
+            task_started = time.time()
+            try:
+                result = task()
+            except Exception as e:
+                print(f"⚠️ Startup task {name} failed: {e}")
+                result = {'ok': False, 'error': str(e)}
+            self.results[name] = {**result, 'duration_ms': round((time.time() - task_started) * 1000, 1)}
+        self.duration_ms = round((time.time() - started) * 1000, 1)
+        self.state = 'done'
+    
+    def get_status(self):
+        return {
+            'state': self.state,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'duration_ms': self.duration_ms,
+            'tasks': dict(self.results)
+        }
+
+class RequestProfiler:
+    """cProfile for a sampled fraction of requests, written to PROFILE_DIR as .prof files.
+    
+    On Python 3.12+ a profiler records every thread in the process, so a profile is only
+    kept when its request was the only one in flight from start to finish; the pool
+    threads it fanned out to are included, other requests are not.
+    """
+    
+    def __init__(self, sample_rate=None, directory=None):
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+        self.directory = directory or os.getenv('PROFILE_DIR', os.path.join('.cache', 'profiles'))
+        # Python 3.12+ allows one active cProfile per process, so sampled requests take turns
+        self._lock = threading.Lock()
+        self._count_lock = threading.Lock()
+        self._in_flight = 0
+        self._requests_started = 0
+        self._window_start = None  # _requests_started when the running profile began
+        self.stats = {'profiled': 0, 'skipped_busy': 0, 'discarded_concurrent': 0}
+    
+    def request_started(self):
+        """Count every request (profiled or not) while sampling is on"""
+        if self.sample_rate > 0:
+            with self._count_lock:
+                self._in_flight += 1
+                self._requests_started += 1
+    
+    def request_finished(self):
+        if self.sample_rate > 0:
+            with self._count_lock:
+                self._in_flight -= 1
+    
+    def start(self):
+        """A running profiler if this request is sampled and running alone, else None"""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if self._in_flight > 1 or not self._lock.acquire(blocking=False):
+            self.stats['skipped_busy'] += 1
+            return None
+        self._window_start = self._requests_started
+        profiler = cProfile.Profile()
         try:
-            # Step 1: Geocode the location
-            geocode_result = self.geocoding.get_coordinates(location_query)
-            if 'error' in geocode_result or 'results' not in geocode_result or not geocode_result['results']:
-                return {"error": "Location not found"}
-            
-            location_data = geocode_result['results'][0]
-            lat = location_data['geometry']['location']['lat']
-            lng = location_data['geometry']['location']['lng']
-            formatted_address = location_data['formatted_address']
-            
-            # Step 2: Get additional information
-            timezone_info = self.timezone.get_timezone(lat, lng)
-            weather_info = self.weather.get_current_weather(lat, lng)
-            
-            # Step 3: Find nearby attractions
-            attractions = self.places.search_nearby(lat, lng, 'tourist_attraction')
-            restaurants = self.places.search_nearby(lat, lng, 'restaurant')
-            
-            return {
-                'location': {
-                    'address': formatted_address,
-                    'coordinates': {'lat': lat, 'lng': lng}
-                },
-                'timezone': timezone_info,
-                'weather': weather_info,
-                'nearby': {
-                    'attractions': attractions,
-                    'restaurants': restaurants
-                }
-            }
-        except Exception as e:
-            return {"error": f"Failed to get location info: {str(e)}"}
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool is active
+            self._lock.release()
+            self.stats['skipped_busy'] += 1
+            return None
+        return profiler
+    
+    def finish(self, profiler, label):
+        """Stop the profiler and write its stats, named after the time and route"""
+        profiler.disable()
+        overlapped = self._requests_started != self._window_start
+        self._lock.release()
+        if overlapped:
+            # Another request ran during this one and would be mixed into the profile
+            self.stats['discarded_concurrent'] += 1
+            return
+        self.stats['profiled'] += 1
+        route = re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_') or 'root'
+        filename = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{route}-{uuid.uuid4().hex[:6]}.prof"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.directory, filename))
+        except OSError as e:
+            print(f"⚠️ Could not write profile {filename}: {e}")
+    
+    def get_stats(self):
+        return {**self.stats, 'sample_rate': self.sample_rate, 'directory': self.directory}
 
 # Initialize services
+upstream_guard = UpstreamGuard()
+quota_scheduler = QuotaScheduler()
+http_client = PooledHTTPClient(guard=upstream_guard, scheduler=quota_scheduler)
+geocode_cache = GeocodeCache()
+weather_cache = WeatherCache()
+itinerary_cache = ItineraryCache()
+gemini_jobs = GeminiJobQueue()
+
+location_context_cache = LocationContextCache()
+
+# Seconds an itinerary request waits for location context before prompting without it
+LOCATION_CONTEXT_BUDGET = float(os.getenv('LOCATION_CONTEXT_BUDGET', 2.5))
+
+# Above this share of the itinerary, section refinement falls back to a full rewrite
+SECTION_REFINE_MAX_FRACTION = float(os.getenv('SECTION_REFINE_MAX_FRACTION', 0.6))
+
+# /api/batch limits and its worker pool (separate from the location fan-out pool)
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', 20))
+BATCH_TIMEOUT = float(os.getenv('BATCH_TIMEOUT', 15))
+batch_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('BATCH_WORKERS', 8)),
+    thread_name_prefix='batch'
+)
 config = Config()
 currency_service = CurrencyService()
 
 # Initialize Google services with proper error handling
 try:
     if config.google_api_key and config.openweathermap_api_key:
-        google_services = GoogleServicesManager(config.google_api_key, config.openweathermap_api_key)
+        google_services = GoogleServicesManager(
+            config.google_api_key, config.openweathermap_api_key,
+            geocode_cache=geocode_cache, weather_cache=weather_cache
+        )
         print("✅ Google services initialized successfully")
     else:
         google_services = None
@@ -406,27 +2643,389 @@ except Exception as e:
     google_services = None
     print(f"❌ Failed to initialize Google services: {e}")
 
+destinations_snapshot = DestinationsSnapshot(
+    POPULAR_DESTINATIONS,
+    refresh_interval=int(os.getenv('DESTINATIONS_REFRESH_INTERVAL', 600))
+)
+
+def collect_service_metrics():
+    """Cache, circuit breaker and job queue state, read from the existing stats at scrape time"""
+    caches = {
+        'geocoding': geocode_cache,
+        'weather': weather_cache,
+        'itineraries': itinerary_cache,
+        'location_context': location_context_cache
+    }
+    lookups, hit_ratios, entries = [], [], []
+    for name, cache in caches.items():
+        stats = cache.get_stats()
+        label = (('cache', name),)
+        for result in ('hits', 'negative_hits', 'coalesced', 'misses'):
+            if result in stats:
+                lookups.append((label + (('result', result),), stats[result]))
+        hits = stats['hits'] + stats.get('negative_hits', 0) + stats.get('coalesced', 0)
+        total = hits + stats['misses']
+        hit_ratios.append((label, round(hits / total, 4) if total else None))
+        entries.append((label, stats['entries']))
+    yield 'gotravel_cache_lookups_total', 'counter', 'Cache lookups by result', lookups
+    yield 'gotravel_cache_hit_ratio', 'gauge', 'Share of cache lookups answered without an upstream call', hit_ratios
+    yield 'gotravel_cache_entries', 'gauge', 'Entries held per cache', entries
+    
+    yield 'gotravel_currency_rates_age_seconds', 'gauge', 'Age of the exchange rate table', [
+        ((), currency_service.get_stats()['age_seconds'])
+    ]
+    yield 'gotravel_circuit_open', 'gauge', 'Whether an upstream circuit breaker is open (1) or half open (0.5)', [
+        ((('upstream', name),), {'open': 1, 'half_open': 0.5}.get(breaker['state'], 0))
+        for name, breaker in upstream_guard.get_status()['breakers'].items()
+    ]
+    jobs = gemini_jobs.get_stats()
+    yield 'gotravel_gemini_jobs', 'gauge', 'Gemini generation jobs by state', [
+        ((('state', state),), jobs[state]) for state in ('queued', 'running')
+    ]
+    yield 'gotravel_upstream_fetches_in_flight', 'gauge', 'Distinct upstream GETs in flight after coalescing', [
+        ((), http_client.coalescer.in_flight())
+    ]
+
+metrics.register_collector(collect_service_metrics)
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.time()
+    metrics.http_in_flight.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.http_latency.observe(time.time() - started, request.method, route, str(response.status_code))
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    if g.pop('request_started', None) is not None:
+        metrics.http_in_flight.dec()
+
+# Every request gets a Server-Timing header. The full span tree is logged for a sampled
+# fraction of requests, or returned inline with ?trace=1 / X-Debug-Trace: 1 when TRACE_DEBUG is on
+TRACE_DEBUG = os.getenv('TRACE_DEBUG', 'false').lower() == 'true'
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0))
+
+def trace_tree_mode(debug_requested):
+    """'inline', 'log' or None for a finished request trace"""
+    if debug_requested and TRACE_DEBUG:
+        return 'inline'
+    if TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE:
+        return 'log'
+    return None
+
+def log_trace(trace):
+    print(json.dumps({'trace': trace.to_dict()}))
+
+request_profiler = RequestProfiler()
+
+@app.before_request
+def start_request_trace():
+    route = request.url_rule.rule if request.url_rule else request.path
+    g.trace = RequestTrace(f"{request.method} {route}")
+    g.trace.activate()
+    request_profiler.request_started()
+    g.profiler = request_profiler.start()
+
+@app.after_request
+def add_server_timing(response):
+    trace = g.get('trace')
+    if trace is None:
+        return response
+    trace.finish()
+    response.headers['Server-Timing'] = trace.server_timing()
+    
+    debug_requested = request.args.get('trace') == '1' or request.headers.get('X-Debug-Trace') == '1'
+    mode = trace_tree_mode(debug_requested)
+    if mode == 'inline' and response.is_json and not response.is_streamed:
+        payload = response.get_json(silent=True)
+        if isinstance(payload, dict):
+            payload['trace'] = trace.to_dict()
+            response.set_data(app.json.dumps(payload))
+            return response
+    if mode is not None:
+        log_trace(trace)
+    return response
+
+@app.teardown_request
+def finish_request_trace(error=None):
+    _current_trace.set(None)
+    _current_span.set(None)
+    trace = g.pop('trace', None)
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        request_profiler.finish(profiler, trace.root.name if trace else request.path)
+    if trace is not None:
+        request_profiler.request_finished()
+
+# HTTP response caching
+class CachePolicy:
+    """Cache-Control and ETag rules for one GET route.
+    
+    The ETag is the route's `version` when it has one (checked before the view runs, so
+    a matching If-None-Match costs no work), else a hash of the JSON payload without its
+    `volatile` fields (weak), else a hash of the response body (strong). Payloads built
+    from fallbacks are sent no-store so shared caches never keep them.
+    """
+    
+    DEGRADED_MARKERS = ('error', 'partial', 'stale', 'sample', 'warming')
+    
+    def __init__(self, max_age, stale_while_revalidate=0, volatile=(), version=None):
+        self.max_age = max_age
+        self.stale_while_revalidate = stale_while_revalidate
+        self.volatile = frozenset(volatile)
+        self.version = version  # callable taking the view arguments, or None
+    
+    def cache_control(self):
+        directives = ['public', f"max-age={self.max_age}"]
+        if self.stale_while_revalidate:
+            directives.append(f"stale-while-revalidate={self.stale_while_revalidate}")
+        return ', '.join(directives)
+    
+    @staticmethod
+    def _digest(data):
+        return hashlib.sha256(data).hexdigest()[:32]
+    
+    def version_etag(self, *args, **kwargs):
+        """(tag, weak) from the route's version, or None when it has none"""
+        if self.version is None:
+            return None
+        return self.version(*args, **kwargs), True
+    
+    def etag_for(self, payload, body):
+        """(tag, weak) for a response that was actually built"""
+        if self.volatile and isinstance(payload, dict):
+            stable = {key: value for key, value in payload.items() if key not in self.volatile}
+            return self._digest(json.dumps(stable, sort_keys=True, default=str).encode()), True
+        return self._digest(body), False
+    
+    def is_degraded(self, payload, depth=4):
+        """Whether a payload carries an error or fallback marker in its top few levels"""
+        if isinstance(payload, list):
+            return depth > 0 and any(self.is_degraded(item, depth - 1) for item in payload)
+        if not isinstance(payload, dict):
+            return False
+        if any(payload.get(marker) for marker in self.DEGRADED_MARKERS) or payload.get('rate_source') == 'default':
+            return True
+        return depth > 0 and any(
+            self.is_degraded(value, depth - 1) for value in payload.values() if isinstance(value, (dict, list))
+        )
+    
+    def headers(self, etag):
+        if etag is None:
+            return [('Cache-Control', 'no-store')]
+        return [('Cache-Control', self.cache_control()), ('ETag', quote_etag(*etag))]
+
+def cache_policy(max_age, stale_while_revalidate=0, volatile=(), version=None):
+    """Serve a GET view with Cache-Control and an ETag, answering matching conditional requests with 304"""
+    policy = CachePolicy(max_age, stale_while_revalidate, volatile, version)
+    
+    def decorate(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = policy.version_etag(*args, **kwargs)
+            if etag is not None and request.if_none_match.contains_weak(etag[0]):
+                return Response(status=304, headers=policy.headers(etag))
+            
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                response.headers['Cache-Control'] = 'no-store'
+                return response
+            payload = response.get_json(silent=True) if response.is_json else None
+            if policy.is_degraded(payload):
+                response.headers['Cache-Control'] = 'no-store'
+                return response
+            if etag is None:
+                etag = policy.etag_for(payload, response.get_data())
+            response.headers.update(policy.headers(etag))
+            return response.make_conditional(request)
+        
+        # The ASGI handlers mirroring a view look its policy up here
+        wrapper.cache_policy = policy
+        return wrapper
+    return decorate
+
+# Response compression
+def load_brotli():
+    """Brotli is optional: without it responses are only gzip-compressed"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+brotli_module = load_brotli()
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' or None for an Accept-Encoding header value"""
+    accept = parse_accept_header(accept_encoding)
+    if brotli_module is not None and accept['br']:
+        return 'br'
+    if accept['gzip']:
+        return 'gzip'
+    return None
+
+def compress(body, encoding, best=False):
+    """Fast settings for per-request bodies, the slowest and smallest for bodies compressed once"""
+    if encoding == 'br':
+        return brotli_module.compress(body, quality=11 if best else 4)
+    return gzip.compress(body, compresslevel=9 if best else 6, mtime=0)
+
+def add_vary(headers, value):
+    """Add a token to the Vary header of a WSGI/ASGI-style header list"""
+    for index, (name, existing) in enumerate(headers):
+        if name.lower() == 'vary':
+            if value.lower() not in existing.lower():
+                headers[index] = (name, f"{existing}, {value}")
+            return headers
+    headers.append(('Vary', value))
+    return headers
+
+class CompressionMiddleware:
+    """Compresses large JSON responses for clients that accept it.
+    
+    Runs outside Flask so bodies are compressed after every after_request hook has
+    finished with them. Streams, HEAD requests and already encoded responses pass through.
+    """
+    
+    COMPRESSIBLE_TYPES = ('application/json',)
+    
+    def __init__(self, wsgi_app, min_size=None):
+        self.wsgi_app = wsgi_app
+        self.min_size = min_size if min_size is not None else COMPRESS_MIN_BYTES
+    
+    def _compressible(self, headers):
+        values = {name.lower(): value for name, value in headers}
+        return (values.get('content-type', '').split(';')[0].strip() in self.COMPRESSIBLE_TYPES
+                and 'content-encoding' not in values
+                and int(values.get('content-length') or 0) >= self.min_size)
+    
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.wsgi_app(environ, start_response)
+        
+        deferred = []
+        chunks = []
+        
+        def intercept(status, headers, exc_info=None):
+            if not self._compressible(headers):
+                return start_response(status, headers, exc_info)
+            deferred.append((status, headers, exc_info))
+            return chunks.append
+        
+        result = self.wsgi_app(environ, intercept)
+        if not deferred:
+            return result
+        try:
+            chunks.extend(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        
+        status, headers, exc_info = deferred[0]
+        body = b''.join(chunks)
+        headers = add_vary([(name, value) for name, value in headers if name.lower() != 'content-length'],
+                           'Accept-Encoding')
+        encoding = choose_encoding(environ.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is not None:
+            body = compress(body, encoding)
+            headers.append(('Content-Encoding', encoding))
+            # The same ETag now names a different byte sequence
+            headers = [(name, f"W/{value}" if name.lower() == 'etag' and not value.startswith('W/') else value)
+                       for name, value in headers]
+        headers.append(('Content-Length', str(len(body))))
+        start_response(status, headers, exc_info)
+        return [body]
+
+app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+
+class PageCache:
+    """Rendered pages kept as bytes, with gzip and brotli encodings precompressed.
+    
+    A page only depends on its endpoint, the API key and the asset URLs, so each one is
+    rendered once per asset build and requests just pick the encoding. Templates are
+    re-rendered every time while Jinja auto-reload is on (debug).
+    """
+    
+    def __init__(self, pages):
+        self.pages = pages  # endpoint -> template
+        self._entries = {}  # endpoint -> (asset generation, {encoding: body})
+    
+    def _render(self, endpoint):
+        html = render_template(self.pages[endpoint], google_api_key=config.google_api_key).encode()
+        bodies = {'identity': html, 'gzip': compress(html, 'gzip', best=True)}
+        if brotli_module is not None:
+            bodies['br'] = compress(html, 'br', best=True)
+        return bodies
+    
+    def get(self, endpoint):
+        """{encoding: body} for a page, rendering it in the current request context if needed"""
+        if app.jinja_env.auto_reload:
+            return {'identity': render_template(self.pages[endpoint], google_api_key=config.google_api_key).encode()}
+        entry = self._entries.get(endpoint)
+        if entry is None or entry[0] != asset_pipeline.generation:
+            entry = (asset_pipeline.generation, self._render(endpoint))
+            self._entries[endpoint] = entry
+        return entry[1]
+    
+    def respond(self, endpoint):
+        bodies = self.get(endpoint)
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        response = Response(bodies.get(encoding, bodies['identity']), mimetype='text/html')
+        if encoding in bodies:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return response
+    
+    def warm(self):
+        """Render every page ahead of its first request (startup warm-up task)"""
+        with app.test_request_context():
+            paths = {endpoint: url_for(endpoint) for endpoint in self.pages}
+        bodies = {}
+        for endpoint, path in paths.items():
+            with app.test_request_context(path):
+                bodies = self.get(endpoint)
+        return {'ok': True, 'pages': len(paths), 'encodings': sorted(bodies)}
+
+page_cache = PageCache({
+    'home': 'home.html',
+    'planner': 'planner.html',
+    'explore': 'explore.html',
+    'about': 'about.html'
+})
+
 @app.route('/')
+@cache_policy(max_age=300, stale_while_revalidate=86400)
 def home():
     """Serve the home page"""
-    return render_template('home.html', google_api_key=config.google_api_key)
+    return page_cache.respond('home')
 
 @app.route('/planner')
+@cache_policy(max_age=300, stale_while_revalidate=86400)
 def planner():
     """Serve the trip planner page"""
-    return render_template('planner.html', google_api_key=config.google_api_key)
+    return page_cache.respond('planner')
 
 @app.route('/explore')
+@cache_policy(max_age=300, stale_while_revalidate=86400)
 def explore():
     """Serve the explore destinations page"""
-    return render_template('explore.html', google_api_key=config.google_api_key)
+    return page_cache.respond('explore')
 
 @app.route('/about')
+@cache_policy(max_age=300, stale_while_revalidate=86400)
 def about():
     """Serve the about page"""
-    return render_template('about.html', google_api_key=config.google_api_key)
+    return page_cache.respond('about')
 
 @app.route('/sitemap.xml')
+@cache_policy(max_age=3600, stale_while_revalidate=86400)
 def sitemap():
     """Generate sitemap.xml for SEO"""
     from flask import Response
@@ -475,6 +3074,7 @@ def robots():
 Allow: /
 Disallow: /api/
 Disallow: /admin/
+Disallow: /metrics
 
 Sitemap: https://gotravel-41611891727.us-central1.run.app/sitemap.xml'''
     
@@ -488,12 +3088,15 @@ def api_status():
         'apis': {
             'gemini': {
                 'configured': config.gemini_api_key is not None,
-                'model_available': config.gemini_model is not None,
+                'model_available': config.gemini_available,
+                'model_state': config.gemini_state,
+                'prompt_cache': itinerary_prompt_cache.get_status() if itinerary_prompt_cache else {'mode': 'inline'},
                 'key_preview': f"{config.gemini_api_key[:10]}..." if config.gemini_api_key else None
             },
             'google': {
                 'configured': config.google_api_key is not None,
                 'services_available': google_services is not None,
+                'validation': startup_warmup.results.get('google_apis'),
                 'key_preview': f"{config.google_api_key[:10]}..." if config.google_api_key else None,
                 'services': [
                     'Maps JavaScript API',
@@ -509,116 +3112,219 @@ def api_status():
                 'key_preview': f"{config.openweathermap_api_key[:10]}..." if config.openweathermap_api_key else None
             }
         },
+        'http_client': http_client.get_stats(),
+        'circuit_breakers': upstream_guard.get_status(),
+        'quotas': quota_scheduler.get_status(),
+        'caches': {
+            'geocoding': geocode_cache.get_stats(),
+            'weather': weather_cache.get_stats(),
+            'currency_rates': currency_service.get_stats(),
+            'itineraries': itinerary_cache.get_stats(),
+            'location_context': location_context_cache.get_stats()
+        },
+        'gemini_jobs': gemini_jobs.get_stats(),
+        'profiling': request_profiler.get_stats(),
+        'startup': startup_warmup.get_status(),
+        'assets': asset_pipeline.summary,
         'overall_status': 'healthy' if all([
             config.gemini_api_key,
             config.google_api_key,
             config.openweathermap_api_key,
-            config.gemini_model
+            config.gemini_available
         ]) else 'degraded'
     }
     
     return jsonify(status)
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+# Static asset pipeline
+def load_pillow():
+    """Pillow is optional: without it assets are served as-is, still under hashed URLs"""
+    try:
+        from PIL import Image, features
+    except ImportError:
+        return None, None
+    return Image, features
+
+@dataclass(frozen=True)
+class AssetSpec:
+    source: str  # path relative to the app root, also served unhashed at /<source>
+    width: int = None  # display width in pixels; None keeps the source size
+    formats: tuple = ('avif', 'webp', 'png')
+
+class AssetPipeline:
+    """Resized, recompressed image variants served under content-hashed URLs.
+    
+    build() encodes every asset in each of its formats into ASSET_DIR, reusing files from
+    an earlier build while the source is unchanged. /assets/<name>.<digest> then serves the
+    smallest format the browser explicitly Accepts, falling back to PNG.
+    """
+    
+    ENCODINGS = {
+        'avif': ('image/avif', {'quality': 55}),
+        'webp': ('image/webp', {'quality': 82, 'method': 6}),
+        'png': ('image/png', {'optimize': True})
+    }
+    IMMUTABLE = 'public, max-age=31536000, immutable'
+    
+    def __init__(self, assets, directory=None):
+        self.assets = assets
+        self.directory = os.path.abspath(directory or os.getenv('ASSET_DIR', os.path.join('.cache', 'assets')))
+        self._built = {}  # name -> (digest, [(mimetype, path)] smallest first); replaced whole on build
+        self.summary = {'ok': False, 'state': 'not_built'}
+        self.generation = 0  # bumped by every build; pages rendered with older asset URLs are stale
+    
+    def _source_path(self, spec):
+        return os.path.join(app.root_path, spec.source)
+    
+    def _digest(self, spec, image_module):
+        with open(self._source_path(spec), 'rb') as source:
+            digest = hashlib.sha256(source.read())
+        # Encoder settings and the Pillow build are part of the content
+        digest.update(repr((spec.width, spec.formats, self.ENCODINGS, image_module is not None)).encode())
+        return digest.hexdigest()[:16]
+    
+    def _encode(self, spec, image_module, formats, paths):
+        with image_module.open(self._source_path(spec)) as image:
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            if spec.width and spec.width < image.width:
+                height = round(image.height * spec.width / image.width)
+                image = image.resize((spec.width, height), image_module.LANCZOS)
+            for image_format in formats:
+                temporary = f"{paths[image_format]}.tmp"
+                image.save(temporary, format=image_format.upper(), **self.ENCODINGS[image_format][1])
+                os.replace(temporary, paths[image_format])
+    
+    def build(self):
+        """Write every variant that is not already on disk; returns a summary for /api/status"""
+        image_module, features = load_pillow()
+        os.makedirs(self.directory, exist_ok=True)
+        built = {}
+        encoded = 0
+        for name, spec in self.assets.items():
+            digest = self._digest(spec, image_module)
+            if image_module is None:
+                files = [('png', self._source_path(spec))]
+            else:
+                formats = [image_format for image_format in spec.formats
+                           if image_format == 'png' or features.check(image_format)]
+                paths = {image_format: os.path.join(self.directory, f"{name}.{digest}.{image_format}")
+                         for image_format in formats}
+                missing = [image_format for image_format in formats if not os.path.exists(paths[image_format])]
+                if missing:
+                    self._encode(spec, image_module, missing, paths)
+                    encoded += len(missing)
+                files = list(paths.items())
+            variants = sorted(((self.ENCODINGS[image_format][0], path) for image_format, path in files),
+                              key=lambda variant: os.path.getsize(variant[1]))
+            built[name] = (digest, variants)
+        self._built = built
+        self.generation += 1
+        self.summary = {'ok': True, 'assets': len(built), 'encoded': encoded, 'pillow': image_module is not None}
+        return self.summary
+    
+    def url(self, name):
+        """Hashed URL for an asset, or its unhashed source URL until the pipeline has built"""
+        entry = self._built.get(name)
+        if entry is None:
+            return '/' + self.assets[name].source
+        return f"/assets/{name}.{entry[0]}"
+    
+    def choose(self, name, accept):
+        """(digest, mimetype, path) of the smallest variant the client accepts, or None"""
+        entry = self._built.get(name)
+        if entry is None:
+            return None
+        digest, variants = entry
+        # Only formats named outright count: browsers without AVIF/WebP still send */*
+        named = {value for value, quality in accept if quality > 0}
+        for mimetype, path in variants:
+            if mimetype == 'image/png' or mimetype in named:
+                return digest, mimetype, path
+        return None
+    
+    def get_stats(self):
+        return {name: {'digest': digest, 'variants': {mimetype: os.path.getsize(path) for mimetype, path in variants}}
+                for name, (digest, variants) in self._built.items()}
+
+# The display sizes the templates use, at 1x and 2x
+asset_pipeline = AssetPipeline({
+    'logo-40': AssetSpec('gotravel.png', 40),
+    'logo-80': AssetSpec('gotravel.png', 80),
+    'logo-120': AssetSpec('gotravel.png', 120),
+    'logo-240': AssetSpec('gotravel.png', 240),
+    'apple-touch-icon': AssetSpec('favicon/apple-touch-icon.png', formats=('png',)),
+    'favicon-96': AssetSpec('favicon/favicon-96x96.png', formats=('png',))
+})
+
+# Built before any page renders so no page points at the full-size logo. With the variants
+# prebuilt (see the Dockerfile) this only hashes the sources; a fresh checkout encodes once.
+try:
+    asset_pipeline.build()
+except Exception as e:
+    print(f"⚠️ Asset pipeline build failed, serving the original images: {e}")
+    asset_pipeline.summary = {'ok': False, 'error': str(e)}
+
+@app.template_global()
+def asset_url(name):
+    """Hashed URL of a pipeline asset, for templates"""
+    return asset_pipeline.url(name)
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Encode the image variants ahead of time (run at image build)"""
+    summary = asset_pipeline.build()
+    print(f"✅ {summary['assets']} assets ready in {asset_pipeline.directory} "
+          f"({summary['encoded']} files encoded, Pillow {'available' if summary['pillow'] else 'missing'})")
+
+@app.route('/assets/<name>.<digest>')
+def pipeline_asset(name, digest):
+    """Serve a pipeline asset in the best format the browser accepts"""
+    if name not in asset_pipeline.assets:
+        return jsonify({'error': 'Asset not found'}), 404
+    chosen = asset_pipeline.choose(name, request.accept_mimetypes)
+    if chosen is None:
+        # Not built yet: the source file, without long-lived caching
+        return send_from_directory('.', asset_pipeline.assets[name].source, max_age=300)
+    
+    current_digest, mimetype, path = chosen
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=f"{current_digest}-{mimetype}")
+    # A page from an earlier deploy may still ask for an old digest: answer it, but don't pin it
+    response.headers['Cache-Control'] = asset_pipeline.IMMUTABLE if digest == current_digest else 'no-cache'
+    if len(asset_pipeline.assets[name].formats) > 1:
+        response.vary.add('Accept')
+    return response
+
 # Static file routes
 @app.route('/gotravel.png')
 def logo():
     """Serve the logo file"""
-    return send_from_directory('.', 'gotravel.png')
+    return send_from_directory('.', 'gotravel.png', max_age=86400)
 
 @app.route('/favicon/<path:filename>')
 def favicon(filename):
     """Serve favicon files"""
-    return send_from_directory('favicon', filename)
+    return send_from_directory('favicon', filename, max_age=86400)
 
 @app.route('/api/destinations', methods=['GET'])
+@cache_policy(max_age=60, stale_while_revalidate=destinations_snapshot.refresh_interval,
+              version=lambda: destinations_snapshot.version())
 def get_destinations():
     """Get popular travel destinations with real-time data"""
     try:
-        # Popular destinations with coordinates and safety ratings
-        popular_destinations = [
-            {"name": "Paris", "country": "France", "emoji": "🗼", "lat": 48.8566, "lng": 2.3522, "category": ["city", "popular", "cultural"], "safety_rating": 4.2, "safety_tips": "Be aware of pickpockets in tourist areas"},
-            {"name": "Tokyo", "country": "Japan", "emoji": "🏯", "lat": 35.6762, "lng": 139.6503, "category": ["city", "popular", "cultural"], "safety_rating": 4.8, "safety_tips": "Very safe city with excellent public safety"},
-            {"name": "New York", "country": "USA", "emoji": "🗽", "lat": 40.7128, "lng": -74.0060, "category": ["city", "popular"], "safety_rating": 4.0, "safety_tips": "Stay alert in busy areas, avoid isolated places at night"},
-            {"name": "London", "country": "UK", "emoji": "🇬🇧", "lat": 51.5074, "lng": -0.1278, "category": ["city", "popular", "cultural"], "safety_rating": 4.3, "safety_tips": "Generally safe, watch for petty theft in crowded areas"},
-            {"name": "Dubai", "country": "UAE", "emoji": "🏙️", "lat": 25.2048, "lng": 55.2708, "category": ["city", "popular"], "safety_rating": 4.6, "safety_tips": "Very safe with strict laws and good security"},
-            {"name": "Reykjavik", "country": "Iceland", "emoji": "🌋", "lat": 64.1466, "lng": -21.9426, "category": ["nature", "adventure"], "safety_rating": 4.9, "safety_tips": "Extremely safe, main concerns are weather-related"},
-            {"name": "Cape Town", "country": "South Africa", "emoji": "🦁", "lat": -33.9249, "lng": 18.4241, "category": ["nature", "adventure", "cultural"], "safety_rating": 3.5, "safety_tips": "Avoid walking alone at night, stay in safe neighborhoods"},
-            {"name": "Maldives", "country": "Maldives", "emoji": "🏖️", "lat": 3.2028, "lng": 73.2207, "category": ["beach", "popular"], "safety_rating": 4.7, "safety_tips": "Very safe resorts, follow water safety guidelines"},
-            {"name": "Bali", "country": "Indonesia", "emoji": "🌺", "lat": -8.3405, "lng": 115.0920, "category": ["beach", "cultural", "nature"], "safety_rating": 4.1, "safety_tips": "Generally safe, be cautious with street food and water"},
-            {"name": "Kyoto", "country": "Japan", "emoji": "🎌", "lat": 35.0116, "lng": 135.7681, "category": ["cultural", "nature"], "safety_rating": 4.8, "safety_tips": "Extremely safe with very low crime rates"},
-            {"name": "Petra", "country": "Jordan", "emoji": "🏜️", "lat": 30.3285, "lng": 35.4444, "category": ["cultural", "adventure"], "safety_rating": 4.0, "safety_tips": "Generally safe, follow tour guides and stay hydrated"},
-            {"name": "Barcelona", "country": "Spain", "emoji": "🏖️", "lat": 41.3851, "lng": 2.1734, "category": ["city", "beach", "cultural"], "safety_rating": 4.1, "safety_tips": "Watch for pickpockets, especially in tourist areas"},
-        ]
-        
-        destinations_with_data = []
-        
-        for dest in popular_destinations:
-            try:
-                # Get real weather data
-                weather = "Weather data unavailable"
-                if google_services and google_services.weather:
-                    weather_data = google_services.weather.get_current_weather(dest['lat'], dest['lng'])
-                    if weather_data and 'main' in weather_data:
-                        temp = round(weather_data['main']['temp'])
-                        desc = weather_data['weather'][0]['description'].title() if 'weather' in weather_data and weather_data['weather'] else 'Clear'
-                        weather = f"{temp}°C, {desc}"
-                    elif weather_data and not weather_data.get('error'):
-                        # Handle fallback weather data
-                        temp = weather_data.get('main', {}).get('temp', 22)
-                        weather = f"{round(temp)}°C, Clear"
-                
-                # Get timezone and population from Google APIs if available
-                timezone = "UTC"
-                population = "Unknown"
-                
-                if google_services:
-                    # Get location details
-                    location_name = f"{dest['name']}, {dest['country']}"
-                    location_info = google_services.get_location_info(location_name)
-                    
-                    if 'timezone' in location_info:
-                        tz_data = location_info['timezone']
-                        if isinstance(tz_data, dict) and 'timeZoneName' in tz_data:
-                            timezone = tz_data['timeZoneName']
-                        else:
-                            timezone = str(tz_data)
-                    if 'population' in location_info:
-                        pop_data = location_info['population']
-                        if isinstance(pop_data, (int, float)):
-                            if pop_data >= 1000000:
-                                population = f"{pop_data/1000000:.1f}M"
-                            elif pop_data >= 1000:
-                                population = f"{pop_data/1000:.0f}K"
-                            else:
-                                population = str(int(pop_data))
-                        else:
-                            population = str(pop_data)
-                
-                destination_data = {
-                    **dest,
-                    'weather': weather,
-                    'timezone': timezone,
-                    'safety_rating': dest.get('safety_rating', 4.0),
-                    'safety_tips': dest.get('safety_tips', 'Follow standard travel safety precautions'),
-                    'description': f"Explore the amazing {dest['name']} with its unique culture, attractions, and experiences."
-                }
-                
-                destinations_with_data.append(destination_data)
-                
-            except Exception as e:
-                # If there's an error getting data for this destination, include basic info
-                destinations_with_data.append({
-                    **dest,
-                    'weather': 'Data unavailable',
-                    'timezone': 'UTC',
-                    'safety_rating': dest.get('safety_rating', 4.0),
-                    'safety_tips': dest.get('safety_tips', 'Follow standard travel safety precautions'),
-                    'description': f"Discover the wonders of {dest['name']}, {dest['country']}."
-                })
+        # Served from the background-refreshed snapshot - no upstream calls in the request
+        snapshot = destinations_snapshot.read()
         
         return jsonify({
-            'destinations': destinations_with_data,
-            'count': len(destinations_with_data),
+            'destinations': snapshot['destinations'],
+            'count': len(snapshot['destinations']),
+            'warming': snapshot['warming'],
+            'snapshot_age_seconds': snapshot['age_seconds'],
+            'snapshot_updated_at': snapshot['updated_at'],
             'timestamp': datetime.now().isoformat()
         })
     
@@ -626,6 +3332,7 @@ def get_destinations():
         return jsonify({'error': f'Destinations API error: {str(e)}'}), 500
 
 @app.route('/api/destination-details/<destination_name>', methods=['GET'])
+@cache_policy(max_age=300, stale_while_revalidate=3600, volatile=('timestamp',))
 def get_destination_details(destination_name):
     """Get detailed information about a specific destination"""
     try:
@@ -654,21 +3361,108 @@ def get_destination_details(destination_name):
     except Exception as e:
         return jsonify({'error': f'Destination details error: {str(e)}'}), 500
 
+# Lookups shared by the single-purpose API routes and /api/batch.
+# Each takes the request body and returns (payload, status).
+def lookup_location_info(data, geocode=None):
+    """Comprehensive location information"""
+    location = data.get('location')
+    
+    if not location:
+        return {'error': 'Location is required'}, 400
+    
+    if not google_services:
+        return {'error': 'Google services not available'}, 503
+    
+    geocode = geocode or google_services.geocoding.get_coordinates
+    return google_services.get_location_info(location, geocode_result=geocode(location)), 200
+
+def lookup_weather_forecast(data, geocode=None):
+    """Weather forecast for a location"""
+    location = data.get('location')
+    days = data.get('days', 5)
+    
+    if not location:
+        return {'error': 'Location is required'}, 400
+    
+    if not google_services:
+        return {'error': 'Weather services not available'}, 503
+    
+    # First get coordinates
+    geocode = geocode or google_services.geocoding.get_coordinates
+    geocode_result = geocode(location)
+    if 'error' in geocode_result or 'results' not in geocode_result or not geocode_result['results']:
+        return {'error': 'Location not found'}, 404
+    
+    location_data = geocode_result['results'][0]
+    lat = location_data['geometry']['location']['lat']
+    lng = location_data['geometry']['location']['lng']
+    
+    return google_services.weather.get_forecast(lat, lng, days), 200
+
+def lookup_directions(data, geocode=None):
+    """Directions between locations"""
+    origin = data.get('origin')
+    destination = data.get('destination')
+    mode = data.get('mode', 'driving')
+    waypoints = data.get('waypoints')
+    
+    if not origin or not destination:
+        return {'error': 'Origin and destination are required'}, 400
+    
+    if not google_services:
+        return {'error': 'Google services not available'}, 503
+    
+    return google_services.directions.get_directions(origin, destination, mode, waypoints), 200
+
+def lookup_places(data, geocode=None):
+    """Text search, or nearby search around a geocoded location"""
+    query = data.get('query')
+    location = data.get('location')
+    place_type = data.get('type')
+    
+    if not google_services:
+        return {'error': 'Google services not available'}, 503
+    
+    if query:
+        # Text search
+        return google_services.places.text_search(query, location), 200
+    if location and place_type:
+        # Get coordinates first
+        geocode = geocode or google_services.geocoding.get_coordinates
+        geocode_result = geocode(location)
+        if 'results' in geocode_result and geocode_result['results']:
+            coords = geocode_result['results'][0]['geometry']['location']
+            return google_services.places.search_nearby(coords['lat'], coords['lng'], place_type), 200
+        return {'error': 'Could not geocode location'}, 400
+    return {'error': 'Query or location+type are required'}, 400
+
+def lookup_currency_info(destination, base_currency="USD"):
+    """Local currency and exchange rate for a destination"""
+    # Extract country from destination
+    country = destination.split(',')[-1].strip() if ',' in destination else destination
+    local_currency = currency_service.get_country_currency(country)
+    
+    # Get exchange rate
+    rate, rate_source = currency_service.get_exchange_rate_with_source(base_currency, local_currency)
+    
+    return {
+        'success': True,
+        'destination': destination,
+        'country': country,
+        'local_currency': local_currency,
+        'base_currency': base_currency,
+        'exchange_rate': rate,
+        'formatted_rate': f"1 {base_currency} = {rate:.2f} {local_currency}",
+        'rate_source': rate_source,
+        'last_updated': datetime.now().isoformat()
+    }, 200
+
 @app.route('/api/location-info', methods=['POST'])
 def get_location_info():
     """Get comprehensive location information"""
     try:
-        data = request.get_json()
-        location = data.get('location')
-        
-        if not location:
-            return jsonify({'error': 'Location is required'}), 400
-        
-        if not google_services:
-            return jsonify({'error': 'Google services not available'}), 503
-        
-        location_info = google_services.get_location_info(location)
-        return jsonify(location_info)
+        payload, status = lookup_location_info(request.get_json())
+        return jsonify(payload), status
     
     except Exception as e:
         return jsonify({'error': f'Location info error: {str(e)}'}), 500
@@ -677,28 +3471,8 @@ def get_location_info():
 def get_weather_forecast():
     """Get weather forecast for a location"""
     try:
-        data = request.get_json()
-        location = data.get('location')
-        days = data.get('days', 5)
-        
-        if not location:
-            return jsonify({'error': 'Location is required'}), 400
-        
-        if not google_services:
-            return jsonify({'error': 'Weather services not available'}), 503
-        
-        # First get coordinates
-        geocode_result = google_services.geocoding.get_coordinates(location)
-        if 'error' in geocode_result or 'results' not in geocode_result or not geocode_result['results']:
-            return jsonify({'error': 'Location not found'}), 404
-        
-        location_data = geocode_result['results'][0]
-        lat = location_data['geometry']['location']['lat']
-        lng = location_data['geometry']['location']['lng']
-        
-        # Get forecast
-        forecast = google_services.weather.get_forecast(lat, lng, days)
-        return jsonify(forecast)
+        payload, status = lookup_weather_forecast(request.get_json())
+        return jsonify(payload), status
     
     except Exception as e:
         return jsonify({'error': f'Weather forecast error: {str(e)}'}), 500
@@ -707,51 +3481,18 @@ def get_weather_forecast():
 def get_directions():
     """Get directions between locations"""
     try:
-        data = request.get_json()
-        origin = data.get('origin')
-        destination = data.get('destination')
-        mode = data.get('mode', 'driving')
-        waypoints = data.get('waypoints')
-        
-        if not origin or not destination:
-            return jsonify({'error': 'Origin and destination are required'}), 400
-        
-        if not google_services:
-            return jsonify({'error': 'Google services not available'}), 503
-        
-        directions = google_services.directions.get_directions(origin, destination, mode, waypoints)
-        return jsonify(directions)
+        payload, status = lookup_directions(request.get_json())
+        return jsonify(payload), status
     
     except Exception as e:
-        return jsonify({'error': f'Directions error: {str(e)}'}), 500
-
-@app.route('/api/places/search', methods=['POST'])
-def search_places():
-    """Search for places"""
-    try:
-        data = request.get_json()
-        query = data.get('query')
-        location = data.get('location')
-        place_type = data.get('type')
-        
-        if not google_services:
-            return jsonify({'error': 'Google services not available'}), 503
-        
-        if query:
-            # Text search
-            results = google_services.places.text_search(query, location)
-        elif location and place_type:
-            # Get coordinates first
-            geocode_result = google_services.geocoding.get_coordinates(location)
-            if 'results' in geocode_result and geocode_result['results']:
-                coords = geocode_result['results'][0]['geometry']['location']
-                results = google_services.places.search_nearby(coords['lat'], coords['lng'], place_type)
-            else:
-                return jsonify({'error': 'Could not geocode location'}), 400
-        else:
-            return jsonify({'error': 'Query or location+type are required'}), 400
-        
-        return jsonify(results)
+        return jsonify({'error': f'Directions error: {str(e)}'}), 500
+
+@app.route('/api/places/search', methods=['POST'])
+def search_places():
+    """Search for places"""
+    try:
+        payload, status = lookup_places(request.get_json())
+        return jsonify(payload), status
     
     except Exception as e:
         return jsonify({'error': f'Places search error: {str(e)}'}), 500
@@ -795,26 +3536,12 @@ def get_static_map():
 
 @app.route('/api/currency/<destination>')
 @app.route('/api/currency/<destination>/<base_currency>')
+@cache_policy(max_age=300, stale_while_revalidate=3600, volatile=('last_updated',))
 def get_currency_info(destination, base_currency="USD"):
     """Get currency information for a destination"""
     try:
-        # Extract country from destination
-        country = destination.split(',')[-1].strip() if ',' in destination else destination
-        local_currency = currency_service.get_country_currency(country)
-        
-        # Get exchange rate
-        rate = currency_service.get_exchange_rate(base_currency, local_currency)
-        
-        return jsonify({
-            'success': True,
-            'destination': destination,
-            'country': country,
-            'local_currency': local_currency,
-            'base_currency': base_currency,
-            'exchange_rate': rate,
-            'formatted_rate': f"1 {base_currency} = {rate:.2f} {local_currency}",
-            'last_updated': datetime.now().isoformat()
-        })
+        payload, status = lookup_currency_info(destination, base_currency)
+        return jsonify(payload), status
         
     except Exception as e:
         return jsonify({
@@ -822,100 +3549,370 @@ def get_currency_info(destination, base_currency="USD"):
             'error': f'Currency lookup error: {str(e)}'
         }), 500
 
-@app.route('/api/generate-itinerary', methods=['POST'])
-def generate_itinerary():
-    """Generate travel itinerary using Gemini AI"""
-    try:
-        # Get request data
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['destination', 'start_date', 'end_date', 'duration', 'people']
-        missing_fields = [field for field in required_fields if not data.get(field)]
+class BatchGeocoder:
+    """Geocodes each distinct address once per batch, however many sub-requests need it.
+    
+    The first sub-request asking for an address does the lookup on its own thread;
+    the others wait for its result, so no pool thread ever waits on queued work.
+    """
+    
+    def __init__(self, geocoding):
+        self.geocoding = geocoding
+        self._lock = threading.Lock()
+        self._results = {}  # normalized address -> Future
+        self.requested = 0
+    
+    def __call__(self, address):
+        key = GeocodeCache.normalize_address(address)
+        with self._lock:
+            self.requested += 1
+            future = self._results.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._results[key] = future
         
-        if missing_fields:
-            return jsonify({
-                'success': False,
-                'error': f'Missing required fields: {", ".join(missing_fields)}'
-            }), 400
+        if leader:
+            try:
+                future.set_result(self.geocoding.get_coordinates(address))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+    
+    def get_stats(self):
+        with self._lock:
+            return {'requested': self.requested, 'performed': len(self._results)}
+
+def lookup_batch_currency(data, geocode=None):
+    destination = data.get('destination')
+    if not destination:
+        return {'error': 'Destination is required'}, 400
+    return lookup_currency_info(destination, data.get('base_currency', 'USD'))
+
+# Sub-request type -> (lookup, error prefix of the matching single-purpose route)
+BATCH_LOOKUPS = {
+    'location-info': (lookup_location_info, 'Location info error'),
+    'weather-forecast': (lookup_weather_forecast, 'Weather forecast error'),
+    'currency': (lookup_batch_currency, 'Currency lookup error'),
+    'places-search': (lookup_places, 'Places search error'),
+    'directions': (lookup_directions, 'Directions error')
+}
+
+def parse_batch_request(data):
+    """Validate a batch body into [(id, type, params)] or return an error message"""
+    if not isinstance(data, dict):
+        return None, 'Body must be a JSON object with a requests list'
+    items = data.get('requests')
+    if not isinstance(items, list) or not items:
+        return None, 'requests must be a non-empty list'
+    if len(items) > BATCH_MAX_REQUESTS:
+        return None, f'At most {BATCH_MAX_REQUESTS} requests per batch'
+    
+    parsed = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or item.get('type') not in BATCH_LOOKUPS:
+            return None, f"requests[{index}].type must be one of: {', '.join(BATCH_LOOKUPS)}"
+        params = item.get('params') or {}
+        if not isinstance(params, dict):
+            return None, f'requests[{index}].params must be an object'
+        parsed.append((str(item.get('id', index)), item['type'], params))
+    return parsed, None
+
+def run_batch_lookup(request_type, params, geocode):
+    """Run one sub-request, timing it and turning exceptions into its own 500"""
+    lookup, error_prefix = BATCH_LOOKUPS[request_type]
+    started = time.time()
+    try:
+        payload, status = lookup(params, geocode=geocode)
+    except Exception as e:
+        payload, status = {'error': f'{error_prefix}: {str(e)}'}, 500
+    return payload, status, round((time.time() - started) * 1000, 1)
+
+@app.route('/api/batch', methods=['POST'])
+def batch_lookups():
+    """Run several API lookups concurrently in one round-trip"""
+    try:
+        items, error = parse_batch_request(request.get_json(silent=True))
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
         
-        # Check if Gemini is available
-        if not config.gemini_model:
-            return jsonify({
-                'success': False,
-                'error': 'Gemini AI is not available. Please check the API key configuration.'
-            }), 503
+        started = time.time()
+        geocode = BatchGeocoder(google_services.geocoding) if google_services else None
         
-        # Extract data
-        destination = data.get('destination')
-        start_date = data.get('start_date')
-        end_date = data.get('end_date')
-        duration = data.get('duration')
-        people = data.get('people')
-        children = data.get('children', 0)
-        budget = data.get('budget', '')
-        lodging = data.get('lodging', '')
-        travel_transport = data.get('travelTransport', '')
-        local_transport = data.get('localTransport', '')
-        interests = data.get('interests', [])
-        special_requests = data.get('special_requests', '')
+        # Identical sub-requests run once and share the result
+        futures = {}
+        for _, request_type, params in items:
+            key = (request_type, json.dumps(params, sort_keys=True))
+            if key not in futures:
+                futures[key] = batch_executor.submit(contextvars.copy_context().run, run_batch_lookup, request_type, params, geocode)
         
-        # Create enhanced prompt with Google API integration
-        prompt = create_enhanced_itinerary_prompt(
-            destination, start_date, end_date, duration, people, children,
-            budget, lodging, travel_transport, local_transport, interests, special_requests
-        )
+        # Runs on its own pool: sub-requests block on the location fan-out pool, never on this one
+        done, _ = wait(futures.values(), timeout=BATCH_TIMEOUT)
         
-        print(f"🎯 Generating enhanced itinerary for {destination} ({duration} days)")
+        results = []
+        for request_id, request_type, params in items:
+            future = futures[(request_type, json.dumps(params, sort_keys=True))]
+            if future in done:
+                payload, status, duration_ms = future.result()
+            else:
+                future.cancel()
+                payload, status, duration_ms = {'error': f'Timed out after {BATCH_TIMEOUT}s'}, 504, None
+            results.append({
+                'id': request_id,
+                'type': request_type,
+                'status': status,
+                'duration_ms': duration_ms,
+                'data': payload
+            })
         
-        # Get location context if Google services available
-        location_context = ""
-        if google_services:
-            try:
-                location_info = google_services.get_location_info(destination)
-                if 'location' in location_info:
-                    location_context = f"\n\nLocation Context:\n"
-                    location_context += f"Address: {location_info['location']['address']}\n"
-                    
-                    if 'weather' in location_info and 'main' in location_info['weather']:
-                        weather = location_info['weather']
-                        location_context += f"Current Weather: {weather['main']['temp']}°C, {weather['weather'][0]['description']}\n"
-                    
-                    if 'nearby' in location_info:
-                        nearby = location_info['nearby']
-                        if 'attractions' in nearby and 'results' in nearby['attractions']:
-                            attractions = [place['name'] for place in nearby['attractions']['results'][:5]]
-                            location_context += f"Nearby Attractions: {', '.join(attractions)}\n"
-                        
-                        if 'restaurants' in nearby and 'results' in nearby['restaurants']:
-                            restaurants = [place['name'] for place in nearby['restaurants']['results'][:5]]
-                            location_context += f"Nearby Restaurants: {', '.join(restaurants)}\n"
-                    
-                    prompt += location_context
-            except Exception as e:
-                print(f"Could not get location context: {e}")
-        else:
-            print("Google services not available for enhanced context")
+        return jsonify({
+            'success': True,
+            'results': results,
+            'count': len(results),
+            'deduplicated': len(items) - len(futures),
+            'geocoding': geocode.get_stats() if geocode else None,
+            'duration_ms': round((time.time() - started) * 1000, 1)
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Batch error: {str(e)}'}), 500
+
+def parse_itinerary_request(data):
+    """Validate an itinerary request, returning (trip, None) or (None, error response)"""
+    data = data or {}
+    
+    # Validate required fields
+    required_fields = ['destination', 'start_date', 'end_date', 'duration', 'people']
+    missing_fields = [field for field in required_fields if not data.get(field)]
+    
+    if missing_fields:
+        return None, (jsonify({
+            'success': False,
+            'error': f'Missing required fields: {", ".join(missing_fields)}'
+        }), 400)
+    
+    output_format = data.get('format', 'text')
+    if output_format not in ('text', 'structured'):
+        return None, (jsonify({
+            'success': False,
+            'error': "format must be 'text' or 'structured'"
+        }), 400)
+    
+    # Counts feed the cache key and the prompt, so they must be whole numbers ("3", not "3 days")
+    counts = {}
+    for field, minimum in (('duration', 1), ('people', 1), ('children', 0)):
+        try:
+            counts[field] = int(str(data.get(field) or 0).strip())
+        except ValueError:
+            counts[field] = None
+        if counts[field] is None or counts[field] < minimum:
+            return None, (jsonify({
+                'success': False,
+                'error': f'{field} must be a whole number of at least {minimum}'
+            }), 400)
+    
+    # Check if Gemini is available
+    if not config.gemini_model:
+        return None, (jsonify({
+            'success': False,
+            'error': 'Gemini AI is not available. Please check the API key configuration.'
+        }), 503)
+    
+    return {
+        'destination': data.get('destination'),
+        'start_date': data.get('start_date'),
+        'end_date': data.get('end_date'),
+        'duration': counts['duration'],
+        'people': counts['people'],
+        'children': counts['children'],
+        'budget': data.get('budget', ''),
+        'lodging': data.get('lodging', ''),
+        'travel_transport': data.get('travelTransport', ''),
+        'local_transport': data.get('localTransport', ''),
+        'interests': data.get('interests', []),
+        'special_requests': data.get('special_requests', ''),
+        'force_refresh': bool(data.get('force_refresh', False)),
+        'format': output_format
+    }, None
+
+def format_location_context(results):
+    """Summarize gathered location data for the itinerary prompt"""
+    if 'geocode' not in results:
+        return ""
+    
+    location_context = f"\n\nLocation Context:\n"
+    location_context += f"Address: {results['geocode']['address']}\n"
+    
+    weather = results.get('weather')
+    if weather and 'main' in weather:
+        location_context += f"Current Weather: {weather['main']['temp']}°C, {weather['weather'][0]['description']}\n"
+    
+    attractions = results.get('attractions')
+    if attractions and 'results' in attractions:
+        names = [place['name'] for place in attractions['results'][:5]]
+        location_context += f"Nearby Attractions: {', '.join(names)}\n"
+    
+    restaurants = results.get('restaurants')
+    if restaurants and 'results' in restaurants:
+        names = [place['name'] for place in restaurants['results'][:5]]
+        location_context += f"Nearby Restaurants: {', '.join(names)}\n"
+    
+    return location_context
+
+@traced('prompt.build')
+def build_itinerary_prompt(trip, include_instructions=True):
+    """Create the Gemini prompt for a validated trip request, returning (prompt, context metadata)"""
+    # Location lookups run while the prompt is assembled
+    enrichment = None
+    if google_services:
+        enrichment = LocationEnrichment(google_services, trip['destination'], location_context_cache)
+    else:
+        print("Google services not available for enhanced context")
+    
+    prompt_builder = create_enhanced_itinerary_prompt if include_instructions else create_itinerary_traveler_block
+    # Create enhanced prompt with Google API integration
+    prompt = prompt_builder(
+        trip['destination'], trip['start_date'], trip['end_date'], trip['duration'],
+        trip['people'], trip['children'], trip['budget'], trip['lodging'],
+        trip['travel_transport'], trip['local_transport'], trip['interests'], trip['special_requests']
+    )
+    
+    print(f"🎯 Generating enhanced itinerary for {trip['destination']} ({trip['duration']} days)")
+    
+    if enrichment is None:
+        return prompt, {'sources': [], 'missing': list(LocationEnrichment.SOURCES), 'cached': False}
+    
+    # Whatever arrived within the budget goes into the prompt, the rest is dropped
+    location_context, context_metadata = enrichment.collect(LOCATION_CONTEXT_BUDGET)
+    return prompt + location_context, context_metadata
+
+def prepare_itinerary_generation(trip):
+    """Return (model, prompt, context metadata), sending only the traveler block when the instructions are cached"""
+    instructions_model = itinerary_prompt_cache.get_model() if itinerary_prompt_cache else None
+    prompt, context_metadata = build_itinerary_prompt(trip, include_instructions=instructions_model is None)
+    return instructions_model or config.gemini_model, prompt, context_metadata
+
+@traced('gemini')
+def gemini_generate(model, *args, **kwargs):
+    """model.generate_content behind the Gemini circuit breaker and latency budget"""
+    kwargs.setdefault('request_options', {'timeout': upstream_guard.timeout('gemini')})
+    # Not hedged - a duplicate generation costs a full set of tokens
+    if kwargs.get('stream'):
+        # Streamed chunks can still fail after the first one, so wait for the end of the stream
+        return upstream_guard.stream('gemini', lambda: model.generate_content(*args, **kwargs))
+    return upstream_guard.call('gemini', lambda: model.generate_content(*args, **kwargs))
+
+def log_gemini_usage(response, label):
+    """Log per-request token counts reported by Gemini"""
+    try:
+        usage = response.usage_metadata
+        metrics.gemini_tokens.inc(label, 'prompt', amount=usage.prompt_token_count)
+        metrics.gemini_tokens.inc(label, 'cached', amount=getattr(usage, 'cached_content_token_count', 0) or 0)
+        metrics.gemini_tokens.inc(label, 'output', amount=usage.candidates_token_count)
+        print(f"🔢 {label}: {usage.prompt_token_count} input tokens "
+              f"({getattr(usage, 'cached_content_token_count', 0)} cached), "
+              f"{usage.candidates_token_count} output tokens")
+    except Exception:
+        pass
+
+def build_itinerary_response(trip, itinerary, cached_entry=None, location_context=None):
+    """Response payload shared by the standard and streaming itinerary endpoints"""
+    payload = {
+        'success': True,
+        'itinerary': itinerary,
+        'destination': trip['destination'],
+        'duration': trip['duration'],
+        'start_date': trip['start_date'],
+        'end_date': trip['end_date'],
+        'generated_at': datetime.now().isoformat(),
+        'cached': cached_entry is not None
+    }
+    if cached_entry is not None:
+        payload['cached_at'] = datetime.fromtimestamp(cached_entry['created_at']).isoformat()
+    if location_context is not None:
+        payload['location_context'] = location_context
+    return payload
+
+def lookup_cached_itinerary(trip):
+    """Return (cache key, cached entry or None), skipping the lookup when regeneration is forced"""
+    cache_key = itinerary_cache.make_key(trip)
+    if trip['force_refresh']:
+        return cache_key, None
+    return cache_key, itinerary_cache.get(cache_key)
+
+def run_itinerary_generation(trip, progress=None):
+    """Generate (or load from the cache) an itinerary and return the response payload"""
+    report = progress or (lambda stage, percent: None)
+    if trip['format'] == 'structured':
+        return run_structured_itinerary_generation(trip, report)
+    
+    location_context = None
+    cache_key, cached_entry = lookup_cached_itinerary(trip)
+    if cached_entry:
+        print(f"♻️ Serving cached itinerary for {trip['destination']} ({trip['duration']} days)")
+        formatted_itinerary = cached_entry['itinerary']
+    else:
+        report('building_prompt', 10)
+        model, prompt, location_context = prepare_itinerary_generation(trip)
         
         # Generate itinerary using Gemini
-        response = config.gemini_model.generate_content(prompt)
+        report('generating', 30)
+        generation_started = time.time()
+        response = gemini_generate(model, prompt)
         itinerary = response.text
+        log_gemini_usage(response, 'Itinerary generation')
         
         # Clean the itinerary text (remove unwanted markdown characters)
+        report('finalizing', 90)
         formatted_itinerary = clean_itinerary_text(itinerary)
+        itinerary_cache.set(cache_key, formatted_itinerary, time.time() - generation_started)
+    
+    # Enhance with currency information (applied on every request so rates stay current)
+    enhanced_itinerary = enhance_itinerary_with_currency(formatted_itinerary, trip['destination'])
+    
+    return build_itinerary_response(trip, enhanced_itinerary, cached_entry, location_context)
+
+def run_structured_itinerary_generation(trip, report):
+    """Generate an itinerary constrained to STRUCTURED_ITINERARY_SCHEMA and validate it"""
+    location_context = None
+    cache_key, cached_entry = lookup_cached_itinerary(trip)
+    if cached_entry:
+        itinerary = parse_structured_itinerary(json.loads(cached_entry['itinerary']))
+    else:
+        report('building_prompt', 10)
+        model, prompt, location_context = prepare_itinerary_generation(trip)
+        prompt += STRUCTURED_OUTPUT_INSTRUCTIONS
         
-        # Enhance with currency information
-        enhanced_itinerary = enhance_itinerary_with_currency(formatted_itinerary, destination)
+        report('generating', 30)
+        generation_started = time.time()
+        response = gemini_generate(
+            model,
+            prompt,
+            generation_config=load_genai().GenerationConfig(
+                response_mime_type='application/json',
+                response_schema=STRUCTURED_ITINERARY_SCHEMA
+            )
+        )
+        log_gemini_usage(response, 'Structured itinerary generation')
         
-        return jsonify({
-            'success': True,
-            'itinerary': enhanced_itinerary,
-            'destination': destination,
-            'duration': duration,
-            'start_date': start_date,
-            'end_date': end_date,
-            'generated_at': datetime.now().isoformat()
-        })
+        report('finalizing', 90)
+        itinerary = parse_structured_itinerary(json.loads(response.text))
+        itinerary_cache.set(cache_key, json.dumps(asdict(itinerary)), time.time() - generation_started)
+    
+    payload = build_itinerary_response(trip, asdict(itinerary), cached_entry, location_context)
+    payload['format'] = 'structured'
+    payload['currency'] = build_currency_details(trip['destination'])
+    return payload
+
+@app.route('/api/generate-itinerary', methods=['POST'])
+def generate_itinerary():
+    """Generate travel itinerary using Gemini AI"""
+    try:
+        trip, error_response = parse_itinerary_request(request.get_json())
+        if error_response:
+            return error_response
+        
+        return jsonify(run_itinerary_generation(trip))
         
     except Exception as e:
         print(f"❌ Error generating itinerary: {e}")
@@ -924,6 +3921,84 @@ def generate_itinerary():
             'error': f'Failed to generate itinerary: {str(e)}'
         }), 500
 
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/generate-itinerary/stream', methods=['POST'])
+def generate_itinerary_stream():
+    """Stream itinerary generation as Server-Sent Events while Gemini writes it"""
+    try:
+        trip, error_response = parse_itinerary_request(request.get_json())
+        if error_response:
+            return error_response
+        if trip['format'] == 'structured':
+            return jsonify({
+                'success': False,
+                'error': 'Structured itineraries are not streamed, use /api/generate-itinerary'
+            }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Failed to generate itinerary: {str(e)}'
+        }), 500
+    
+    def generate():
+        try:
+            yield sse_event('start', {
+                'destination': trip['destination'],
+                'duration': trip['duration'],
+                'start_date': trip['start_date'],
+                'end_date': trip['end_date']
+            })
+            
+            cache_key, cached_entry = lookup_cached_itinerary(trip)
+            if cached_entry:
+                itinerary = enhance_itinerary_with_currency(cached_entry['itinerary'], trip['destination'])
+                yield sse_event('chunk', {'text': itinerary})
+                yield sse_event('done', build_itinerary_response(trip, itinerary, cached_entry))
+                return
+            
+            model, prompt, location_context = prepare_itinerary_generation(trip)
+            cleaner = IncrementalItineraryCleaner(header=build_currency_info(trip['destination']))
+            raw_parts = []
+            
+            generation_started = time.time()
+            response = gemini_generate(model, prompt, stream=True)
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    continue  # Chunks without text parts (e.g. the final finish-reason chunk)
+                raw_parts.append(text)
+                delta = cleaner.feed(text)
+                if delta:
+                    yield sse_event('chunk', {'text': delta})
+            
+            delta = cleaner.finish()
+            if delta:
+                yield sse_event('chunk', {'text': delta})
+            log_gemini_usage(response, 'Streamed itinerary generation')
+            
+            # The final event carries the itinerary exactly as the non-streaming endpoint builds it
+            formatted_itinerary = clean_itinerary_text(''.join(raw_parts))
+            itinerary_cache.set(cache_key, formatted_itinerary, time.time() - generation_started)
+            itinerary = enhance_itinerary_with_currency(formatted_itinerary, trip['destination'])
+            yield sse_event('done', build_itinerary_response(trip, itinerary, location_context=location_context))
+        except Exception as e:
+            print(f"❌ Error streaming itinerary: {e}")
+            yield sse_event('error', {
+                'success': False,
+                'error': f'Failed to generate itinerary: {str(e)}'
+            })
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@traced('itinerary.clean')
 def clean_itinerary_text(text):
     """Clean itinerary text by removing unwanted markdown characters while preserving content."""
     import re
@@ -953,28 +4028,145 @@ def clean_itinerary_text(text):
     
     return cleaned_text.strip()
 
+# Without a day heading, the currency header goes after this many lines of the itinerary
+CURRENCY_HEADER_AFTER_LINES = 3
+CURRENCY_HEADER_MARKERS = ('CURRENCY INFORMATION', 'Exchange Rate')
+
+class IncrementalItineraryCleaner:
+    """Applies the clean_itinerary_text rules line by line to streamed model output.
+    
+    The header goes where enhance_itinerary_with_currency puts it: before the first day
+    heading, or after the first header_after_lines lines when there is none. Lines past
+    that point are held back until a day heading or the end of the stream settles it.
+    """
+    
+    def __init__(self, header='', header_after_lines=CURRENCY_HEADER_AFTER_LINES):
+        self.header = header.strip('\n')
+        self.header_after_lines = header_after_lines
+        self._pending = ''
+        self._lines_out = 0  # cleaned lines so far, blank separators included
+        self._placed = 0  # of those, lines already sent or held
+        self._blank_run = 0
+        self._held = []
+        self._marked = False  # a line ahead of the header already covers the currency
+        self._last_line = None
+    
+    @staticmethod
+    def _clean_line(line):
+        line = re.sub(r'^#{1,6}\s*', '', line)
+        line = re.sub(r'\*\*([^*]+)\*\*', r'\1', line)
+        line = re.sub(r'(?<!\*)\*(?!\*)', '', line)
+        return line.rstrip()
+    
+    def _cleaned_lines(self, lines):
+        """Cleaned lines, with '' for the one blank line kept between paragraphs"""
+        for line in lines:
+            cleaned = self._clean_line(line)
+            if not cleaned.strip():
+                # Leading blank lines are dropped, runs of blank lines collapse to one
+                if self._lines_out:
+                    self._blank_run += 1
+                continue
+            if self._lines_out and self._blank_run:
+                self._lines_out += 1
+                yield ''
+            elif not self._lines_out:
+                cleaned = cleaned.lstrip()  # clean_itinerary_text strips the whole text
+            self._blank_run = 0
+            self._lines_out += 1
+            yield cleaned
+    
+    def _place(self, lines):
+        """Text ready to send now, with the header inserted once its position is known"""
+        output = []
+        for line in lines:
+            index = self._placed
+            self._placed += 1
+            if not self.header:
+                output.append(self._join([line]))
+            elif DAY_HEADING_PATTERN.match(line):
+                held, self._held = self._held, []
+                if self._marked or any(marker in held_line for held_line in held for marker in CURRENCY_HEADER_MARKERS):
+                    self.header = ''
+                    output.append(self._join(held + [line]))
+                else:
+                    output.append(self._join(self._with_header(held, [line])))
+            elif index >= self.header_after_lines:
+                self._held.append(line)
+            else:
+                self._marked = self._marked or any(marker in line for marker in CURRENCY_HEADER_MARKERS)
+                output.append(self._join([line]))
+        return ''.join(output)
+    
+    def _with_header(self, before, after):
+        """before + header + after, with one blank line on each side of the header"""
+        header, self.header = self.header, ''
+        while before and not before[-1]:
+            before.pop()
+        while after and not after[0]:
+            after.pop(0)
+        lines = list(before)
+        if lines or self._last_line:
+            lines.append('')
+        lines += header.split('\n')
+        if after:
+            lines += [''] + after
+        return lines
+    
+    def _join(self, lines):
+        parts = []
+        for line in lines:
+            parts.append(line if self._last_line is None else f"\n{line}")
+            self._last_line = line
+        return ''.join(parts)
+    
+    def feed(self, text):
+        """Add streamed text and return the cleaned text for every completed line"""
+        lines = (self._pending + text).split('\n')
+        self._pending = lines.pop()
+        return self._place(self._cleaned_lines(lines))
+    
+    def finish(self):
+        """Flush the last partial line, and the header when no day heading placed it"""
+        output = self._place(self._cleaned_lines([self._pending]))
+        self._pending = ''
+        held, self._held = self._held, []
+        if self.header and not self._marked:
+            held = self._with_header([], held)
+        self.header = ''
+        return output + self._join(held)
+
+def build_currency_info(destination):
+    """Currency header for a destination's itinerary, or '' when prices are in USD"""
+    # Get currency for destination
+    country = destination.split(',')[-1].strip() if ',' in destination else destination
+    local_currency = currency_service.get_country_currency(country)
+    
+    if local_currency == "USD":
+        return ""  # No conversion needed
+    
+    currency_info = f"\n\nCURRENCY INFORMATION:\n"
+    currency_info += f"Local Currency: {local_currency}\n"
+    currency_info += f"Exchange Rate: 1 USD = {currency_service.get_exchange_rate('USD', local_currency):.2f} {local_currency}\n"
+    currency_info += f"Note: All prices shown as {local_currency} amount (~USD equivalent)\n"
+    return currency_info
+
 def enhance_itinerary_with_currency(itinerary_text, destination):
     """Enhance itinerary text with currency conversion information"""
     try:
-        # Get currency for destination
-        country = destination.split(',')[-1].strip() if ',' in destination else destination
-        local_currency = currency_service.get_country_currency(country)
-        
-        if local_currency == "USD":
-            return itinerary_text  # No conversion needed
-        
-        # Add currency information header if not already present
-        currency_info = f"\n\nCURRENCY INFORMATION:\n"
-        currency_info += f"Local Currency: {local_currency}\n"
-        currency_info += f"Exchange Rate: 1 USD = {currency_service.get_exchange_rate('USD', local_currency):.2f} {local_currency}\n"
-        currency_info += f"Note: All prices shown as {local_currency} amount (~USD equivalent)\n"
+        currency_info = build_currency_info(destination)
+        if not currency_info:
+            return itinerary_text
         
-        # Insert currency info after the first paragraph if not already present
-        if "CURRENCY INFORMATION" not in itinerary_text and "Exchange Rate" not in itinerary_text:
-            lines = itinerary_text.split('\n')
-            insert_index = 3 if len(lines) > 3 else len(lines)
-            lines.insert(insert_index, currency_info)
-            itinerary_text = '\n'.join(lines)
+        # Insert currency info before the first day (or after the first lines) unless the text
+        # ahead of that point already covers it - IncrementalItineraryCleaner streams the same rule
+        lines = itinerary_text.split('\n')
+        first_day = next((index for index, line in enumerate(lines) if DAY_HEADING_PATTERN.match(line)), None)
+        insert_index = first_day if first_day is not None else min(CURRENCY_HEADER_AFTER_LINES, len(lines))
+        before = '\n'.join(lines[:insert_index]).rstrip('\n')
+        if not any(marker in before for marker in CURRENCY_HEADER_MARKERS):
+            after = '\n'.join(lines[insert_index:]).lstrip('\n')
+            itinerary_text = '\n\n'.join(part for part in (before, currency_info.strip('\n'), after) if part)
         
         return itinerary_text
         
@@ -982,8 +4174,189 @@ def enhance_itinerary_with_currency(itinerary_text, destination):
         print(f"Error enhancing currency info: {e}")
         return itinerary_text
 
-def create_enhanced_itinerary_prompt(destination, start_date, end_date, duration, people, children, budget, lodging, travel_transport, local_transport, interests, special_requests):
-    """Create an enhanced prompt with Google API integration"""
+def build_currency_details(destination):
+    """Currency information for structured itineraries"""
+    country = destination.split(',')[-1].strip() if ',' in destination else destination
+    local_currency = currency_service.get_country_currency(country)
+    return {
+        'local_currency': local_currency,
+        'exchange_rate': round(currency_service.get_exchange_rate('USD', local_currency), 4),
+        'formatted_rate': f"1 USD = {currency_service.get_exchange_rate('USD', local_currency):.2f} {local_currency}"
+    }
+
+# Structured (JSON) itinerary output
+STRUCTURED_ITINERARY_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'overview': {'type': 'string'},
+        'days': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'day': {'type': 'integer'},
+                    'title': {'type': 'string'},
+                    'time_slots': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'period': {'type': 'string'},
+                                'activities': {
+                                    'type': 'array',
+                                    'items': {
+                                        'type': 'object',
+                                        'properties': {
+                                            'name': {'type': 'string'},
+                                            'address': {'type': 'string'},
+                                            'price_local': {'type': 'string'},
+                                            'price_usd': {'type': 'string'},
+                                            'duration': {'type': 'string'},
+                                            'description': {'type': 'string'}
+                                        },
+                                        'required': ['name', 'address', 'price_local', 'duration']
+                                    }
+                                }
+                            },
+                            'required': ['period', 'activities']
+                        }
+                    }
+                },
+                'required': ['day', 'title', 'time_slots']
+            }
+        },
+        'budget': {
+            'type': 'object',
+            'properties': {
+                'currency': {'type': 'string'},
+                'daily_total_local': {'type': 'string'},
+                'daily_total_usd': {'type': 'string'},
+                'notes': {'type': 'array', 'items': {'type': 'string'}}
+            },
+            'required': ['currency', 'daily_total_local', 'daily_total_usd']
+        },
+        'safety': {
+            'type': 'object',
+            'properties': {
+                'tips': {'type': 'array', 'items': {'type': 'string'}},
+                'areas_to_avoid': {'type': 'array', 'items': {'type': 'string'}},
+                'common_scams': {'type': 'array', 'items': {'type': 'string'}},
+                'emergency_contacts': {'type': 'array', 'items': {'type': 'string'}}
+            },
+            'required': ['tips', 'emergency_contacts']
+        },
+        'wellness': {'type': 'array', 'items': {'type': 'string'}}
+    },
+    'required': ['days', 'budget', 'safety']
+}
+
+STRUCTURED_OUTPUT_INSTRUCTIONS = """
+
+OUTPUT FORMAT:
+Respond with JSON matching the provided schema instead of prose. Put each day's activities under Morning, Afternoon and Evening time slots. Give every activity its full address, its price as a local currency string with the USD conversion in price_usd, and the time it takes. Keep descriptions to one or two sentences."""
+
+@dataclass
+class ItineraryActivity:
+    name: str
+    address: str
+    price_local: str
+    price_usd: str
+    duration: str
+    description: str
+
+@dataclass
+class ItineraryTimeSlot:
+    period: str
+    activities: list
+
+@dataclass
+class ItineraryDay:
+    day: int
+    title: str
+    time_slots: list
+
+@dataclass
+class ItineraryBudget:
+    currency: str
+    daily_total_local: str
+    daily_total_usd: str
+    notes: list
+
+@dataclass
+class ItinerarySafety:
+    tips: list
+    areas_to_avoid: list
+    common_scams: list
+    emergency_contacts: list
+
+@dataclass
+class StructuredItinerary:
+    overview: str
+    days: list
+    budget: ItineraryBudget
+    safety: ItinerarySafety
+    wellness: list
+
+@traced('itinerary.parse')
+def parse_structured_itinerary(data):
+    """Validate model JSON into a StructuredItinerary, raising ValueError when it is unusable"""
+    def text(value):
+        return str(value).strip() if value is not None else ''
+    
+    def text_list(value):
+        return [text(item) for item in value if text(item)] if isinstance(value, list) else []
+    
+    if not isinstance(data, dict) or not isinstance(data.get('days'), list) or not data['days']:
+        raise ValueError("Structured itinerary has no days")
+    
+    days = []
+    for index, day in enumerate(data['days'], start=1):
+        if not isinstance(day, dict):
+            raise ValueError(f"Day {index} is not an object")
+        time_slots = []
+        for slot in day.get('time_slots') or []:
+            activities = [
+                ItineraryActivity(
+                    name=text(activity.get('name')),
+                    address=text(activity.get('address')),
+                    price_local=text(activity.get('price_local')),
+                    price_usd=text(activity.get('price_usd')),
+                    duration=text(activity.get('duration')),
+                    description=text(activity.get('description'))
+                )
+                for activity in slot.get('activities') or []
+                if isinstance(activity, dict) and text(activity.get('name'))
+            ]
+            if activities:
+                time_slots.append(ItineraryTimeSlot(period=text(slot.get('period')), activities=activities))
+        try:
+            day_number = int(day.get('day', index))
+        except (TypeError, ValueError):
+            day_number = index
+        days.append(ItineraryDay(day=day_number, title=text(day.get('title')), time_slots=time_slots))
+    
+    budget = data.get('budget') if isinstance(data.get('budget'), dict) else {}
+    safety = data.get('safety') if isinstance(data.get('safety'), dict) else {}
+    return StructuredItinerary(
+        overview=text(data.get('overview')),
+        days=days,
+        budget=ItineraryBudget(
+            currency=text(budget.get('currency')),
+            daily_total_local=text(budget.get('daily_total_local')),
+            daily_total_usd=text(budget.get('daily_total_usd')),
+            notes=text_list(budget.get('notes'))
+        ),
+        safety=ItinerarySafety(
+            tips=text_list(safety.get('tips')),
+            areas_to_avoid=text_list(safety.get('areas_to_avoid')),
+            common_scams=text_list(safety.get('common_scams')),
+            emergency_contacts=text_list(safety.get('emergency_contacts'))
+        ),
+        wellness=text_list(data.get('wellness'))
+    )
+
+def create_itinerary_traveler_block(destination, start_date, end_date, duration, people, children, budget, lodging, travel_transport, local_transport, interests, special_requests):
+    """Create the per-request part of the itinerary prompt (trip details, preferences, currency)"""
     
     # Get currency information for the destination
     country = destination.split(',')[-1].strip() if ',' in destination else destination
@@ -1061,7 +4434,7 @@ def create_enhanced_itinerary_prompt(destination, start_date, end_date, duration
     # Special requests context
     special_context = f"\n- Special considerations: {special_requests}" if special_requests else ""
     
-    prompt = f"""As a travel planner, create a detailed {duration}-day travel itinerary for {destination} from {start_date} to {end_date} for {people_text}.
+    return f"""As a travel planner, create a detailed {duration}-day travel itinerary for {destination} from {start_date} to {end_date} for {people_text}.
 
 TRAVELER PREFERENCES:
 - Group size: {people_text}
@@ -1073,22 +4446,32 @@ CURRENCY & PRICING REQUIREMENTS:
 - Format: "{local_currency}100 (~$75 USD)" for local prices
 - Include realistic price ranges for restaurants, attractions, transportation, and activities
 - Consider group size when calculating total costs (multiply individual prices by {people})
-- Mention any group discounts available for attractions or activities
+- Mention any group discounts available for attractions or activities"""
+
+def create_enhanced_itinerary_prompt(destination, start_date, end_date, duration, people, children, budget, lodging, travel_transport, local_transport, interests, special_requests):
+    """Create an enhanced prompt with Google API integration"""
+    traveler_block = create_itinerary_traveler_block(
+        destination, start_date, end_date, duration, people, children,
+        budget, lodging, travel_transport, local_transport, interests, special_requests
+    )
+    return f"{traveler_block}\n\n{ITINERARY_STATIC_INSTRUCTIONS}"
 
-REQUIREMENTS:
+# Instructions shared by every itinerary request. They refer to the destination, group and
+# currency given in the traveler block, so they can be sent once as cached content.
+ITINERARY_STATIC_INSTRUCTIONS = """REQUIREMENTS:
 - Provide a day-by-day breakdown (Day 1, Day 2, etc.)
-- Include specific activities, attractions, and experiences with prices in {local_currency} and USD conversions for {people_text}
-- Suggest actual restaurant names and local cuisine with menu price ranges in both currencies for {people_text}
+- Include specific activities, attractions, and experiences with prices in the local currency and USD conversions for the whole group
+- Suggest actual restaurant names and local cuisine with menu price ranges in both currencies for the whole group
 - Include timing recommendations (morning, afternoon, evening)
-- Add transportation tips between locations with costs in {local_currency} and USD for {people_text}
+- Add transportation tips between locations with costs in the local currency and USD for the whole group
 - Consider group size when recommending accommodations and dining reservations
-- Include daily budget estimates in both {local_currency} and USD
+- Include daily budget estimates in both the local currency and USD
 
 LOCATION & SAFETY REQUIREMENTS:
 - Provide EXACT FULL ADDRESSES for all attractions, restaurants, and hotels
 - Format addresses as: "Address: [Complete Street Address, City, Postal Code, Country]"
 - Include a dedicated "SAFETY INFORMATION" section at the end covering:
-  * General safety tips for {destination}
+  * General safety tips for the destination
   * Areas to avoid, especially at night
   * Common scams and how to avoid them
   * Emergency contact numbers (police, medical, tourist help)
@@ -1113,10 +4496,10 @@ FORMAT & STRUCTURE:
 - Write content continuously without manual separators - the system will add visual dividers automatically
 
 REQUIRED SECTION STRUCTURE:
-1. Day 1 activities and details with pricing in {local_currency} and USD
+1. Day 1 activities and details with pricing in the local currency and USD
 2. Day 2 activities and details (if multi-day) with pricing in both currencies
 3. Additional days as needed with consistent pricing format
-4. DAILY BUDGET SUMMARY (estimated total daily costs in {local_currency} and USD)
+4. DAILY BUDGET SUMMARY (estimated total daily costs in the local currency and USD)
 5. CURRENCY & PAYMENT INFORMATION (exchange rates, payment methods, tipping customs)
 6. STRESS RELIEF & WELLNESS SECTION (dedicated section for relaxation and mental well-being)
 7. SAFETY INFORMATION (always include this major section)
@@ -1126,7 +4509,7 @@ REQUIRED SECTION STRUCTURE:
 
 STRESS RELIEF & WELLNESS REQUIREMENTS:
 - Include a dedicated "STRESS RELIEF & WELLNESS" section after the daily activities
-- Provide specific stress-relief activities and locations in {destination}
+- Provide specific stress-relief activities and locations in the destination
 - Include local spas, wellness centers, parks, or meditation spots with addresses and prices
 - Suggest calming activities for each day (morning yoga spots, evening relaxation, etc.)
 - Add breathing exercises, mindfulness tips, and relaxation techniques for travelers
@@ -1143,54 +4526,306 @@ IMPORTANT: Always include a comprehensive "STRESS RELIEF & WELLNESS" section tha
 
 Please create a comprehensive, well-structured itinerary that maximizes the travel experience while being practical, actionable, safe, budget-conscious with accurate currency conversions, and supportive of traveler mental health and well-being."""
 
-    return prompt
-
 def create_itinerary_prompt(destination, start_date, end_date, duration, people, budget, interests, special_requests):
     """Create a detailed prompt for Gemini AI (legacy function)"""
     # Use default values for new parameters to maintain backward compatibility
     return create_enhanced_itinerary_prompt(destination, start_date, end_date, duration, people, 0, budget, '', '', '', interests, special_requests)
 
-@app.route('/api/refine-itinerary', methods=['POST'])
-def refine_itinerary():
-    """Refine existing itinerary based on user feedback"""
+# Serve the static itinerary instructions from Gemini's context cache when possible
+itinerary_prompt_cache = None
+
+def warm_up_gemini():
+    """Build the Gemini model and start the instructions cache off the request path"""
+    global itinerary_prompt_cache
+    if not config.gemini_api_key:
+        return {'ok': False, 'error': 'GEMINI_API_KEY not configured'}
+    if not config.gemini_model:
+        return {'ok': False, 'error': 'Gemini model could not be initialized'}
+    if itinerary_prompt_cache is None and os.getenv('GEMINI_CONTEXT_CACHE', 'true').lower() != 'false':
+        itinerary_prompt_cache = GeminiPromptCache(config.gemini_model_name, ITINERARY_STATIC_INSTRUCTIONS)
+        itinerary_prompt_cache.start()
+    return {'ok': True, 'model': config.gemini_model_name}
+
+def warm_up_destinations():
+    """Start the destinations refresher, which fills the snapshot in the background"""
+    destinations_snapshot.start()
+    return {'ok': True, 'refresh_interval': destinations_snapshot.refresh_interval}
+
+def warm_up_currency():
+    """Load the first exchange-rate table before a request has to wait for it"""
+    rates = currency_service.get_rates()
+    if not rates:
+        return {'ok': False, 'error': 'Exchange rates unavailable'}
+    return {'ok': True, 'currencies': len(rates)}
+
+# Network-bound startup work runs after import so the first request is not kept waiting;
+# importing the module makes no upstream calls
+startup_warmup = StartupWarmup({
+    'pages': page_cache.warm,  # local work first, ahead of the tasks that call out
+    'destinations': warm_up_destinations,
+    'currency': warm_up_currency,
+    'google_apis': config.validate_google_apis,
+    'gemini': warm_up_gemini
+})
+if os.getenv('STARTUP_WARMUP', 'true').lower() != 'false':
+    startup_warmup.start()
+
+def parse_refinement_request(data):
+    """Validate a refinement request, returning (refinement, None) or (None, error response)"""
+    data = data or {}
+    
+    current_itinerary = data.get('current_itinerary')
+    feedback = data.get('feedback')
+    destination = data.get('destination')
+    
+    if not all([current_itinerary, feedback, destination]):
+        return None, (jsonify({
+            'success': False,
+            'error': 'Missing required data for refinement'
+        }), 400)
+    
+    if not config.gemini_model:
+        return None, (jsonify({
+            'success': False,
+            'error': 'Gemini AI is not available'
+        }), 503)
+    
+    return {
+        'current_itinerary': current_itinerary,
+        'feedback': feedback,
+        'destination': destination,
+        'full_refinement': bool(data.get('full_refinement', False))
+    }, None
+
+DAY_HEADING_PATTERN = re.compile(r'^\s*day\s+(\d+)\b', re.IGNORECASE)
+
+# Mixed-case headings from REQUIRED SECTION STRUCTURE that are not written in capitals
+KNOWN_SECTION_HEADINGS = ('cultural considerations', 'money and document safety', 'emergency contacts')
+
+# The summary sections that follow the days; only these end day parsing (not e.g. CURRENCY INFORMATION)
+SUMMARY_SECTION_MARKERS = (
+    'daily budget', 'budget summary', 'currency & payment', 'currency and payment', 'wellness',
+    'safety', 'cultural considerations', 'emergency contacts'
+)
+
+# Feedback keywords -> text that identifies the section they refer to
+SECTION_FEEDBACK_KEYWORDS = {
+    'BUDGET': ('budget', 'cost', 'price', 'expensive', 'cheap', 'afford', 'spend'),
+    'CURRENCY': ('currency', 'exchange rate', 'payment', 'tipping', 'cash', 'credit card'),
+    'WELLNESS': ('wellness', 'stress', 'relax', 'spa', 'yoga', 'meditation', 'anxiety', 'sleep', 'jet lag'),
+    'SAFETY INFORMATION': ('safety', 'scam', 'crime', 'dangerous', 'unsafe'),
+    'CULTURAL': ('culture', 'cultural', 'custom', 'etiquette'),
+    'EMERGENCY': ('emergency', 'police', 'hospital'),
+    'DOCUMENT': ('passport', 'document', 'visa')
+}
+
+ORDINAL_DAYS = {
+    'first': 1, 'second': 2, 'third': 3, 'fourth': 4, 'fifth': 5,
+    'sixth': 6, 'seventh': 7, 'eighth': 8, 'ninth': 9, 'tenth': 10
+}
+
+def is_section_heading(line):
+    """Whether a line is a non-day section heading such as SAFETY INFORMATION"""
+    stripped = re.sub(r'^\d+\.\s*', '', line.strip()).rstrip(':')
+    if not 4 <= len(stripped) <= 80 or stripped.startswith('-'):
+        return False
+    letters = [char for char in stripped if char.isalpha()]
+    if len(letters) >= 4 and stripped.upper() == stripped:
+        return True
+    return stripped.lower().startswith(KNOWN_SECTION_HEADINGS)
+
+def split_itinerary_sections(text):
+    """Split an itinerary into addressable sections (overview, Day N, summary sections)"""
+    sections = []
+    current = {'title': 'OVERVIEW', 'day': None, 'lines': []}
+    seen_days = set()
+    days_finished = False
+    
+    for line in text.split('\n'):
+        day_match = DAY_HEADING_PATTERN.match(line)
+        # "Day 2: ..." lines inside the budget summary are not new day sections
+        is_day = bool(day_match) and not days_finished and int(day_match.group(1)) not in seen_days
+        if is_day or is_section_heading(line):
+            if current['lines']:
+                sections.append(current)
+            day = int(day_match.group(1)) if is_day else None
+            if is_day:
+                seen_days.add(day)
+            elif seen_days and any(marker in line.lower() for marker in SUMMARY_SECTION_MARKERS):
+                days_finished = True
+            current = {'title': line.strip(), 'day': day, 'lines': [line]}
+        else:
+            current['lines'].append(line)
+    sections.append(current)
+    
+    return [
+        {'title': section['title'], 'day': section['day'], 'text': '\n'.join(section['lines'])}
+        for section in sections
+    ]
+
+def find_affected_sections(sections, feedback):
+    """Indexes of the sections a piece of feedback refers to"""
+    feedback_lower = feedback.lower()
+    days = set()
+    for match in re.finditer(r'\bdays?\s+((?:\d+\s*(?:-|–|to|through|,|and|&)?\s*)+)', feedback_lower):
+        spec = match.group(1)
+        for start, end in re.findall(r'(\d+)\s*(?:-|–|to|through)\s*(\d+)', spec):
+            days.update(range(int(start), int(end) + 1))
+        days.update(int(number) for number in re.findall(r'\d+', spec))
+    for ordinal, number in ORDINAL_DAYS.items():
+        if re.search(rf'\b{ordinal} day\b', feedback_lower):
+            days.add(number)
+    day_sections = [section['day'] for section in sections if section['day'] is not None]
+    if day_sections and re.search(r'\b(last|final) day\b', feedback_lower):
+        days.add(max(day_sections))
+    
+    affected = [index for index, section in enumerate(sections) if section['day'] in days]
+    for marker, keywords in SECTION_FEEDBACK_KEYWORDS.items():
+        # Day-specific feedback ("cheaper dinner on day 3") stays within those days
+        if days and marker == 'BUDGET':
+            continue
+        if any(keyword in feedback_lower for keyword in keywords):
+            affected.extend(
+                index for index, section in enumerate(sections)
+                if section['day'] is None and marker in section['title'].upper()
+            )
+    return sorted(set(affected))
+
+def build_section_outline(sections, exclude):
+    """One line per section so the model keeps the rest of the trip in mind"""
+    outline = []
+    for index, section in enumerate(sections):
+        if index in exclude:
+            continue
+        lines = section['text'].split('\n')
+        # Every section but the overview starts with its heading line
+        body = [line.strip() for line in (lines if index == 0 and section['title'] == 'OVERVIEW' else lines[1:]) if line.strip()]
+        summary = body[0][:120] if body else ''
+        outline.append(f"- {section['title']}: {summary}")
+    return '\n'.join(outline)
+
+def splice_refined_sections(sections, targets, refined_text):
+    """Replace the target sections with the model's rewrite, matched by heading"""
+    refined_lines = refined_text.split('\n')
+    starts = []
+    for index in targets:
+        section = sections[index]
+        for line_number, line in enumerate(refined_lines):
+            day_match = DAY_HEADING_PATTERN.match(line)
+            if section['day'] is not None:
+                matches = day_match and int(day_match.group(1)) == section['day']
+            else:
+                matches = line.strip().lower() == section['title'].lower()
+            if matches:
+                starts.append(line_number)
+                break
+        else:
+            starts.append(None)
+    
+    if len(targets) == 1 and starts[0] is None:
+        # A single rewritten section without its heading - restore the original heading
+        refined_lines = [sections[targets[0]]['text'].split('\n')[0]] + refined_lines
+        starts = [0]
+    if None in starts or starts != sorted(starts):
+        raise ValueError("Refined sections could not be matched to the original headings")
+    
+    updated = [dict(section) for section in sections]
+    bounds = starts[1:] + [len(refined_lines)]
+    for index, start, end in zip(targets, starts, bounds):
+        original = sections[index]['text']
+        trailing = original[len(original.rstrip('\n')):]
+        updated[index]['text'] = '\n'.join(refined_lines[start:end]).strip('\n') + trailing
+    return '\n'.join(section['text'] for section in updated)
+
+def refine_itinerary_sections(refinement, report):
+    """Regenerate only the sections the feedback touches; None when a full rewrite is needed"""
+    sections = split_itinerary_sections(refinement['current_itinerary'])
+    if len(sections) < 3:
+        return None
+    targets = find_affected_sections(sections, refinement['feedback'])
+    if not targets:
+        return None
+    target_size = sum(len(sections[index]['text']) for index in targets)
+    if target_size > SECTION_REFINE_MAX_FRACTION * len(refinement['current_itinerary']):
+        return None
+    
+    headings = [sections[index]['title'] for index in targets]
+    target_text = '\n\n'.join(sections[index]['text'].strip('\n') for index in targets)
+    prompt = f"""The user has requested changes to part of their travel itinerary for {refinement['destination']}.
+
+REST OF THE ITINERARY (for context only, do not rewrite):
+{build_section_outline(sections, set(targets))}
+
+SECTIONS TO UPDATE:
+{target_text}
+
+USER FEEDBACK:
+{refinement['feedback']}
+
+Rewrite only the sections under SECTIONS TO UPDATE so they address the user's feedback. Start each section with its original heading line exactly as written ({'; '.join(headings)}), keep them in the same order, and keep the same format, level of detail and pricing style. Do not include any other sections or commentary. Do not include any *, **, or # characters."""
+    
+    report('generating', 30)
+    response = gemini_generate(config.gemini_model, prompt)
+    log_gemini_usage(response, 'Section refinement')
+    refined_text = clean_itinerary_text(response.text)
+    
+    report('finalizing', 90)
     try:
-        data = request.get_json()
-        
-        current_itinerary = data.get('current_itinerary')
-        feedback = data.get('feedback')
-        destination = data.get('destination')
-        
-        if not all([current_itinerary, feedback, destination]):
-            return jsonify({
-                'success': False,
-                'error': 'Missing required data for refinement'
-            }), 400
-        
-        if not config.gemini_model:
-            return jsonify({
-                'success': False,
-                'error': 'Gemini AI is not available'
-            }), 503
-        
-        # Create refinement prompt
-        refinement_prompt = f"""The user has requested changes to their travel itinerary for {destination}.
+        itinerary = splice_refined_sections(sections, targets, refined_text)
+    except ValueError as e:
+        print(f"Section refinement fell back to a full rewrite: {e}")
+        return None
+    print(f"✂️ Refined {len(targets)}/{len(sections)} sections ({len(prompt)} prompt characters)")
+    return itinerary, headings
+
+def run_itinerary_refinement(refinement, progress=None):
+    """Refine an itinerary with Gemini and return the response payload"""
+    report = progress or (lambda stage, percent: None)
+    
+    if not refinement.get('full_refinement'):
+        section_result = refine_itinerary_sections(refinement, report)
+        if section_result:
+            itinerary, headings = section_result
+            return {
+                'success': True,
+                'itinerary': itinerary,
+                'refinement_mode': 'sections',
+                'refined_sections': headings,
+                'refined_at': datetime.now().isoformat()
+            }
+    
+    # Create refinement prompt
+    refinement_prompt = f"""The user has requested changes to their travel itinerary for {refinement['destination']}.
 
 ORIGINAL ITINERARY:
-{current_itinerary}
+{refinement['current_itinerary']}
 
 USER FEEDBACK:
-{feedback}
+{refinement['feedback']}
 
 Please update the itinerary based on the user's feedback. Keep the same format and structure, but incorporate the requested changes. Maintain the quality and detail of the original while addressing the specific feedback provided."""
 
-        response = config.gemini_model.generate_content(refinement_prompt)
-        refined_itinerary = response.text
+    report('generating', 30)
+    response = gemini_generate(config.gemini_model, refinement_prompt)
+    log_gemini_usage(response, 'Full refinement')
+    refined_itinerary = response.text
+    
+    return {
+        'success': True,
+        'itinerary': refined_itinerary,
+        'refinement_mode': 'full',
+        'refined_at': datetime.now().isoformat()
+    }
+
+@app.route('/api/refine-itinerary', methods=['POST'])
+def refine_itinerary():
+    """Refine existing itinerary based on user feedback"""
+    try:
+        refinement, error_response = parse_refinement_request(request.get_json())
+        if error_response:
+            return error_response
         
-        return jsonify({
-            'success': True,
-            'itinerary': refined_itinerary,
-            'refined_at': datetime.now().isoformat()
-        })
+        return jsonify(run_itinerary_refinement(refinement))
         
     except Exception as e:
         print(f"❌ Error refining itinerary: {e}")
@@ -1199,6 +4834,56 @@ Please update the itinerary based on the user's feedback. Keep the same format a
             'error': f'Failed to refine itinerary: {str(e)}'
         }), 500
 
+def submit_gemini_job(job_type, func, payload):
+    """Queue a Gemini job, answering 429 with Retry-After when the queue is full"""
+    job = gemini_jobs.submit(job_type, func, payload)
+    if job is None:
+        retry_after = gemini_jobs.retry_after()
+        response = jsonify({
+            'success': False,
+            'error': 'Itinerary queue is full, please retry shortly',
+            'retry_after': retry_after
+        })
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+    
+    return jsonify({
+        'success': True,
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'status_url': f"/api/jobs/{job['job_id']}"
+    }), 202
+
+@app.route('/api/jobs/generate-itinerary', methods=['POST'])
+def create_itinerary_job():
+    """Queue itinerary generation on the Gemini worker pool"""
+    try:
+        trip, error_response = parse_itinerary_request(request.get_json())
+        if error_response:
+            return error_response
+        return submit_gemini_job('generate-itinerary', run_itinerary_generation, trip)
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Failed to queue itinerary: {str(e)}'}), 500
+
+@app.route('/api/jobs/refine-itinerary', methods=['POST'])
+def create_refinement_job():
+    """Queue itinerary refinement on the Gemini worker pool"""
+    try:
+        refinement, error_response = parse_refinement_request(request.get_json())
+        if error_response:
+            return error_response
+        return submit_gemini_job('refine-itinerary', run_itinerary_refinement, refinement)
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Failed to queue refinement: {str(e)}'}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Report progress of a queued job, including its result once completed"""
+    job = gemini_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, **job})
+
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors"""
@@ -1220,7 +4905,7 @@ if __name__ == '__main__':
     print("🚀 go.travel - AI Travel Itinerary Generator")
     print("=" * 50)
     print(f"✅ Flask app initialized")
-    print(f"✅ Gemini API: {'Available' if config.gemini_model else 'Not Available'}")
+    print(f"✅ Gemini API: {'Available' if config.gemini_available else 'Not Available'}")
     
     # Get port from environment variable (Heroku assigns this)
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,903 @@
+#!/usr/bin/env python3
+"""
+go.travel - ASGI serving mode
+The upstream-bound API routes run as async handlers on one shared async HTTP client,
+so a single process can hold hundreds of upstream waits without a thread per request.
+Every other route (pages, itineraries, jobs, status) is served by the Flask app
+through a WSGI bridge, so URLs and JSON responses are the same in both modes.
+
+Run with: uvicorn asgi:app --host 0.0.0.0 --port 8080
+      or: gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+"""
+
+import os
+import re
+import json
+import asyncio
+import time
+from datetime import datetime
+from functools import wraps
+
+import aiohttp
+from a2wsgi import WSGIMiddleware
+from werkzeug.http import parse_etags
+
+import app as gotravel
+
+# Shared async HTTP transport
+class UpstreamHTTPError(aiohttp.ClientError):
+    """Raised by AsyncHTTPResponse.raise_for_status for 4xx/5xx responses"""
+
+class AsyncHTTPResponse:
+    """Fully read upstream response with the parts of requests.Response the services use"""
+
+    def __init__(self, url, status_code, body):
+        self.url = url
+        self.status_code = status_code
+        self.content = body
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise UpstreamHTTPError(f"{self.status_code} Error for url: {self.url}")
+
+def traced(name):
+    """gotravel.traced for coroutines - same span names as the sync services"""
+    def decorate(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with gotravel.trace_span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+async def acquire_quota(upstream, params):
+    """QuotaScheduler.acquire for coroutines - queues on the event loop instead of sleeping a thread"""
+    scheduler = gotravel.quota_scheduler
+    if not scheduler.meters(upstream):
+        return
+    api_key = gotravel.PooledHTTPClient.quota_key(params)
+    priority = gotravel.current_priority()
+    wait = scheduler.try_acquire(upstream, api_key, priority)
+    if wait == 0:
+        return
+    deadline = scheduler.clock() + scheduler.max_waits[priority]
+    with scheduler.waiting(upstream, api_key, priority):
+        while wait > 0:
+            if scheduler.clock() + wait > deadline:
+                gotravel.metrics.upstream_errors.inc(upstream, 'quota_shed')
+                raise scheduler.shed(upstream, priority)
+            await asyncio.sleep(wait)
+            wait = scheduler.try_acquire(upstream, api_key, priority)
+
+def try_quota(upstream, params):
+    """Spend a token on a hedged duplicate only if one is free right now - hedges never queue"""
+    scheduler = gotravel.quota_scheduler
+    if not scheduler.meters(upstream):
+        return True
+    return scheduler.try_acquire(upstream, gotravel.PooledHTTPClient.quota_key(params), gotravel.current_priority()) == 0
+
+class AsyncHTTPClient:
+    """Keep-alive async HTTP client shared by all async upstream services"""
+
+    RETRY_STATUSES = gotravel.PooledHTTPClient.RETRY_STATUSES
+
+    def __init__(self, max_connections=None, max_connections_per_host=None, max_retries=None, backoff_factor=None):
+        self.max_connections = max_connections or int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', 500))
+        self.max_connections_per_host = max_connections_per_host or int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS_PER_HOST', 200))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('HTTP_MAX_RETRIES', 2))
+        self.backoff_factor = backoff_factor if backoff_factor is not None else float(os.getenv('HTTP_BACKOFF_FACTOR', 0.3))
+        self._session = None
+        self._inflight = {}  # request key -> asyncio.Future shared by identical concurrent GETs
+        self.stats = {'requests': 0, 'retries': 0, 'errors': 0, 'coalesced': 0, 'in_flight': 0, 'peak_in_flight': 0}
+
+    def _get_session(self):
+        # Created lazily so it binds to the server's event loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host
+            ))
+        return self._session
+
+    async def _get_once(self, url, params, timeout):
+        async with self._get_session().get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            return AsyncHTTPResponse(str(response.url), response.status, await response.read())
+
+    async def get(self, url, params=None, timeout=10, upstream=None):
+        """Issue a GET, retrying transient failures with the same backoff as the sync client.
+
+        Concurrent identical GETs share one upstream request and its response. Naming the
+        upstream runs the request through the shared circuit breakers and latency budgets.
+        """
+        if params:
+            # requests renders every value with str(); aiohttp rejects booleans
+            params = {name: str(value) for name, value in params.items()}
+        key = gotravel.RequestCoalescer.make_key('GET', url, params)
+        try:
+            return await self._single_flight(key, upstream, url, params, timeout)
+        except gotravel.QuotaExceededError as e:
+            # Joined a lower-priority call that was shed - ask for quota at this caller's priority
+            if not e.outranked_by(gotravel.current_priority()):
+                raise
+            return await self._single_flight(key, upstream, url, params, timeout)
+
+    async def _single_flight(self, key, upstream, url, params, timeout):
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.stats['coalesced'] += 1
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled() or asyncio.current_task().cancelling():
+                    raise  # This caller was cancelled
+                # Only the leader was cancelled (its own request timed out or went away) - fetch again
+                return await self._single_flight(key, upstream, url, params, timeout)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._inflight[key] = flight
+        try:
+            response = await self._guarded(upstream, url, params, timeout)
+            flight.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            flight.exception()  # Mark retrieved - the caller re-raises it below
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _guarded(self, upstream, url, params, timeout):
+        """Same breaker and hedging rules as UpstreamGuard.call, awaiting instead of blocking"""
+        guard = gotravel.upstream_guard
+        if not upstream:
+            return await self._get_with_retries(url, params, timeout)
+
+        # Queue for quota before the breaker, so the wait never counts as upstream latency
+        await acquire_quota(upstream, params)
+        breaker = guard.acquire(upstream)
+
+        async def fetch():
+            return await self._get_with_retries(url, params, guard.timeout(upstream))
+
+        started = time.time()
+        gotravel.metrics.upstream_in_flight.inc(upstream)
+        try:
+            with gotravel.trace_span(f"upstream.{upstream}"):
+                delay = guard.hedge_delay(upstream)
+                can_hedge = lambda: try_quota(upstream, params)
+                response = await (self._hedged(fetch, delay, can_hedge) if delay is not None else fetch())
+        except Exception:
+            breaker.record_failure()
+            guard.observe(upstream, started, 'error')
+            raise
+        finally:
+            gotravel.metrics.upstream_in_flight.dec(upstream)
+        if response.status_code in self.RETRY_STATUSES:
+            breaker.record_failure()
+            guard.observe(upstream, started, 'bad_response')
+        else:
+            breaker.record_success(time.time() - started)
+            guard.observe(upstream, started, 'ok')
+        return response
+
+    async def _hedged(self, fetch, delay, can_hedge=None):
+        """Send a duplicate if fetch() has not answered within delay; the first good answer wins"""
+        primary = asyncio.ensure_future(fetch())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        if can_hedge is not None and not can_hedge():
+            gotravel.upstream_guard.count('hedge_skipped_quota')
+            return await primary
+
+        gotravel.upstream_guard.count('hedged')
+        backup = asyncio.ensure_future(fetch())
+        done, _ = await asyncio.wait({primary, backup}, return_when=asyncio.FIRST_COMPLETED)
+        winner = primary if primary in done else backup
+        if winner.exception() is not None:
+            # Give the other attempt the chance to succeed
+            winner = backup if winner is primary else primary
+            await asyncio.wait({winner})
+        (backup if winner is primary else primary).cancel()
+        if winner is backup:
+            gotravel.upstream_guard.count('hedge_wins')
+        return winner.result()
+
+    async def _get_with_retries(self, url, params, timeout):
+        self.stats['requests'] += 1
+        self.stats['in_flight'] += 1
+        self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.stats['in_flight'])
+        try:
+            for attempt in range(self.max_retries + 1):
+                last_attempt = attempt == self.max_retries
+                try:
+                    response = await self._get_once(url, params, timeout)
+                    if response.status_code not in self.RETRY_STATUSES or last_attempt:
+                        return response
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    if last_attempt:
+                        self.stats['errors'] += 1
+                        raise
+                self.stats['retries'] += 1
+                await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+        finally:
+            self.stats['in_flight'] -= 1
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'max_connections': self.max_connections,
+            'max_connections_per_host': self.max_connections_per_host,
+            'max_retries': self.max_retries
+        }
+
+# Async Google API Service Classes
+class AsyncGoogleAPIService:
+    """Async counterpart of GoogleAPIService"""
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self.base_url = gotravel.GOOGLE_MAPS_API_URL
+
+    async def make_request(self, endpoint, params=None):
+        """Make a request to Google API with error handling"""
+        if params is None:
+            params = {}
+        fallback_key = gotravel.GoogleAPIService.fallback_key(endpoint, params)
+        started = time.time()
+        try:
+            params['key'] = self.api_key
+
+            response = await async_http_client.get(
+                f"{self.base_url}/{endpoint}", params=params,
+                upstream=gotravel.GoogleAPIService.upstream_for(endpoint)
+            )
+            response.raise_for_status()
+            result = response.json()
+            if result.get('status') in (None, 'OK'):
+                gotravel.upstream_guard.remember(fallback_key, result)
+            gotravel.metrics.google_api_latency.observe(time.time() - started, endpoint, result.get('status') or 'OK')
+            return result
+        except (aiohttp.ClientError, asyncio.TimeoutError, gotravel.CircuitOpenError, gotravel.QuotaExceededError, ValueError) as e:
+            print(f"API request error: {e}")
+            gotravel.metrics.google_api_latency.observe(time.time() - started, endpoint, 'error')
+            # Open circuit or failed call: serve the last good answer if there is one
+            last_known = gotravel.upstream_guard.last_known(fallback_key)
+            if last_known is not None:
+                return last_known
+            return {"error": str(e)}
+
+class AsyncGeocodingService(AsyncGoogleAPIService):
+    """Async Google Geocoding API service sharing the sync geocoding cache"""
+
+    def __init__(self, api_key, cache=None):
+        super().__init__(api_key)
+        self.cache = cache
+
+    async def _cached_request(self, key, params):
+        if self.cache is None:
+            return await self.make_request('geocode/json', params)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        result = await self.make_request('geocode/json', params)
+        if not result.get('stale'):
+            self.cache.set(key, result)
+        return result
+
+    @traced('geocode')
+    async def get_coordinates(self, address):
+        """Get latitude and longitude for an address"""
+        params = {'address': address}
+        key = self.cache.address_key(address) if self.cache else None
+        return await self._cached_request(key, params)
+
+    @traced('reverse_geocode')
+    async def reverse_geocode(self, lat, lng):
+        """Get address from coordinates"""
+        params = {'latlng': f"{lat},{lng}"}
+        key = self.cache.coordinates_key(lat, lng) if self.cache else None
+        return await self._cached_request(key, params)
+
+class AsyncPlacesService(AsyncGoogleAPIService):
+    """Async Google Places API service"""
+
+    @traced('places.nearby')
+    async def search_nearby(self, lat, lng, place_type, radius=5000):
+        """Search for nearby places"""
+        params = {
+            'location': f"{lat},{lng}",
+            'radius': radius,
+            'type': place_type
+        }
+        return await self.make_request('place/nearbysearch/json', params)
+
+    @traced('places.details')
+    async def get_place_details(self, place_id):
+        """Get detailed information about a place"""
+        return await self.make_request('place/details/json', {'place_id': place_id})
+
+    @traced('places.text_search')
+    async def text_search(self, query, location=None, radius=50000):
+        """Search for places by text query"""
+        params = {'query': query}
+        if location:
+            params['location'] = location
+            params['radius'] = radius
+        return await self.make_request('place/textsearch/json', params)
+
+class AsyncDirectionsService(AsyncGoogleAPIService):
+    """Async Google Directions API service"""
+
+    @traced('directions')
+    async def get_directions(self, origin, destination, mode='driving', waypoints=None):
+        """Get directions between locations"""
+        params = {
+            'origin': origin,
+            'destination': destination,
+            'mode': mode
+        }
+        if waypoints:
+            params['waypoints'] = '|'.join(waypoints)
+        return await self.make_request('directions/json', params)
+
+class AsyncTimeZoneService(AsyncGoogleAPIService):
+    """Async Google Time Zone API service"""
+
+    @traced('timezone')
+    async def get_timezone(self, lat, lng, timestamp=None):
+        """Get timezone information for coordinates"""
+        if timestamp is None:
+            timestamp = int(time.time())
+        params = {
+            'location': f"{lat},{lng}",
+            'timestamp': timestamp
+        }
+        return await self.make_request('timezone/json', params)
+
+class AsyncRoadsService(AsyncGoogleAPIService):
+    """Async Google Roads API service"""
+
+    def __init__(self, api_key):
+        super().__init__(api_key)
+        self.roads_base_url = gotravel.GOOGLE_ROADS_API_URL
+
+    @traced('roads.snap')
+    async def snap_to_roads(self, path, interpolate=False):
+        """Snap GPS coordinates to road network"""
+        params = {
+            'path': path,
+            'interpolate': interpolate,
+            'key': self.api_key
+        }
+        try:
+            response = await async_http_client.get(f"{self.roads_base_url}/snapToRoads", params=params, upstream='roads')
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+class AsyncWeatherService:
+    """Async OpenWeatherMap service sharing the sync weather cache"""
+
+    def __init__(self, api_key, cache=None):
+        self.api_key = api_key
+        self.base_url = gotravel.OPENWEATHERMAP_API_URL
+        self.cache = cache
+        self._inflight = {}  # cache key -> asyncio.Future shared by concurrent misses
+
+    async def _fetch(self, endpoint, params, label):
+        try:
+            response = await async_http_client.get(
+                f"{self.base_url}/{endpoint}",
+                params={**params, 'appid': self.api_key, 'units': 'metric'},
+                upstream='weather'
+            )
+            if response.status_code == 200:
+                return response.json(), True
+            print(f"OpenWeatherMap API error: {response.status_code}")
+        except Exception as e:
+            print(f"{label} error: {e}")
+        return None, False
+
+    async def _cached(self, kind, key, fetch):
+        """Same contract as WeatherCache.get_or_fetch, with coroutines instead of threads"""
+        cached = self.cache.lookup(kind, key)
+        if cached is not None:
+            return cached
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.cache.count('coalesced')
+            return await asyncio.shield(flight)
+
+        self.cache.count('misses')
+        flight = asyncio.get_running_loop().create_future()
+        self._inflight[key] = flight
+        result = None
+        try:
+            data, ok = await fetch()
+            if ok:
+                result = data
+                self.cache.store(key, data)
+            else:
+                result = self.cache.stale(key)
+        finally:
+            self._inflight.pop(key, None)
+            flight.set_result(result)
+        return result
+
+    @traced('weather.current')
+    async def get_current_weather(self, lat, lng):
+        """Get current weather for coordinates"""
+        fetch = lambda: self._fetch('weather', {'lat': lat, 'lon': lng}, 'Weather API')
+        if self.cache:
+            weather = await self._cached('current', self.cache.make_key('current', lat, lng), fetch)
+        else:
+            weather, _ = await fetch()
+        return weather if weather is not None else gotravel.WeatherService.get_fallback_weather()
+
+    @traced('weather.forecast')
+    async def get_forecast(self, lat, lng, days=5):
+        """Get weather forecast for coordinates"""
+        # 8 forecasts per day (3-hour intervals)
+        fetch = lambda: self._fetch('forecast', {'lat': lat, 'lon': lng, 'cnt': days * 8}, 'Weather forecast API')
+        if self.cache:
+            forecast = await self._cached('forecast', self.cache.make_key('forecast', lat, lng, variant=f"/{days}"), fetch)
+        else:
+            forecast, _ = await fetch()
+        if forecast is None:
+            gotravel.metrics.fallbacks.inc('forecast_unavailable')
+            return {"error": "Forecast data unavailable"}
+        return forecast
+
+class AsyncCurrencyService:
+    """Async rate-table loading for the shared CurrencyService.
+
+    Conversions stay on the sync service - they are pure lookups once a table is
+    loaded. Only the cold-start fetch is awaited here instead of blocking a thread;
+    stale tables keep refreshing in the sync service's background thread.
+    """
+
+    def __init__(self, currency_service):
+        self.currency_service = currency_service
+        self._load_lock = None
+
+    async def _ensure_rates(self):
+        if self.currency_service.has_rates():
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if self.currency_service.has_rates():
+                return
+            service = self.currency_service
+            try:
+                response = await async_http_client.get(f"{service.base_url}/{service.base_currency}", upstream='currency')
+                if response.status_code == 200:
+                    rates = service.parse_rates(response.json())
+                    if rates:
+                        service.set_rates(rates)
+            except Exception as e:
+                print(f"Currency API error: {e}")
+
+    async def get_exchange_rate(self, from_currency, to_currency="USD"):
+        """Get exchange rate between two currencies"""
+        return (await self.get_exchange_rate_with_source(from_currency, to_currency))[0]
+
+    async def get_exchange_rate_with_source(self, from_currency, to_currency="USD"):
+        if from_currency != to_currency:
+            await self._ensure_rates()
+        return self.currency_service.get_exchange_rate_with_source(from_currency, to_currency)
+
+    async def convert_price(self, amount, from_currency, to_currency="USD"):
+        """Convert a price, or a list of prices, from one currency to another"""
+        if from_currency != to_currency:
+            await self._ensure_rates()
+        return self.currency_service.convert_price(amount, from_currency, to_currency)
+
+    def get_country_currency(self, country):
+        return self.currency_service.get_country_currency(country)
+
+# Async Service Manager
+class AsyncGoogleServicesManager:
+    """Async counterpart of GoogleServicesManager"""
+
+    def __init__(self, google_api_key, openweathermap_api_key, geocode_cache=None, weather_cache=None):
+        self.api_key = google_api_key
+        self.geocoding = AsyncGeocodingService(google_api_key, cache=geocode_cache)
+        self.places = AsyncPlacesService(google_api_key)
+        self.directions = AsyncDirectionsService(google_api_key)
+        self.timezone = AsyncTimeZoneService(google_api_key)
+        self.weather = AsyncWeatherService(openweathermap_api_key, cache=weather_cache)
+        self.roads = AsyncRoadsService(google_api_key)
+        self.fanout_timeout = float(os.getenv('LOCATION_FANOUT_TIMEOUT', 8))
+
+    async def _fan_out(self, calls, timeout):
+        """Run independent service calls concurrently, keeping whatever succeeds"""
+        names = list(calls)
+        outcomes = await asyncio.gather(
+            *(asyncio.wait_for(calls[name], timeout) for name in names),
+            return_exceptions=True
+        )
+
+        results = {}
+        failures = []
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                results[name] = {"error": f"Timed out after {timeout}s"}
+            elif isinstance(outcome, asyncio.CancelledError):
+                results[name] = {"error": "Cancelled"}
+            elif isinstance(outcome, BaseException):
+                results[name] = {"error": str(outcome)}
+            else:
+                results[name] = outcome
+            if isinstance(results[name], dict) and 'error' in results[name]:
+                failures.append(name)
+        return results, failures
+
+    @traced('location_info')
+    async def get_location_info(self, location_query):
+        """Get comprehensive information about a location"""
+        try:
+            geocode_result = await self.geocoding.get_coordinates(location_query)
+            if 'error' in geocode_result or 'results' not in geocode_result or not geocode_result['results']:
+                return {"error": "Location not found"}
+
+            location_data = geocode_result['results'][0]
+            lat = location_data['geometry']['location']['lat']
+            lng = location_data['geometry']['location']['lng']
+            formatted_address = location_data['formatted_address']
+
+            results, failures = await self._fan_out({
+                'timezone': self.timezone.get_timezone(lat, lng),
+                'weather': self.weather.get_current_weather(lat, lng),
+                'attractions': self.places.search_nearby(lat, lng, 'tourist_attraction'),
+                'restaurants': self.places.search_nearby(lat, lng, 'restaurant')
+            }, self.fanout_timeout)
+
+            location_info = {
+                'location': {
+                    'address': formatted_address,
+                    'coordinates': {'lat': lat, 'lng': lng}
+                },
+                'timezone': results['timezone'],
+                'weather': results['weather'],
+                'nearby': {
+                    'attractions': results['attractions'],
+                    'restaurants': results['restaurants']
+                }
+            }
+            if failures:
+                location_info['partial'] = True
+                location_info['failed_sources'] = failures
+            return location_info
+        except Exception as e:
+            return {"error": f"Failed to get location info: {str(e)}"}
+
+# Initialize async services on top of the Flask app's caches and config
+async_http_client = AsyncHTTPClient()
+async_currency_service = AsyncCurrencyService(gotravel.currency_service)
+if gotravel.google_services:
+    async_google_services = AsyncGoogleServicesManager(
+        gotravel.config.google_api_key, gotravel.config.openweathermap_api_key,
+        geocode_cache=gotravel.geocode_cache, weather_cache=gotravel.weather_cache
+    )
+else:
+    async_google_services = None
+
+# Async route handlers - each returns (payload, status) exactly like its Flask view
+async def get_destination_details(request, destination_name):
+    """Get detailed information about a specific destination"""
+    try:
+        if not async_google_services:
+            return {'error': 'Google services not available'}, 503
+
+        location_info = await async_google_services.get_location_info(destination_name)
+
+        if 'coordinates' in location_info:
+            coords = location_info['coordinates']
+            attractions = await async_google_services.places.search_nearby(
+                coords['lat'], coords['lng'], 'tourist_attraction', radius=10000
+            )
+        else:
+            attractions = {'results': []}
+
+        return {
+            'destination': destination_name,
+            'details': location_info,
+            'attractions': attractions.get('results', [])[:10],  # Top 10 attractions
+            'timestamp': datetime.now().isoformat()
+        }, 200
+
+    except Exception as e:
+        return {'error': f'Destination details error: {str(e)}'}, 500
+
+async def get_location_info(request):
+    """Get comprehensive location information"""
+    try:
+        data = request.get_json()
+        location = data.get('location')
+
+        if not location:
+            return {'error': 'Location is required'}, 400
+
+        if not async_google_services:
+            return {'error': 'Google services not available'}, 503
+
+        return await async_google_services.get_location_info(location), 200
+
+    except Exception as e:
+        return {'error': f'Location info error: {str(e)}'}, 500
+
+async def get_weather_forecast(request):
+    """Get weather forecast for a location"""
+    try:
+        data = request.get_json()
+        location = data.get('location')
+        days = data.get('days', 5)
+
+        if not location:
+            return {'error': 'Location is required'}, 400
+
+        if not async_google_services:
+            return {'error': 'Weather services not available'}, 503
+
+        geocode_result = await async_google_services.geocoding.get_coordinates(location)
+        if 'error' in geocode_result or 'results' not in geocode_result or not geocode_result['results']:
+            return {'error': 'Location not found'}, 404
+
+        location_data = geocode_result['results'][0]
+        lat = location_data['geometry']['location']['lat']
+        lng = location_data['geometry']['location']['lng']
+
+        return await async_google_services.weather.get_forecast(lat, lng, days), 200
+
+    except Exception as e:
+        return {'error': f'Weather forecast error: {str(e)}'}, 500
+
+async def get_directions(request):
+    """Get directions between locations"""
+    try:
+        data = request.get_json()
+        origin = data.get('origin')
+        destination = data.get('destination')
+        mode = data.get('mode', 'driving')
+        waypoints = data.get('waypoints')
+
+        if not origin or not destination:
+            return {'error': 'Origin and destination are required'}, 400
+
+        if not async_google_services:
+            return {'error': 'Google services not available'}, 503
+
+        return await async_google_services.directions.get_directions(origin, destination, mode, waypoints), 200
+
+    except Exception as e:
+        return {'error': f'Directions error: {str(e)}'}, 500
+
+async def search_places(request):
+    """Search for places"""
+    try:
+        data = request.get_json()
+        query = data.get('query')
+        location = data.get('location')
+        place_type = data.get('type')
+
+        if not async_google_services:
+            return {'error': 'Google services not available'}, 503
+
+        if query:
+            results = await async_google_services.places.text_search(query, location)
+        elif location and place_type:
+            geocode_result = await async_google_services.geocoding.get_coordinates(location)
+            if 'results' in geocode_result and geocode_result['results']:
+                coords = geocode_result['results'][0]['geometry']['location']
+                results = await async_google_services.places.search_nearby(coords['lat'], coords['lng'], place_type)
+            else:
+                return {'error': 'Could not geocode location'}, 400
+        else:
+            return {'error': 'Query or location+type are required'}, 400
+
+        return results, 200
+
+    except Exception as e:
+        return {'error': f'Places search error: {str(e)}'}, 500
+
+async def get_currency_info(request, destination, base_currency="USD"):
+    """Get currency information for a destination"""
+    try:
+        country = destination.split(',')[-1].strip() if ',' in destination else destination
+        local_currency = async_currency_service.get_country_currency(country)
+
+        rate, rate_source = await async_currency_service.get_exchange_rate_with_source(base_currency, local_currency)
+
+        return {
+            'success': True,
+            'destination': destination,
+            'country': country,
+            'local_currency': local_currency,
+            'base_currency': base_currency,
+            'exchange_rate': rate,
+            'formatted_rate': f"1 {base_currency} = {rate:.2f} {local_currency}",
+            'rate_source': rate_source,
+            'last_updated': datetime.now().isoformat()
+        }, 200
+
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f'Currency lookup error: {str(e)}'
+        }, 500
+
+# (method, path pattern, handler) - same URLs as the Flask routes they replace
+ASYNC_ROUTES = [
+    ('GET', re.compile(r'^/api/destination-details/(?P<destination_name>[^/]+)$'), get_destination_details),
+    ('POST', re.compile(r'^/api/location-info$'), get_location_info),
+    ('POST', re.compile(r'^/api/weather-forecast$'), get_weather_forecast),
+    ('POST', re.compile(r'^/api/directions$'), get_directions),
+    ('POST', re.compile(r'^/api/places/search$'), search_places),
+    ('GET', re.compile(r'^/api/currency/(?P<destination>[^/]+)$'), get_currency_info),
+    ('GET', re.compile(r'^/api/currency/(?P<destination>[^/]+)/(?P<base_currency>[^/]+)$'), get_currency_info),
+]
+
+class AsyncRequest:
+    """The parts of an ASGI request the async handlers need"""
+
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.body = body
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+
+    def get_json(self):
+        if not self.body:
+            return None
+        return json.loads(self.body)
+
+def match_async_route(method, path):
+    for route_method, pattern, handler in ASYNC_ROUTES:
+        match = pattern.match(path)
+        if match and route_method == method:
+            return handler, match.groupdict()
+    return None, None
+
+# Async routes are labelled in metrics with the Flask rule they mirror, and take its cache policy
+url_adapter = gotravel.app.url_map.bind('localhost')
+
+def flask_rule(method, path):
+    rule, _ = url_adapter.match(path, method, return_rule=True)
+    return rule
+
+def cache_policy_for(rule):
+    return getattr(gotravel.app.view_functions[rule.endpoint], 'cache_policy', None)
+
+def not_modified(request, etag):
+    return etag is not None and parse_etags(request.headers.get('if-none-match')).contains_weak(etag[0])
+
+def cache_headers(policy, etag, status):
+    """Cache-Control and ETag exactly as the Flask view's cache_policy would set them"""
+    if policy is None:
+        return []
+    headers = policy.headers(etag if status in (200, 304) else None)
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+def encode_json(payload):
+    """Encode like flask.jsonify so both serving modes return identical bytes"""
+    return (gotravel.app.json.dumps(payload, separators=(',', ':')) + '\n').encode()
+
+def compress_json(request, body, headers):
+    """Same rule as the WSGI CompressionMiddleware: large bodies, for clients that accept it"""
+    if len(body) < gotravel.COMPRESS_MIN_BYTES:
+        return body, headers
+    headers = [*headers, (b'vary', b'Accept-Encoding')]
+    encoding = gotravel.choose_encoding(request.headers.get('accept-encoding'))
+    if encoding is None:
+        return body, headers
+    headers = [(name, b'W/' + value if name == b'etag' and not value.startswith(b'W/') else value)
+               for name, value in headers]
+    return gotravel.compress(body, encoding), [*headers, (b'content-encoding', encoding.encode())]
+
+async def send_json(send, request, payload, status, extra_headers=()):
+    if status == 304:
+        body, headers = b'', list(extra_headers)
+    else:
+        body, extra_headers = compress_json(request, encode_json(payload), list(extra_headers))
+        headers = [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            *extra_headers
+        ]
+    if 'origin' in request.headers:
+        # Mirrors the Flask-CORS defaults on the WSGI side
+        headers.append((b'access-control-allow-origin', b'*'))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+def finish_trace(trace, request, payload):
+    """Same span tree rules as the Flask hooks: inline on a debug request, logged when sampled"""
+    debug_requested = 'trace=1' in request.scope.get('query_string', b'').decode('latin-1').split('&') \
+        or request.headers.get('x-debug-trace') == '1'
+    mode = gotravel.trace_tree_mode(debug_requested)
+    if mode == 'inline' and isinstance(payload, dict):
+        return {**payload, 'trace': trace.to_dict()}
+    if mode is not None:
+        gotravel.log_trace(trace)
+    return payload
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            print(f"✅ ASGI mode: {len(ASYNC_ROUTES)} async routes, remaining routes via WSGI bridge")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_http_client.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+# Routes without an async handler (templates, Gemini, jobs, SSE) keep running on
+# the Flask app in a thread pool
+wsgi_app = WSGIMiddleware(gotravel.app, workers=int(os.getenv('ASGI_WSGI_THREADS', os.getenv('GUNICORN_THREADS', 8))))
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+
+    if scope['type'] == 'http':
+        handler, path_params = match_async_route(scope['method'], scope['path'])
+        if handler is not None:
+            started = time.time()
+            rule = flask_rule(scope['method'], scope['path'])
+            route = rule.rule
+            policy = cache_policy_for(rule)
+            gotravel.metrics.http_in_flight.inc()
+            # Counted so a profiled Flask request running alongside is discarded
+            gotravel.request_profiler.request_started()
+            try:
+                request = AsyncRequest(scope, await read_body(receive))
+                with gotravel.start_trace(f"{scope['method']} {route}") as trace:
+                    etag = policy.version_etag(**path_params) if policy else None
+                    if not_modified(request, etag):
+                        payload, status = None, 304
+                    else:
+                        payload, status = await handler(request, **path_params)
+                        if policy is not None and status == 200:
+                            if policy.is_degraded(payload):
+                                etag = None
+                            else:
+                                etag = etag or policy.etag_for(payload, encode_json(payload))
+                                if not_modified(request, etag):
+                                    payload, status = None, 304
+                payload = finish_trace(trace, request, payload)
+                await send_json(send, request, payload, status, [
+                    (b'server-timing', trace.server_timing().encode()),
+                    *cache_headers(policy, etag, status)
+                ])
+            finally:
+                gotravel.metrics.http_in_flight.dec()
+                gotravel.request_profiler.request_finished()
+            gotravel.metrics.http_latency.observe(time.time() - started, scope['method'], route, str(status))
+            return
+
+    await wsgi_app(scope, receive, send)
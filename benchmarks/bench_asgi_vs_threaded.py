@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Load test the threaded (gunicorn) and ASGI (uvicorn) deployments against stubbed upstreams.
+Both servers run as real subprocesses on one worker each, with every upstream URL
+pointed at a local stub, and are hit with the same concurrent POST /api/location-info load.
+
+Usage: python benchmarks/bench_asgi_vs_threaded.py [--latency 0.2] [--concurrency 200] [--requests 1000]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stub_upstreams import StubUpstreamServer, upstream_env
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_env(stub_url, threads):
+    env = dict(os.environ)
+    env.update({
+        'GOOGLE_API_KEY': 'stub-google-key',
+        'OPENWEATHERMAP_API_KEY': 'stub-weather-key',
+        'GEMINI_API_KEY': '',
+        **upstream_env(stub_url),
+        'GEOCODE_CACHE_PATH': ':memory:',
+        'GUNICORN_THREADS': str(threads),
+        'PYTHONUNBUFFERED': '1'
+    })
+    # Measure the servers, not the client-side quota limits
+    for upstream in ('GEOCODE', 'PLACES', 'TIMEZONE', 'DIRECTIONS', 'ROADS', 'WEATHER'):
+        env[f'QUOTA_{upstream}_PER_SECOND'] = env[f'QUOTA_{upstream}_BURST'] = '100000'
+    return env
+
+
+def start_server(mode, port, env, threads):
+    if mode == 'threaded':
+        command = ['gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', '1',
+                   '--threads', str(threads), '--timeout', '0', 'app:app']
+    else:
+        command = ['uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+                   '--log-level', 'warning', '--no-access-log']
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_until_ready(session, base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base_url}/api/status") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start within {timeout}s")
+
+
+async def run_load(base_url, concurrency, total_requests):
+    """Keep `concurrency` requests in flight until `total_requests` have completed"""
+    latencies = []
+    errors = 0
+    counter = iter(range(total_requests))
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await wait_until_ready(session, base_url)
+
+        async def client():
+            nonlocal errors
+            for index in counter:
+                start = time.perf_counter()
+                try:
+                    # A distinct location per request so every call reaches the upstream stubs
+                    async with session.post(f"{base_url}/api/location-info", json={'location': f"City {index}"}) as response:
+                        await response.read()
+                        if response.status != 200:
+                            errors += 1
+                except aiohttp.ClientError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return latencies, errors, elapsed
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.2, help='stub latency per upstream call in seconds')
+    parser.add_argument('--concurrency', type=int, default=200, help='requests kept in flight')
+    parser.add_argument('--requests', type=int, default=1000, help='total requests per deployment')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads for the threaded deployment')
+    args = parser.parse_args()
+
+    print(f"POST /api/location-info, {args.latency * 1000:.0f}ms stub latency, "
+          f"{args.concurrency} concurrent, {args.requests} requests")
+    with StubUpstreamServer(latency=args.latency) as stub:
+        for mode in ('threaded', 'asgi'):
+            port = free_port()
+            server = start_server(mode, port, server_env(stub.base_url, args.threads), args.threads)
+            try:
+                latencies, errors, elapsed = asyncio.run(
+                    run_load(f"http://127.0.0.1:{port}", args.concurrency, args.requests)
+                )
+            finally:
+                server.terminate()
+                server.wait()
+            label = f"{mode} ({args.threads} threads)" if mode == 'threaded' else mode
+            print(f"  {label:<20} {len(latencies) / elapsed:7.1f} req/s  "
+                  f"p50 {statistics.median(latencies) * 1000:7.1f}ms  "
+                  f"p95 {percentile(latencies, 0.95) * 1000:7.1f}ms  "
+                  f"p99 {percentile(latencies, 0.99) * 1000:7.1f}ms  errors {errors}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark GoogleServicesManager.get_location_info against stubbed upstreams.
+Compares the old sequential lookups with the concurrent fan-out.
+
+Usage: python benchmarks/bench_location_info.py [--latency 0.1] [--runs 10]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_upstreams import StubUpstreamServer, point_services_at
+import app
+
+
+def sequential_location_info(manager, location_query):
+    """The pre-fan-out implementation: every lookup waits for the previous one"""
+    geocode_result = manager.geocoding.get_coordinates(location_query)
+    location = geocode_result['results'][0]['geometry']['location']
+    lat, lng = location['lat'], location['lng']
+    return {
+        'timezone': manager.timezone.get_timezone(lat, lng),
+        'weather': manager.weather.get_current_weather(lat, lng),
+        'attractions': manager.places.search_nearby(lat, lng, 'tourist_attraction'),
+        'restaurants': manager.places.search_nearby(lat, lng, 'restaurant')
+    }
+
+
+def time_runs(func, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.1, help='stub latency per upstream call in seconds')
+    parser.add_argument('--runs', type=int, default=10, help='timed runs per variant')
+    args = parser.parse_args()
+
+    manager = app.GoogleServicesManager('stub-google-key', 'stub-weather-key')
+    with StubUpstreamServer(latency=args.latency) as stub:
+        point_services_at(manager, stub.base_url)
+        # Warm the connection pool so both variants measure steady state
+        manager.get_location_info('Paris, France')
+
+        before = time_runs(lambda: sequential_location_info(manager, 'Paris, France'), args.runs)
+        after = time_runs(lambda: manager.get_location_info('Paris, France'), args.runs)
+
+    print(f"get_location_info with {args.latency * 1000:.0f}ms stub latency, {args.runs} runs")
+    print(f"  sequential: median {statistics.median(before) * 1000:7.1f}ms")
+    print(f"  fan-out:    median {statistics.median(after) * 1000:7.1f}ms")
+    print(f"  speedup:    {statistics.median(before) / statistics.median(after):.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Load test the main API routes fully offline: every upstream API is a local stub serving
+recorded payloads and Gemini is a fake model, so results only move when the code does.
+Reports throughput and p50/p95/p99 per route and concurrency level; save a run with
+--json and pass it as --baseline to a later run to see the change.
+
+Usage: python benchmarks/bench_routes.py [--concurrency 1,10,50] [--requests 100]
+       [--latency 0.05] [--jitter 0.02] [--error-rate 0] [--gemini-latency 0.5]
+       [--server threaded|asgi] [--routes location-info,currency] [--json out.json] [--baseline prev.json]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stub_upstreams import StubUpstreamServer, load_fixture
+from benchmarks.bench_asgi_vs_threaded import free_port, server_env, wait_until_ready, percentile
+
+CURRENCY_DESTINATIONS = ['Paris, France', 'Tokyo, Japan', 'London, UK', 'New York, USA', 'Bangkok, Thailand']
+
+
+def itinerary_request(index):
+    # A distinct special request per call so every generation misses the itinerary cache
+    return {
+        'destination': 'Paris, France',
+        'start_date': '2025-06-01',
+        'end_date': '2025-06-03',
+        'duration': 3,
+        'people': 2,
+        'budget': 'moderate',
+        'interests': ['museums', 'food'],
+        'special_requests': f"benchmark request {index}"
+    }
+
+
+def refinement_request(index):
+    return {
+        'current_itinerary': load_fixture('itinerary.txt'),
+        'feedback': 'Can you make day 2 cheaper?',
+        'destination': 'Paris, France'
+    }
+
+
+# Route name -> (method, path for request i, JSON body for request i or None)
+ROUTES = {
+    'destinations': ('GET', lambda i: '/api/destinations', None),
+    'location-info': ('POST', lambda i: '/api/location-info', lambda i: {'location': f"City {i}"}),
+    'currency': ('GET', lambda i: f"/api/currency/{quote(CURRENCY_DESTINATIONS[i % len(CURRENCY_DESTINATIONS)])}", None),
+    'generate-itinerary': ('POST', lambda i: '/api/generate-itinerary', itinerary_request),
+    'refine-itinerary': ('POST', lambda i: '/api/refine-itinerary', refinement_request),
+}
+
+
+def offline_env(stub_url, args):
+    env = server_env(stub_url, args.threads)
+    env.update({
+        'STARTUP_WARMUP': 'false',
+        'GEMINI_CONTEXT_CACHE': 'false',
+        'FAKE_GEMINI_LATENCY': str(args.gemini_latency),
+        'FAKE_GEMINI_JITTER': str(args.gemini_jitter),
+        'FAKE_GEMINI_ERROR_RATE': str(args.error_rate),
+        'BENCH_SEED': str(args.seed)
+    })
+    return env
+
+
+def start_offline_server(mode, port, env, threads):
+    if mode == 'threaded':
+        command = ['gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', '1',
+                   '--threads', str(threads), '--timeout', '0', 'benchmarks.offline_app:app']
+    else:
+        command = ['uvicorn', 'benchmarks.offline_app:asgi_app', '--host', '127.0.0.1', '--port', str(port),
+                   '--log-level', 'warning', '--no-access-log']
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def load_route(session, base_url, route, concurrency, total_requests, request_ids):
+    """Keep `concurrency` requests to one route in flight until `total_requests` have completed"""
+    method, path, body = ROUTES[route]
+    latencies = []
+    errors = 0
+    remaining = iter(range(total_requests))
+
+    async def client():
+        nonlocal errors
+        for _ in remaining:
+            index = next(request_ids)
+            start = time.perf_counter()
+            try:
+                async with session.request(method, base_url + path(index),
+                                           json=body(index) if body else None) as response:
+                    payload = await response.read()
+                    if response.status != 200 or b'"success":false' in payload.replace(b' ', b''):
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1)
+    }
+
+
+async def run_suite(base_url, routes, concurrency_levels, total_requests, report):
+    results = {}
+    request_ids = itertools.count()
+    connector = aiohttp.TCPConnector(limit=max(concurrency_levels))
+    timeout = aiohttp.ClientTimeout(total=300)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        await wait_until_ready(session, base_url)
+        for route in routes:
+            # One untimed request warms connection pools and lazily built state
+            await load_route(session, base_url, route, 1, 1, request_ids)
+            results[route] = {}
+            for concurrency in concurrency_levels:
+                result = await load_route(session, base_url, route, concurrency, total_requests, request_ids)
+                results[route][str(concurrency)] = result
+                report(route, concurrency, result)
+    return results
+
+
+def change(current, previous):
+    return f"{(current - previous) / previous * 100:+.1f}%" if previous else 'n/a'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', default='1,10,50', help='comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=100, help='requests per route and concurrency level')
+    parser.add_argument('--routes', default=','.join(ROUTES), help='comma-separated routes: ' + ', '.join(ROUTES))
+    parser.add_argument('--latency', type=float, default=0.05, help='stub latency per upstream call in seconds')
+    parser.add_argument('--jitter', type=float, default=0.02, help='extra uniform 0..jitter seconds per upstream call')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of upstream and Gemini calls that fail')
+    parser.add_argument('--gemini-latency', type=float, default=0.5, help='fake Gemini generation time in seconds')
+    parser.add_argument('--gemini-jitter', type=float, default=0.2, help='extra uniform 0..jitter seconds per generation')
+    parser.add_argument('--server', choices=('threaded', 'asgi'), default='threaded', help='deployment to load')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads for the threaded deployment')
+    parser.add_argument('--seed', type=int, default=1, help='seed for stub jitter and injected errors')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='results file from an earlier run to compare against')
+    args = parser.parse_args()
+
+    routes = [route.strip() for route in args.routes.split(',') if route.strip()]
+    unknown = [route for route in routes if route not in ROUTES]
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)}")
+    concurrency_levels = [int(level) for level in args.concurrency.split(',')]
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+
+    def report(route, concurrency, result):
+        line = (f"  {route:<20} c={concurrency:<4} {result['throughput']:8.1f} req/s  "
+                f"p50 {result['p50_ms']:8.1f}ms  p95 {result['p95_ms']:8.1f}ms  "
+                f"p99 {result['p99_ms']:8.1f}ms  errors {result['errors']}")
+        previous = (baseline or {}).get(route, {}).get(str(concurrency))
+        if previous:
+            line += (f"  (req/s {change(result['throughput'], previous['throughput'])}, "
+                     f"p95 {change(result['p95_ms'], previous['p95_ms'])})")
+        print(line, flush=True)
+
+    print(f"{args.server} server, stub latency {args.latency * 1000:.0f}ms +0-{args.jitter * 1000:.0f}ms, "
+          f"Gemini {args.gemini_latency * 1000:.0f}ms +0-{args.gemini_jitter * 1000:.0f}ms, "
+          f"error rate {args.error_rate:.1%}, {args.requests} requests per level")
+    with StubUpstreamServer(latency=args.latency, jitter=args.jitter,
+                            error_rate=args.error_rate, seed=args.seed) as stub:
+        port = free_port()
+        server = start_offline_server(args.server, port, offline_env(stub.base_url, args), args.threads)
+        try:
+            results = asyncio.run(run_suite(f"http://127.0.0.1:{port}", routes, concurrency_levels,
+                                            args.requests, report))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"  {stub.request_count} upstream stub requests, {stub.error_count} injected errors")
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump({'config': vars(args), 'results': results}, output, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Measure cold start: how long `import app` takes, and how long a freshly launched server
+(gunicorn or uvicorn, one worker) takes to answer its first request.
+Upstreams point at a local stub with the given latency, so any network call made while
+starting up shows up in the timings.
+
+Usage: python benchmarks/bench_startup.py [--latency 0.5] [--runs 5]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stub_upstreams import StubUpstreamServer
+from benchmarks.bench_asgi_vs_threaded import free_port, server_env, start_server
+
+IMPORT_SNIPPET = 'import time; start = time.perf_counter(); import app; print(f"import_seconds={time.perf_counter() - start}")'
+
+
+def startup_env(stub_url):
+    env = server_env(stub_url, threads=8)
+    # A key so the Gemini setup path runs; context caching would call the real API
+    env.update({'GEMINI_API_KEY': 'stub-gemini-key', 'GEMINI_CONTEXT_CACHE': 'false'})
+    return env
+
+
+def time_import(env):
+    output = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    # The warm-up thread may still be printing, so pick the timing out of the output
+    return float(re.search(r'import_seconds=([0-9.]+)', output).group(1))
+
+
+def time_first_response(mode, env, timeout=60):
+    """Seconds from launching the server process to its first 200 on /api/status"""
+    port = free_port()
+    start = time.perf_counter()
+    server = start_server(mode, port, env, threads=8)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/status", timeout=timeout) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise RuntimeError(f"{mode} server did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(label, samples):
+    print(f"  {label:<36} median {statistics.median(samples) * 1000:7.1f}ms  max {max(samples) * 1000:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.5, help='stub latency per upstream call in seconds')
+    parser.add_argument('--runs', type=int, default=5, help='cold starts per measurement')
+    args = parser.parse_args()
+
+    print(f"Cold start, {args.latency * 1000:.0f}ms stub latency, {args.runs} runs")
+    with StubUpstreamServer(latency=args.latency) as stub:
+        env = startup_env(stub.base_url)
+        report('import app', [time_import(env) for _ in range(args.runs)])
+        for mode in ('threaded', 'asgi'):
+            report(f"launch to first response ({mode})", [time_first_response(mode, env) for _ in range(args.runs)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+A stand-in for google.generativeai.GenerativeModel for offline benchmarks.
+Answers generate_content with recorded itineraries after a configurable latency,
+streams them in chunks, and reports token usage the way Gemini does.
+"""
+
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from benchmarks.stub_upstreams import load_fixture
+
+SECTIONS_MARKER = 'SECTIONS TO UPDATE:\n'
+ORIGINAL_MARKER = 'ORIGINAL ITINERARY:\n'
+FEEDBACK_MARKER = '\n\nUSER FEEDBACK:'
+
+
+class FakeGeminiError(Exception):
+    """Injected generation failure"""
+
+
+class FakeResponse:
+    """generate_content result: .text and .usage_metadata, iterable in chunks when streamed"""
+
+    def __init__(self, text, prompt_tokens, chunk_size=None, chunk_delay=0.0):
+        self.text = text
+        self._chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)] if chunk_size else [text]
+        self._chunk_delay = chunk_delay
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            cached_content_token_count=0,
+            candidates_token_count=len(text) // 4
+        )
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            time.sleep(self._chunk_delay)
+            yield SimpleNamespace(text=chunk)
+
+
+class FakeGeminiModel:
+    """Answers like Gemini would for each prompt go.travel sends.
+
+    latency (plus a uniform 0..jitter) is the full generation time; streamed responses
+    spend it between chunks. error_rate of the calls raise FakeGeminiError.
+    """
+
+    STREAM_CHUNK_CHARACTERS = 400
+
+    def __init__(self, latency=1.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.itinerary = load_fixture('itinerary.txt')
+        self.structured_itinerary = json.dumps(load_fixture('itinerary_structured.json'))
+        self.call_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _answer(self, prompt, generation_config):
+        mime_type = getattr(generation_config, 'response_mime_type', None)
+        if isinstance(generation_config, dict):
+            mime_type = generation_config.get('response_mime_type')
+        if mime_type == 'application/json':
+            return self.structured_itinerary
+        if SECTIONS_MARKER in prompt:
+            # Section refinement: rewrite exactly the sections that were sent
+            sections = prompt.split(SECTIONS_MARKER, 1)[1].split(FEEDBACK_MARKER, 1)[0]
+            return sections.strip() + '\nUpdated to follow the traveler feedback.'
+        if ORIGINAL_MARKER in prompt:
+            return prompt.split(ORIGINAL_MARKER, 1)[1].split(FEEDBACK_MARKER, 1)[0].strip()
+        return self.itinerary
+
+    def generate_content(self, contents, stream=False, generation_config=None, request_options=None, **kwargs):
+        prompt = contents if isinstance(contents, str) else ' '.join(str(part) for part in contents)
+        with self._lock:
+            self.call_count += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+
+        text = self._answer(prompt, generation_config)
+        if not stream:
+            time.sleep(delay)
+        if failed:
+            raise FakeGeminiError('injected Gemini error')
+        if not stream:
+            return FakeResponse(text, len(prompt) // 4)
+        chunk_count = max(1, -(-len(text) // self.STREAM_CHUNK_CHARACTERS))
+        return FakeResponse(text, len(prompt) // 4, self.STREAM_CHUNK_CHARACTERS, delay / chunk_count)
@@ -0,0 +1,29 @@
+"""
+go.travel wired up for offline benchmarks: upstream URLs come from the environment
+(see stub_upstreams.upstream_env) and Gemini is replaced by FakeGeminiModel.
+
+    gunicorn benchmarks.offline_app:app        threaded deployment
+    uvicorn benchmarks.offline_app:asgi_app    ASGI deployment
+"""
+
+import os
+
+import app as gotravel
+from benchmarks.fake_gemini import FakeGeminiModel
+
+gotravel.config.set_gemini_model(FakeGeminiModel(
+    latency=float(os.getenv('FAKE_GEMINI_LATENCY', 1.0)),
+    jitter=float(os.getenv('FAKE_GEMINI_JITTER', 0)),
+    error_rate=float(os.getenv('FAKE_GEMINI_ERROR_RATE', 0)),
+    seed=os.getenv('BENCH_SEED')
+), 'fake-gemini')
+
+app = gotravel.app
+
+
+def __getattr__(name):
+    # Imported on first use so the threaded deployment does not load the ASGI stack
+    if name == 'asgi_app':
+        import asgi
+        return asgi.app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,141 @@
+"""
+Local stub servers for the upstream APIs used by go.travel.
+Lets benchmarks exercise the service classes without touching the network: every
+Google Maps, OpenWeatherMap and exchangerate-api path answers with a recorded payload
+after a configurable latency, with optional jitter and injected errors.
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixture(name):
+    """A recorded upstream response body from benchmarks/fixtures"""
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as fixture:
+        return json.load(fixture) if name.endswith('.json') else fixture.read()
+
+
+# Path suffix -> fixture with the recorded response body
+ROUTES = {
+    '/geocode/json': 'geocode.json',
+    '/timezone/json': 'timezone.json',
+    '/place/nearbysearch/json': 'nearbysearch.json',
+    '/place/textsearch/json': 'textsearch.json',
+    '/place/details/json': 'place_details.json',
+    '/directions/json': 'directions.json',
+    '/snapToRoads': 'snap_to_roads.json',
+    '/weather': 'weather.json',
+    '/forecast': 'forecast.json',
+    '/latest/USD': 'rates.json'
+}
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # socketserver's default backlog of 5 drops connections under load
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-response are expected when a benchmark stops its servers
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubUpstreamServer:
+    """Threaded HTTP server answering every known upstream path with its recorded payload.
+
+    Each response waits latency plus a uniform 0..jitter seconds; error_rate of them
+    are answered with HTTP 503 instead. seed makes the jitter and errors repeatable.
+    """
+
+    def __init__(self, latency=0.1, routes=None, jitter=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.routes = {suffix: json.dumps(load_fixture(name)).encode() for suffix, name in (routes or ROUTES).items()}
+        self.request_count = 0
+        self.error_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _StubHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def _next_response(self, path):
+        """(delay, status, body) for one request"""
+        with self._lock:
+            self.request_count += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.error_count += 1
+        body = next((body for suffix, body in self.routes.items() if path.endswith(suffix)), None)
+        if body is None:
+            return delay, 404, json.dumps({"error": "unknown stub route"}).encode()
+        if failed:
+            return delay, 503, json.dumps({"error": "injected stub error"}).encode()
+        return delay, 200, body
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                delay, status, body = stub._next_response(urlsplit(self.path).path)
+                time.sleep(delay)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def upstream_env(base_url):
+    """Environment overrides that point a go.travel process at a stub server"""
+    return {
+        'GOOGLE_MAPS_API_URL': base_url,
+        'GOOGLE_ROADS_API_URL': base_url,
+        'OPENWEATHERMAP_API_URL': base_url,
+        'EXCHANGERATE_API_URL': f"{base_url}/v4/latest"
+    }
+
+
+def point_services_at(manager, base_url):
+    """Redirect every service of a GoogleServicesManager to a stub server"""
+    for service in (manager.geocoding, manager.places, manager.directions,
+                    manager.timezone, manager.roads, manager.weather):
+        service.base_url = base_url
+    manager.roads.roads_base_url = base_url
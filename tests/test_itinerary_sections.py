@@ -0,0 +1,58 @@
+import os
+
+os.environ.setdefault('STARTUP_WARMUP', 'false')
+os.environ.setdefault('GEOCODE_CACHE_PATH', ':memory:')
+
+import app as gotravel
+
+ITINERARY = """Day 1: Classic Paris
+Morning (9:00 AM - 12:00 PM): Eiffel Tower
+Price: €29 ($32)
+Evening: Seine cruise
+
+Day 2: Museums
+Morning: Musée d'Orsay
+Evening: Dinner in the Latin Quarter
+
+Day 3: Montmartre
+Morning: Sacré-Cœur
+Evening: Dinner at a bistro, €35 ($38)
+
+DAILY BUDGET SUMMARY
+Day 1: €150 ($163)
+Day 2: €110 ($120)
+Day 3: €85 ($92)
+
+CURRENCY & PAYMENT INFORMATION
+Cards are accepted almost everywhere.
+
+SAFETY INFORMATION
+Watch for pickpockets on line 1."""
+
+
+def enhanced_sections():
+    gotravel.currency_service.set_rates({'USD': 1, 'EUR': 0.92})
+    text = gotravel.enhance_itinerary_with_currency(ITINERARY, 'Paris, France')
+    assert 'CURRENCY INFORMATION' in text
+    return gotravel.split_itinerary_sections(text)
+
+
+def test_injected_currency_block_does_not_end_days():
+    sections = enhanced_sections()
+    days = [section['day'] for section in sections if section['day'] is not None]
+    assert days == [1, 2, 3]
+    currency = next(section for section in sections if section['title'].startswith('CURRENCY INFORMATION'))
+    assert 'Day 2' not in currency['text'] and 'Eiffel' not in currency['text']
+
+
+def test_day_feedback_targets_that_day():
+    sections = enhanced_sections()
+    affected = gotravel.find_affected_sections(sections, 'swap the day 3 dinner')
+    assert [sections[index]['day'] for index in affected] == [3]
+
+
+def test_currency_feedback_leaves_days_alone():
+    sections = enhanced_sections()
+    affected = gotravel.find_affected_sections(sections, 'more about the currency please')
+    assert affected
+    assert all(sections[index]['day'] is None for index in affected)
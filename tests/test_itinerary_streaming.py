@@ -0,0 +1,56 @@
+import os
+
+os.environ.setdefault('STARTUP_WARMUP', 'false')
+os.environ.setdefault('GEOCODE_CACHE_PATH', ':memory:')
+
+import app as gotravel
+
+RAW_ITINERARY = """Paris rewards slow mornings and long dinners.
+This plan keeps each day to one neighbourhood
+so you spend more time exploring than commuting.
+
+## Day 1: Classic Paris
+**Morning (9:00 AM - 12:00 PM):** Eiffel Tower
+* Price: €29 ($32)
+
+
+## Day 2: Museums
+**Morning:** Musée d'Orsay
+
+## SAFETY INFORMATION
+Watch for pickpockets on line 1."""
+
+
+def stream(raw, header, chunk_size):
+    cleaner = gotravel.IncrementalItineraryCleaner(header=header)
+    parts = [cleaner.feed(raw[start:start + chunk_size]) for start in range(0, len(raw), chunk_size)]
+    return ''.join(parts) + cleaner.finish()
+
+
+def final_text(raw):
+    return gotravel.enhance_itinerary_with_currency(gotravel.clean_itinerary_text(raw), 'Paris, France')
+
+
+def test_streamed_text_matches_final_itinerary():
+    gotravel.currency_service.set_rates({'USD': 1, 'EUR': 0.92})
+    header = gotravel.build_currency_info('Paris, France')
+    expected = final_text(RAW_ITINERARY)
+    for chunk_size in (1, 7, 64, len(RAW_ITINERARY)):
+        assert stream(RAW_ITINERARY, header, chunk_size) == expected
+
+
+def test_currency_header_sits_before_the_first_day():
+    gotravel.currency_service.set_rates({'USD': 1, 'EUR': 0.92})
+    text = final_text(RAW_ITINERARY)
+    assert 'commuting.\n\nCURRENCY INFORMATION:' in text
+    assert '(~USD equivalent)\n\nDay 1: Classic Paris' in text
+    assert '\n\n\n' not in text
+
+
+def test_header_falls_back_to_after_the_first_lines():
+    gotravel.currency_service.set_rates({'USD': 1, 'EUR': 0.92})
+    header = gotravel.build_currency_info('Paris, France')
+    raw = "Line one\nLine two\nLine three\nLine four\nLine five"
+    expected = final_text(raw)
+    assert expected.index('CURRENCY INFORMATION') > expected.index('Line three') > 0
+    assert stream(raw, header, 5) == expected
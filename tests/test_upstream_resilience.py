@@ -0,0 +1,248 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+os.environ.setdefault('STARTUP_WARMUP', 'false')
+os.environ.setdefault('GEOCODE_CACHE_PATH', ':memory:')
+
+import app as gotravel
+import asgi
+
+
+class FakeClock:
+    """Stands in for time.monotonic/time.time; sleeping just moves it forward"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class Response:
+    def __init__(self, name, status_code=200):
+        self.name = name
+        self.status_code = status_code
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def hedging_guard(monkeypatch):
+    """An UpstreamGuard that hedges after 10ms, installed as the shared guard"""
+    monkeypatch.setenv('HEDGE_REQUESTS', 'true')
+    monkeypatch.setenv('HEDGE_MIN_DELAY', '0.01')
+    guard = gotravel.UpstreamGuard()
+    for _ in range(20):
+        guard.breakers['currency'].record_success(0.001)  # Enough samples for a p95
+    monkeypatch.setattr(gotravel, 'upstream_guard', guard)
+    yield guard
+    guard.hedge_executor.shutdown(wait=True)
+
+
+def drained_scheduler(clock, tokens_left):
+    """places allows 10/s with a burst of 20; take interactive tokens until tokens_left remain"""
+    scheduler = gotravel.QuotaScheduler(clock=clock, sleep=clock.sleep)
+    for _ in range(20 - tokens_left):
+        assert scheduler.try_acquire('places', 'key', 'interactive') == 0
+    return scheduler
+
+
+def test_background_call_is_shed_while_interactive_gets_a_token():
+    clock = FakeClock()
+    scheduler = drained_scheduler(clock, tokens_left=10)  # Below the 50% background reserve
+
+    with pytest.raises(gotravel.QuotaExceededError) as shed:
+        scheduler.acquire('places', 'key', 'background')
+    assert shed.value.priority == 'background'
+
+    scheduler.acquire('places', 'key', 'interactive')
+    status = scheduler.get_status()['priorities']
+    assert status['background']['shed'] == 1
+    assert status['interactive']['granted'] == 11
+    assert clock.now == 1000.0  # Neither call waited
+
+
+def test_enrichment_call_queues_within_its_max_wait():
+    clock = FakeClock()
+    scheduler = drained_scheduler(clock, tokens_left=4)  # Exactly the 20% enrichment reserve
+
+    scheduler.acquire('places', 'key', 'enrichment')
+    assert clock.now == pytest.approx(1000.1)  # Waited for one token to refill
+    assert scheduler.get_status()['priorities']['enrichment'] == {
+        'reserve': 0.2, 'max_wait': 0.5, 'granted': 1, 'queued': 1, 'shed': 0
+    }
+
+
+def test_breaker_opens_then_admits_one_half_open_probe():
+    clock = FakeClock()
+    breaker = gotravel.CircuitBreaker('places', timeout=5, failure_threshold=3, reset_timeout=30, clock=clock)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == 'open'
+
+    clock.now += 29
+    assert not breaker.allow()
+
+    clock.now += 1
+    assert breaker.allow()  # The probe
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()  # Everyone else waits for its verdict
+
+    breaker.record_success(0.1)
+    assert breaker.state == 'closed'
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens_the_breaker():
+    clock = FakeClock()
+    breaker = gotravel.CircuitBreaker('places', timeout=5, failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert breaker.stats['times_opened'] == 2
+
+
+def test_hedge_loser_is_released_and_not_counted_as_a_failure(hedging_guard):
+    release_primary = threading.Event()
+    attempts = iter(['primary', 'backup'])
+    responses = {}
+
+    def fetch():
+        name = next(attempts)
+        if name == 'primary':
+            release_primary.wait(5)
+        responses[name] = Response(name)
+        return responses[name]
+
+    result = hedging_guard.call('currency', fetch, hedge=True)
+    assert result.name == 'backup'
+
+    release_primary.set()
+    hedging_guard.hedge_executor.shutdown(wait=True)  # Let the loser land
+    assert responses['primary'].closed  # Its pooled connection goes back
+    assert not responses['backup'].closed
+    breaker = hedging_guard.breakers['currency']
+    assert breaker.stats['failures'] == 0
+    assert breaker.stats['successes'] == 21
+    assert hedging_guard.stats['hedged'] == 1
+    assert hedging_guard.stats['hedge_wins'] == 1
+
+
+def test_hedge_skipped_without_a_free_quota_token(hedging_guard):
+    attempts = []
+
+    def fetch():
+        attempts.append(len(attempts))
+        threading.Event().wait(0.05)
+        return Response('primary')
+
+    result = hedging_guard.call('currency', fetch, hedge=True, can_hedge=lambda: False)
+    assert result.name == 'primary'
+    assert attempts == [0]
+    assert hedging_guard.stats['hedge_skipped_quota'] == 1
+
+
+def test_async_hedge_loser_is_cancelled_and_not_counted_as_a_failure(hedging_guard):
+    cancelled = []
+
+    async def scenario():
+        client = asgi.AsyncHTTPClient()
+        attempts = iter(['primary', 'backup'])
+
+        async def get_with_retries(url, params, timeout):
+            name = next(attempts)
+            if name == 'primary':
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append(name)
+                    raise
+            return Response(name)
+
+        client._get_with_retries = get_with_retries
+        response = await client.get('https://rates.example/latest', upstream='currency')
+        await asyncio.sleep(0)  # Let the cancellation reach the loser
+        return response
+
+    assert asyncio.run(scenario()).name == 'backup'
+    assert cancelled == ['primary']
+    breaker = hedging_guard.breakers['currency']
+    assert breaker.stats['failures'] == 0
+    assert breaker.stats['successes'] == 21
+
+
+def test_coalesced_follower_retries_after_the_leader_is_shed(monkeypatch):
+    monkeypatch.setattr(gotravel, 'upstream_guard', gotravel.UpstreamGuard())
+
+    async def scenario():
+        leader_queued = asyncio.Event()
+        shed_leader = asyncio.Event()
+
+        async def acquire_quota(upstream, params):
+            if gotravel.current_priority() == 'background':
+                leader_queued.set()
+                await shed_leader.wait()
+                raise gotravel.quota_scheduler.shed(upstream, 'background')
+
+        monkeypatch.setattr(asgi, 'acquire_quota', acquire_quota)
+        client = asgi.AsyncHTTPClient()
+        fetched = []
+
+        async def get_with_retries(url, params, timeout):
+            fetched.append(gotravel.current_priority())
+            return Response('weather')
+
+        client._get_with_retries = get_with_retries
+
+        async def background_get():
+            with gotravel.call_priority('background'):
+                return await client.get('https://weather.example/now', upstream='weather')
+
+        leader = asyncio.create_task(background_get())
+        await leader_queued.wait()
+        follower = asyncio.create_task(client.get('https://weather.example/now', upstream='weather'))
+        await asyncio.sleep(0)
+        assert client.stats['coalesced'] == 1
+
+        shed_leader.set()
+        results = await asyncio.gather(leader, follower, return_exceptions=True)
+        return results, fetched
+
+    (leader_result, follower_result), fetched = asyncio.run(scenario())
+    assert isinstance(leader_result, gotravel.QuotaExceededError)
+    assert follower_result.name == 'weather'
+    assert fetched == ['interactive']
+
+
+def test_sync_follower_retries_only_when_it_outranks_the_shed_call():
+    client = gotravel.PooledHTTPClient()
+    shared_error = gotravel.QuotaExceededError('places shed', priority='background')
+    calls = []
+
+    def run(key, fetch):
+        calls.append(gotravel.current_priority())
+        if len(calls) == 1:
+            raise shared_error  # The leader this caller joined was shed
+        return Response('retried'), False
+
+    client.coalescer.run = run
+    assert client.get('https://maps.example/place').name == 'retried'
+    assert calls == ['interactive', 'interactive']
+
+    calls.clear()
+    with gotravel.call_priority('background'):
+        with pytest.raises(gotravel.QuotaExceededError):
+            client.get('https://maps.example/place')
+    assert calls == ['background']